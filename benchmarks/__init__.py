@@ -0,0 +1,9 @@
+"""
+Benchmarks hors-ligne de Vite Ma Dose.
+
+Les réponses enregistrées dans `tests/fixtures/` sont rejouées à la place des
+plateformes (latence et volume configurables) pour mesurer le débit du scraper
+de bout en bout, sans aucune requête réseau.
+
+Usage : `python -m benchmarks --help`
+"""
@@ -0,0 +1,119 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.common import environment, peak_rss_mb, workdir
+from benchmarks.replay import FixtureReplay, fixture_centres, install, replay_centres
+
+# Les fixtures ont été enregistrées en 2021 : les scrapers ignorent les créneaux antérieurs à la date de début.
+REPLAY_START_DATE = "2021-04-03"
+
+
+def last_scans_response(centres: list):
+    """
+    Un `info_centres.json` de l'exécution précédente, où la moitié des centres avaient des disponibilités :
+    tous les centres rejoués sont scannés.
+    """
+    previous = [
+        {
+            "url": centre["rdv_site_web"],
+            "prochain_rdv": "2021-04-10T10:00:00+02:00",
+            "last_scan_with_availabilities": "2021-04-02T10:00:00+02:00",
+        }
+        for centre in centres[::2]
+    ]
+    return mock.Mock(json=lambda: {"centres_disponibles": previous, "centres_indisponibles": []})
+
+
+def run(args) -> dict:
+    centres = list(replay_centres(scale=args.scale, platforms=args.platforms))
+
+    import scraper.scraper as vmd_scraper
+
+    install(FixtureReplay(latency=args.latency / 1000, jitter=args.jitter))
+    vmd_scraper.POOL_SIZE = args.pool_size
+
+    stages = {}
+    get_last_scans = vmd_scraper.get_last_scans
+
+    def timed_get_last_scans(centres_cherchés, *args):
+        # get_last_scans consomme le résultat du pool : sa durée couvre toute la phase de scraping
+        start = time.perf_counter()
+        result = get_last_scans(centres_cherchés, *args)
+        stages["scrape"] = time.perf_counter() - start
+        return result
+
+    output = open(os.devnull, "w") if not args.verbose else sys.stdout
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(vmd_scraper, "get_start_date", lambda: REPLAY_START_DATE))
+        stack.enter_context(mock.patch.object(vmd_scraper, "get_last_scans", timed_get_last_scans))
+        stack.enter_context(mock.patch("utils.vmd_utils.requests.get", return_value=last_scans_response(centres)))
+        stack.enter_context(contextlib.redirect_stdout(output))
+        start = time.perf_counter()
+        centres_cherchés, profiling = vmd_scraper.scrape(centres=centres)
+        elapsed = time.perf_counter() - start
+
+    stages["export"] = elapsed - stages.get("scrape", 0)
+    slots = sum(centre.appointment_count or 0 for centre in centres_cherchés)
+    requests_count = sum(sum((centre.request_counts or {}).values()) for centre in centres_cherchés)
+    return {
+        **environment(),
+        "parameters": {
+            "scale": args.scale,
+            "latency_ms": args.latency,
+            "jitter": args.jitter,
+            "pool_size": args.pool_size,
+            "platforms": args.platforms or sorted(fixture_centres()),
+        },
+        "centers": len(centres_cherchés),
+        "centers_with_availabilities": sum(1 for centre in centres_cherchés if centre.prochain_rdv),
+        "slots": slots,
+        "requests": requests_count,
+        "elapsed": round(elapsed, 3),
+        "centers_per_second": round(len(centres_cherchés) / elapsed, 2),
+        "slots_per_second": round(slots / elapsed, 2),
+        "peak_rss_mb": {
+            "main": peak_rss_mb(resource.RUSAGE_SELF),
+            "children": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        },
+        "stages": {stage: round(duration, 3) for stage, duration in stages.items()},
+        "profiling": profiling,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rejoue les fixtures des plateformes à travers tout le pipeline scrape()."
+    )
+    parser.add_argument("--scale", "-s", type=int, default=10, help="nombre de centres rejoués par plateforme")
+    parser.add_argument("--latency", "-l", type=float, default=50, help="latence simulée par requête, en ms")
+    parser.add_argument("--jitter", type=float, default=0.5, help="variation relative de la latence (0 à 1)")
+    parser.add_argument("--platform", "-p", help="plateformes rejouées, séparées par des virgules (défaut : toutes)")
+    parser.add_argument("--pool-size", type=int, default=int(os.getenv("POOL_SIZE", 50)))
+    parser.add_argument("--output", "-o", default="bench_output.json", help="fichier JSON des résultats")
+    parser.add_argument("--workdir", help="répertoire de travail du rejeu (défaut : répertoire temporaire)")
+    parser.add_argument("--verbose", "-v", action="store_true", help="affiche la sortie du scraper")
+    args = parser.parse_args()
+    args.platforms = args.platform.split(",") if args.platform else None
+
+    output_path = Path(args.output).resolve()
+    with workdir(args.workdir):
+        results = run(args)
+    output_path.write_text(json.dumps(results, indent=2))
+
+    print(f"{results['centers']} centres, {results['slots']} créneaux en {results['elapsed']}s")
+    print(f"{results['centers_per_second']} centres/s, {results['slots_per_second']} créneaux/s")
+    print(
+        f"RSS max : {results['peak_rss_mb']['main']} Mo (principal), {results['peak_rss_mb']['children']} Mo (enfants)"
+    )
+    print(f"Résultats écrits dans {output_path}")
+
+
+if __name__ == "__main__":
+    main()
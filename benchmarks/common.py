@@ -0,0 +1,58 @@
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+FIXTURES_PATH = ROOT_PATH / "tests" / "fixtures"
+
+
+def prepare_workdir(workdir: Path):
+    """
+    Le scraper lit et écrit ses fichiers relativement au répertoire courant :
+    on travaille dans un répertoire à part pour ne pas écraser `data/output`.
+    """
+    (workdir / "data" / "output").mkdir(parents=True, exist_ok=True)
+    shutil.copy(ROOT_PATH / "config.json", workdir / "config.json")
+    input_path = workdir / "data" / "input"
+    if not input_path.exists():
+        input_path.symlink_to(ROOT_PATH / "data" / "input", target_is_directory=True)
+    shutil.copy(FIXTURES_PATH / "mapharma" / "mapharma_open_data.json", workdir / "data/output/mapharma_open_data.json")
+
+
+@contextmanager
+def workdir(path: Optional[str] = None):
+    """Se place dans le répertoire de travail (temporaire par défaut) le temps du benchmark."""
+    workdir_path = Path(path) if path else Path(tempfile.mkdtemp(prefix="vmd-bench-"))
+    prepare_workdir(workdir_path)
+    previous = os.getcwd()
+    os.chdir(workdir_path)
+    try:
+        yield workdir_path
+    finally:
+        os.chdir(previous)
+        if not path:
+            shutil.rmtree(workdir_path, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT_PATH, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    # ru_maxrss est exprimé en Ko sous Linux, en octets sous macOS
+    divider = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(who).ru_maxrss / divider, 1)
+
+
+def environment() -> dict:
+    return {"revision": git_revision(), "python": platform.python_version()}
@@ -0,0 +1,80 @@
+"""
+Débit de l'exporteur et des statistiques sur un jeu synthétique à l'échelle nationale.
+
+Usage : `python -m benchmarks.exporter --centres 5000 --slots-per-centre 50`
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from benchmarks.common import environment, peak_rss_mb, workdir
+
+
+def run(args) -> dict:
+    from benchmarks.synthetic import SyntheticDataset
+    from scraper.export.export_v2 import JSONExporter
+    from stats_generation.stats_available_centers import export_centres_stats
+
+    stages = {}
+    start = time.perf_counter()
+    dataset = SyntheticDataset(
+        centres=args.centres,
+        slots_per_centre=args.slots_per_centre,
+        available_ratio=args.available_ratio,
+        seed=args.seed,
+    )
+    stages["generate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    JSONExporter().export(dataset.creneaux())
+    stages["export"] = time.perf_counter() - start
+
+    info_centres_path = Path("data", "output", "info_centres_synthetic.json")
+    info_centres_path.write_text(json.dumps(dataset.info_centres()))
+    start = time.perf_counter()
+    export_centres_stats(info_centres_path, Path("data", "output", "stats_synthetic.json"))
+    stages["stats"] = time.perf_counter() - start
+
+    slots = dataset.total_slots
+    return {
+        **environment(),
+        "parameters": {
+            "centres": args.centres,
+            "slots_per_centre": args.slots_per_centre,
+            "available_ratio": args.available_ratio,
+            "seed": args.seed,
+        },
+        "centers": args.centres,
+        "slots": slots,
+        "slots_per_second": round(slots / stages["export"], 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {stage: round(duration, 3) for stage, duration in stages.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fait passer un jeu synthétique dans JSONExporter et stats_generation."
+    )
+    parser.add_argument("--centres", "-c", type=int, default=5000)
+    parser.add_argument("--slots-per-centre", type=float, default=50, help="moyenne des centres disponibles")
+    parser.add_argument("--available-ratio", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", default="bench_exporter.json", help="fichier JSON des résultats")
+    parser.add_argument("--workdir", help="répertoire de travail (défaut : répertoire temporaire)")
+    args = parser.parse_args()
+
+    output_path = Path(args.output).resolve()
+    with workdir(args.workdir):
+        results = run(args)
+    output_path.write_text(json.dumps(results, indent=2))
+
+    print(f"{results['centers']} centres, {results['slots']} créneaux : {results['slots_per_second']} créneaux/s")
+    print(f"Étapes : {results['stages']}, RSS max : {results['peak_rss_mb']} Mo")
+    print(f"Résultats écrits dans {output_path}")
+
+
+if __name__ == "__main__":
+    main()
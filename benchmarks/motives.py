@@ -0,0 +1,131 @@
+"""
+Micro-benchmark de la classification des motifs (pertinence, vaccin, dose), sur les noms de motifs des fixtures.
+
+Compare les boucles de sous-chaînes historiques au classifieur compilé, sans puis avec mémorisation.
+
+Usage : `python -m benchmarks.motives --rounds 200`
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Iterator, List
+
+from benchmarks.common import FIXTURES_PATH, environment
+
+NAME_KEYS = {"name", "reason", "nom", "label"}
+PLATFORMS = ["keldoc", "maiia", "avecmondoc", "ordoclic", "mapharma"]
+
+
+def _strings(document, key=None) -> Iterator[str]:
+    if isinstance(document, dict):
+        for child_key, value in document.items():
+            yield from _strings(value, child_key)
+    elif isinstance(document, list):
+        for value in document:
+            yield from _strings(value, key)
+    elif isinstance(document, str) and key in NAME_KEYS:
+        yield document
+
+
+def motive_names() -> List[str]:
+    """Les noms de motifs, de campagnes et de catégories des fixtures, sans doublon."""
+    names = set()
+    for platform in PLATFORMS:
+        for path in sorted((FIXTURES_PATH / platform).glob("*.json")):
+            names.update(_strings(json.loads(path.read_text(encoding="utf-8"))))
+    return sorted(names)
+
+
+def substring_classify(name: str, filters: dict, vaccines_names: dict):
+    """Classification par boucles de sous-chaînes, telle qu'elle était faite avant le classifieur compilé."""
+    from scraper.pattern.vaccine import Vaccine, get_vaccine_astrazeneca_minus_55_edgecase
+
+    vaccine = None
+    low = name.lower().strip()
+    if "contre indications" not in low:
+        for candidate, candidate_names in vaccines_names.items():
+            if any(candidate_name in low for candidate_name in candidate_names):
+                vaccine = candidate
+                if candidate == Vaccine.ASTRAZENECA:
+                    vaccine = get_vaccine_astrazeneca_minus_55_edgecase(low)
+                break
+
+    dose = None
+    if any(tag.lower() in name.lower() for tag in filters.get("kid_first_dose_filter", [])):
+        dose = "1_kid"
+    elif any(tag.lower() in name.lower() for tag in filters.get("rappel_filter", [])) and not any(
+        tag.lower() in name.lower() for tag in filters.get("immuno_filter", [])
+    ):
+        dose = "3"
+    elif any(tag.lower() in name.lower() for tag in filters.get("dose2_filter", [])):
+        dose = "2"
+    elif any(tag.lower() in name.lower() for tag in filters.get("dose1_filter", [])):
+        dose = "1"
+    return dose is not None, vaccine, dose
+
+
+def _measure(function, names: List[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name in names:
+            function(name)
+    return time.perf_counter() - start
+
+
+def run(args) -> dict:
+    from scraper.pattern import vaccine
+    from scraper.pattern.motive_classifier import MotiveClassifier
+    from utils.vmd_config import get_conf_platform
+
+    filters = get_conf_platform(args.platform).get("filters", {})
+    names = motive_names()
+    classifier = MotiveClassifier(filters)
+
+    def compiled(name):
+        # Sans mémorisation : on vide les caches à chaque appel
+        classifier.classify.cache_clear()
+        classifier.doses.cache_clear()
+        vaccine._vaccine_name.cache_clear()
+        return classifier.classify(name)
+
+    mismatches = [
+        name for name in names if substring_classify(name, filters, vaccine.VACCINES_NAMES) != classifier.classify(name)
+    ]
+    timings = {
+        "substring": _measure(
+            lambda name: substring_classify(name, filters, vaccine.VACCINES_NAMES), names, args.rounds
+        ),
+        "compiled": _measure(compiled, names, args.rounds),
+        "memoized": _measure(classifier.classify, names, args.rounds),
+    }
+    calls = len(names) * args.rounds
+    return {
+        **environment(),
+        "parameters": {"platform": args.platform, "rounds": args.rounds},
+        "motives": len(names),
+        "mismatches": mismatches,
+        "us_per_call": {key: round(elapsed / calls * 1e6, 3) for key, elapsed in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de la classification des motifs de rendez-vous.")
+    parser.add_argument("--platform", "-p", default="keldoc", help="plateforme dont les filtres sont utilisés")
+    parser.add_argument("--rounds", "-r", type=int, default=200, help="passes sur l'ensemble des motifs")
+    parser.add_argument("--output", "-o", default="bench_motives.json", help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    results = run(args)
+    output_path = Path(args.output).resolve()
+    output_path.write_text(json.dumps(results, indent=2))
+
+    print(f"{results['motives']} motifs, {len(results['mismatches'])} différences avec les boucles de sous-chaînes")
+    for key, value in results["us_per_call"].items():
+        print(f"{key}: {value} µs par motif")
+    print(f"Résultats écrits dans {output_path}")
+
+
+if __name__ == "__main__":
+    main()
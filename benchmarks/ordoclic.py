@@ -0,0 +1,117 @@
+"""
+Scan de grosses pharmacies Ordoclic (nombreux professionnels et motifs), en rejouant les fixtures.
+
+Usage : `python -m benchmarks.ordoclic --professionals 20 --reasons 3`
+"""
+
+import argparse
+import copy
+import json
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import environment, peak_rss_mb
+from benchmarks.replay import FixtureReplay, load_fixture
+
+PHARMACY_URL = "https://app.ordoclic.fr/app/pharmacie/pharmacie-oceane-paris"
+START_DATE = "2021-05-08"
+
+
+def large_profile(professionals: int) -> dict:
+    """Le profil de la pharmacie Océane, avec `professionals` professionnels distincts."""
+    profile = load_fixture("ordoclic/fetchslot-profile.json")
+    professional = profile["publicProfessionals"][0]
+    profile["publicProfessionals"] = [
+        {**professional, "id": f'{professional["id"][:-4]}{index:04d}'} for index in range(professionals)
+    ]
+    return profile
+
+
+def large_reasons(reasons: int) -> dict:
+    """Les motifs de la pharmacie Océane, dont `reasons` motifs de vaccination valides."""
+    from scraper.ordoclic.ordoclic import is_reason_valid
+
+    data = load_fixture("ordoclic/fetchslot-reasons.json")
+    valid_reason = next(reason for reason in data["reasons"] if is_reason_valid(reason))
+    for index in range(1, reasons):
+        reason = copy.deepcopy(valid_reason)
+        reason["id"] = f'{valid_reason["id"][:-4]}{index:04d}'
+        data["reasons"].append(reason)
+    return data
+
+
+def run(args) -> dict:
+    from scraper.ordoclic.ordoclic import OrdoclicSlots
+    from scraper.pattern.center_info import CenterInfo
+    from scraper.pattern.scraper_request import ScraperRequest
+    from utils.vmd_utils import DummyQueue
+
+    reasons = json.dumps(large_reasons(args.reasons)).encode()
+    routes = [
+        (
+            "ordoclic",
+            r"^/v1/solar/entities/[^/]+/reasons$",
+            lambda request: httpx.Response(200, content=reasons, headers={"Content-Type": "application/json"}),
+        ),
+        ("ordoclic", r"^/v1/solar/slots/availableSlots$", "ordoclic/fetchslot-slots.json"),
+    ]
+    client = httpx.Client(
+        transport=FixtureReplay(latency=args.latency / 1000, jitter=args.jitter, routes=routes).transport()
+    )
+    profile = large_profile(args.professionals)
+    center_info = CenterInfo("75", "Pharmacie Océane", PHARMACY_URL)
+
+    requests_count = 0
+    slots = 0
+    start = time.perf_counter()
+    for _ in range(args.centres):
+        request = ScraperRequest(PHARMACY_URL, START_DATE, center_info, input_data=copy.deepcopy(profile))
+        OrdoclicSlots(creneau_q=DummyQueue(), client=client).fetch(request)
+        requests_count += sum((request.requests or {}).values())
+        slots += request.appointment_count
+    elapsed = time.perf_counter() - start
+
+    return {
+        **environment(),
+        "parameters": {
+            "centres": args.centres,
+            "professionals": args.professionals,
+            "reasons": args.reasons,
+            "latency_ms": args.latency,
+            "jitter": args.jitter,
+        },
+        "centers": args.centres,
+        "slots": slots,
+        "requests": requests_count,
+        "requests_per_center": round(requests_count / args.centres, 2),
+        "elapsed": round(elapsed, 3),
+        "seconds_per_center": round(elapsed / args.centres, 3),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rejoue le scan de pharmacies Ordoclic à nombreux professionnels à travers OrdoclicSlots."
+    )
+    parser.add_argument("--centres", "-c", type=int, default=10)
+    parser.add_argument("--professionals", type=int, default=20, help="professionnels par pharmacie")
+    parser.add_argument("--reasons", type=int, default=3, help="motifs de vaccination valides par pharmacie")
+    parser.add_argument("--latency", "-l", type=float, default=50, help="latence simulée par requête, en ms")
+    parser.add_argument("--jitter", type=float, default=0.5, help="variation relative de la latence (0 à 1)")
+    parser.add_argument("--output", "-o", default="bench_ordoclic.json", help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    results = run(args)
+    output_path = Path(args.output).resolve()
+    output_path.write_text(json.dumps(results, indent=2))
+
+    print(f"{results['centers']} pharmacies, {results['requests_per_center']} requêtes par pharmacie")
+    print(f"{results['seconds_per_center']}s par pharmacie, {results['slots']} créneaux")
+    print(f"Résultats écrits dans {output_path}")
+
+
+if __name__ == "__main__":
+    main()
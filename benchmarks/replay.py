@@ -0,0 +1,202 @@
+import json
+import random
+import re
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Union
+from urllib.parse import parse_qs
+
+import httpx
+
+from benchmarks.common import FIXTURES_PATH
+
+KELDOC_CENTER_URL = (
+    "https://vaccination-covid.keldoc.com/centre-hospitalier-regional/lorient-56100/"
+    "groupe-hospitalier-bretagne-sud-lorient-hopital-du-scorff?cabinet=16913&specialty=144"
+)
+
+Responder = Union[str, Callable[[httpx.Request], httpx.Response]]
+
+
+def load_fixture(name: str):
+    return json.loads((FIXTURES_PATH / name).read_text(encoding="utf-8-sig"))
+
+
+def _keldoc_timetable(request: httpx.Request) -> httpx.Response:
+    agenda_id = request.url.path.split("/")[-1]
+    path = FIXTURES_PATH / "keldoc" / f"center1-timetable-{agenda_id}.json"
+    if not path.exists():
+        return httpx.Response(200, json={})
+    return httpx.Response(200, json=json.loads(path.read_text(encoding="utf-8")))
+
+
+def _maiia_endpoint(request: httpx.Request) -> httpx.Response:
+    qs = parse_qs(request.url._uri_reference.query)
+    if int(qs.get("page", ["0"])[0]) >= 1:
+        return httpx.Response(200, json={"items": [], "total": 0})
+    endpoint = request.url.path.split("/")[-1]
+    path = FIXTURES_PATH / "maiia" / f"{endpoint}.json"
+    if not path.exists():
+        return httpx.Response(404, content="")
+    return httpx.Response(200, content=path.read_text(encoding="utf-8"))
+
+
+def _avecmondoc_week(request: httpx.Request) -> httpx.Response:
+    payload = json.loads(request.content)
+    if payload.get("periodStart", "").startswith("2021-05-20"):
+        return httpx.Response(200, json=load_fixture("avecmondoc/get_availabilities_week1.json"))
+    return httpx.Response(200, json=load_fixture("avecmondoc/get_availabilities_week2.json"))
+
+
+# (plateforme, motif du chemin de l'URL, fixture ou fonction de réponse)
+ROUTES = [
+    ("doctolib", r"^/booking/.+\.json$", "doctolib/basic-booking.json"),
+    ("doctolib", r"^/availabilities\.json$", "doctolib/basic-availabilities.json"),
+    ("keldoc", r"^/api/patients/v2/timetables/\d+$", _keldoc_timetable),
+    ("keldoc", r"^/api/patients/v2/searches/resource$", "keldoc/center1-info.json"),
+    ("keldoc", r"^/api/patients/v2/clinics/\d+/specialties/\d+/cabinets$", "keldoc/center1-cabinet.json"),
+    ("maiia", r"^/api/pat-public/", _maiia_endpoint),
+    ("mapharma", r"^/api/public/calendar/", "mapharma/slots.json"),
+    ("ordoclic", r"^/v1/public/entities/profile/", "ordoclic/fetchslot-profile.json"),
+    ("ordoclic", r"^/v1/solar/entities/[^/]+/reasons$", "ordoclic/fetchslot-reasons.json"),
+    ("ordoclic", r"^/v1/solar/slots/availableSlots$", "ordoclic/fetchslot-slots.json"),
+    ("avecmondoc", r"^/api/Organizations/slug/", "avecmondoc/get_organization_slug.json"),
+    ("avecmondoc", r"^/api/Organizations/getConsultationReasons$", "avecmondoc/get_reasons.json"),
+    ("avecmondoc", r"^/api/BusinessHours/availabilitiesPerDay$", _avecmondoc_week),
+    ("mesoigner", r"^/api/v1/vaccination/centers/", "mesoigner/slots_available.json"),
+    ("bimedoc", r"^/vmd/pharmacy-with-slots/", "bimedoc/slots_available.json"),
+    ("valwin", r"^/global/api/meetings/v2/[^/]+/slots$", "valwin/slots_available.json"),
+]
+
+
+class FixtureReplay:
+    """
+    Transport httpx qui rejoue les fixtures enregistrées à la place des plateformes.
+
+    Chaque réponse est retardée de `latency` secondes (± `jitter` en proportion)
+    pour simuler le temps réseau.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, routes: list = ROUTES):
+        self.latency = latency
+        self.jitter = jitter
+        self.routes = [(platform, re.compile(pattern), responder) for platform, pattern, responder in routes]
+        self._cache: Dict[str, bytes] = {}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.latency > 0:
+            time.sleep(random.uniform(self.latency * (1 - self.jitter), self.latency * (1 + self.jitter)))
+        for _, pattern, responder in self.routes:
+            if not pattern.search(request.url.path):
+                continue
+            if callable(responder):
+                return responder(request)
+            return httpx.Response(200, content=self._read(responder), headers={"Content-Type": "application/json"})
+        return httpx.Response(404, content="")
+
+    def _read(self, name: str) -> bytes:
+        if name not in self._cache:
+            self._cache[name] = (FIXTURES_PATH / name).read_bytes()
+        return self._cache[name]
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self)
+
+
+def platform_clients() -> List[httpx.Client]:
+    """Les clients httpx partagés par les scrapers de créneaux, un ou plusieurs par plateforme."""
+    from scraper.avecmondoc import avecmondoc
+    from scraper.bimedoc import bimedoc
+    from scraper.doctolib import doctolib
+    from scraper.keldoc import keldoc, keldoc_center
+    from scraper.maiia import maiia_utils
+    from scraper.mapharma import mapharma
+    from scraper.mesoigner import mesoigner
+    from scraper.ordoclic import ordoclic
+    from scraper.valwin import valwin
+
+    modules = [avecmondoc, bimedoc, doctolib, keldoc, keldoc_center, maiia_utils, mapharma, mesoigner, ordoclic, valwin]
+    clients = []
+    for module in modules:
+        for value in vars(module).values():
+            if isinstance(value, httpx.Client) and value not in clients:
+                clients.append(value)
+    return clients
+
+
+def install(replay: FixtureReplay):
+    """
+    Branche le transport de rejeu sur les clients existants plutôt que de les remplacer :
+    ils sont aussi capturés comme valeurs par défaut des fonctions des scrapers.
+    À appeler avant la création du pool pour que les processus enfants en héritent.
+    """
+    transport = replay.transport()
+    for client in platform_clients():
+        client._transport = transport
+        client._mounts = {}
+
+
+def _with_index(centre: dict, index: int, url: str) -> dict:
+    centre = dict(centre)
+    centre["rdv_site_web"] = url.format(i=index)
+    centre["gid"] = f'{centre.get("gid", "bench")}{index}'
+    return centre
+
+
+def fixture_centres() -> Dict[str, Callable[[int], dict]]:
+    """Pour chaque plateforme, une fabrique de centres rejouables distincts à partir d'un index."""
+    mesoigner = load_fixture("mesoigner/mesoigner_center_info.json")
+    bimedoc = load_fixture("bimedoc/bimedoc_center_info.json")
+    avecmondoc = load_fixture("avecmondoc/centerdict.json")
+    keldoc = {
+        "gid": "keldoc",
+        "nom": "Groupe hospitalier Bretagne Sud",
+        "com_insee": "56121",
+        "type": "vaccination-center",
+        "booking": load_fixture("keldoc/center1-cabinet-16913.json"),
+    }
+    doctolib = {"gid": "doctolib", "nom": "Centre de vaccinations internationales", "com_insee": "07186"}
+    maiia = {"gid": "maiia", "nom": "Centre de vaccination de Romainville", "com_insee": "93063"}
+    mapharma = {"gid": "mapharma", "nom": "Pharmacie du centre", "com_insee": "97209", "type": "drugstore"}
+    ordoclic = {
+        "gid": "ordoclic",
+        "nom": "Pharmacie Océane",
+        "com_insee": "75115",
+        "type": "drugstore",
+    }
+    valwin = {"gid": "pharmabest75-plateau-lyon", "nom": "Grande Pharmacie du Plateau", "com_insee": "69389"}
+
+    return {
+        "doctolib": lambda i: _with_index(
+            doctolib,
+            i,
+            "https://partners.doctolib.fr/centre-de-vaccinations-internationales/ville1/centre{i}?pid=practice-165752",
+        ),
+        "keldoc": lambda i: _with_index(keldoc, i, KELDOC_CENTER_URL + "&vmd_bench={i}"),
+        "maiia": lambda i: _with_index(
+            maiia,
+            i,
+            "https://www.maiia.com/centre-de-vaccination/93230-romainville/centre-de-vaccination-de-romainville"
+            "?centerid=6000447d018ecf0e3f5715f2&vmd_bench={i}",
+        ),
+        "mapharma": lambda i: _with_index(mapharma, i, "https://mapharma.net/97200?c=60&l=1&vmd_bench={i}"),
+        "ordoclic": lambda i: _with_index(ordoclic, i, "https://app.ordoclic.fr/app/pharmacie/pharmacie-oceane-{i}"),
+        "avecmondoc": lambda i: _with_index(
+            avecmondoc, i, "https://patient.avecmondoc.com/fiche/structure/delphine-rousseau-159?vmd_bench={i}"
+        ),
+        "mesoigner": lambda i: _with_index(mesoigner, i, mesoigner["rdv_site_web"] + "?vmd_bench={i}"),
+        "bimedoc": lambda i: _with_index(bimedoc, i, bimedoc["rdv_site_web"] + "&vmd_bench={i}"),
+        "valwin": lambda i: {
+            **_with_index(valwin, i, "https://grandepharmacie-du-plateau-lyon.pharmabest.com/{i}"),
+            "gid": valwin["gid"],
+            "platform_is": "Valwin",
+        },
+    }
+
+
+def replay_centres(scale: int = 1, platforms: Optional[List[str]] = None) -> Iterator[dict]:
+    """Génère `scale` centres par plateforme, en alternant les plateformes comme `centre_iterator`."""
+    factories = fixture_centres()
+    platforms = platforms if platforms else list(factories)
+    for index in range(scale):
+        for platform in platforms:
+            yield factories[platform](index)
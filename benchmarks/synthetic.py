@@ -0,0 +1,222 @@
+"""
+Générateur de données synthétiques à l'échelle nationale.
+
+Produit des flux de `Creneau` / `PasDeCreneau` et des documents `info_centres.json`
+réalistes (répartition configurable par département, plateforme, vaccin et dose)
+pour éprouver `JSONExporter` et `stats_generation` sans interroger les plateformes.
+
+Usage : `python -m benchmarks.synthetic --centres 20000 --slots-per-centre 100 -o info_centres.json`
+"""
+
+import argparse
+import csv
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from random import Random
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import pytz
+from dateutil.tz import gettz
+
+from scraper.creneaux.creneau import Creneau, Lieu, PasDeCreneau, Plateforme
+from scraper.export.export_v2 import Departement
+from scraper.export.resource_centres import ResourceTousDepartements
+from scraper.pattern.center_location import CenterLocation
+from scraper.pattern.scraper_result import DRUG_STORE, GENERAL_PRACTITIONER, VACCINATION_CENTER
+from scraper.pattern.vaccine import Vaccine
+from utils.vmd_center_sort import sort_center
+from utils.vmd_config import get_conf_inputs, get_config
+
+# Poids relatifs, proches de la répartition observée en production
+DEFAULT_PLATFORMS = {
+    Plateforme.DOCTOLIB: 55,
+    Plateforme.MAIIA: 12,
+    Plateforme.KELDOC: 8,
+    Plateforme.MAPHARMA: 8,
+    Plateforme.ORDOCLIC: 6,
+    Plateforme.AVECMONDOC: 3,
+    Plateforme.MESOIGNER: 3,
+    Plateforme.BIMEDOC: 3,
+    Plateforme.VALWIN: 2,
+}
+DEFAULT_VACCINES = {Vaccine.PFIZER: 70, Vaccine.MODERNA: 25, Vaccine.JANSSEN: 3, Vaccine.ASTRAZENECA: 2}
+DEFAULT_DOSES = {"1": 15, "2": 10, "3": 65, "1_kid": 5, None: 5}
+DEFAULT_LIEU_TYPES = {VACCINATION_CENTER: 40, DRUG_STORE: 45, GENERAL_PRACTITIONER: 15}
+
+# Emprise de la France métropolitaine
+LONGITUDES = (-4.8, 8.2)
+LATITUDES = (42.3, 51.1)
+
+
+@dataclass
+class SyntheticCentre:
+    lieu: Lieu
+    slots: int
+    vaccines: List[Vaccine]
+    seed: int
+
+
+def departement_population() -> Dict[str, int]:
+    """Population par département, pour répartir les centres comme la population."""
+    try:
+        with open(get_conf_inputs()["from_main_branch"]["dep_pop"], encoding="utf8", newline="\n") as csvfile:
+            return {row["dep"]: int(row["departmentPopulation"]) for row in csv.DictReader(csvfile, delimiter=";")}
+    except (OSError, KeyError, ValueError):
+        return {}
+
+
+def default_departements() -> Dict[str, int]:
+    population = departement_population()
+    fallback = min(population.values()) if population else 1
+    return {departement.code: population.get(departement.code, fallback) for departement in Departement.all()}
+
+
+class WeightedChoice:
+    def __init__(self, weights: dict):
+        self.values = list(weights.keys())
+        self.cum_weights = []
+        total = 0
+        for weight in weights.values():
+            total += weight
+            self.cum_weights.append(total)
+
+    def __call__(self, rnd: Random):
+        return rnd.choices(self.values, cum_weights=self.cum_weights)[0]
+
+
+class SyntheticDataset:
+    """
+    Un jeu de centres tirés une fois pour toutes, dont on peut ensuite dérouler
+    les créneaux (`creneaux()`) ou le résumé (`info_centres()`) autant de fois que nécessaire.
+    Le tirage est reproductible à `seed` égal ; les créneaux ne sont jamais tous gardés en mémoire.
+    """
+
+    def __init__(
+        self,
+        centres: int = 1000,
+        slots_per_centre: float = 50,
+        available_ratio: float = 0.6,
+        next_days: int = get_config().get("scrape_on_n_days", 7),
+        departements: Optional[dict] = None,
+        platforms: Optional[dict] = None,
+        vaccines: Optional[dict] = None,
+        doses: Optional[dict] = None,
+        lieu_types: Optional[dict] = None,
+        now=datetime.now,
+        seed: int = 0,
+    ):
+        self.next_days = next_days
+        self.start = now(tz=gettz("Europe/Paris")).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        self.choose_departement = WeightedChoice(departements or default_departements())
+        self.choose_platform = WeightedChoice(platforms or DEFAULT_PLATFORMS)
+        self.choose_vaccine = WeightedChoice(vaccines or DEFAULT_VACCINES)
+        self.choose_dose = WeightedChoice(doses or DEFAULT_DOSES)
+        self.choose_lieu_type = WeightedChoice(lieu_types or DEFAULT_LIEU_TYPES)
+        self.seed = seed
+
+        rnd = Random(seed)
+        self.centres = [
+            self._centre(rnd, index, slots_per_centre, rnd.random() < available_ratio) for index in range(centres)
+        ]
+
+    def _centre(self, rnd: Random, index: int, slots_per_centre: float, available: bool) -> SyntheticCentre:
+        departement = self.choose_departement(rnd)
+        plateforme = self.choose_platform(rnd)
+        cp = f"{departement.replace('2A', '20').replace('2B', '20'):0<5}"
+        lieu = Lieu(
+            departement=departement,
+            nom=f"Centre synthétique {index}",
+            url=f"https://{plateforme.value.lower()}.example.com/centre-{index}",
+            lieu_type=self.choose_lieu_type(rnd),
+            internal_id=f"{plateforme.value.lower()}{index}",
+            location=CenterLocation(
+                longitude=round(rnd.uniform(*LONGITUDES), 6),
+                latitude=round(rnd.uniform(*LATITUDES), 6),
+                city=f"Ville {index}",
+                cp=cp,
+            ),
+            metadata={"address": f"{index} rue de la Santé, {cp} Ville {index}", "business_hours": None},
+            plateforme=plateforme,
+        )
+        # Distribution à longue traîne : quelques centres concentrent beaucoup de créneaux
+        slots = 1 + int(rnd.expovariate(1 / max(slots_per_centre - 1, 1e-9))) if available else 0
+        vaccines = list(dict.fromkeys(self.choose_vaccine(rnd) for _ in range(rnd.randint(1, 2))))
+        return SyntheticCentre(lieu=lieu, slots=slots, vaccines=vaccines, seed=rnd.getrandbits(32))
+
+    @property
+    def total_slots(self) -> int:
+        return sum(centre.slots for centre in self.centres)
+
+    def _slots(self, centre: SyntheticCentre) -> Iterator[Tuple[datetime, Vaccine, Optional[str]]]:
+        rnd = Random(centre.seed)
+        # Créneaux de 5 minutes, entre 8h et 20h, sur l'horizon de scraping
+        for _ in range(centre.slots):
+            day = rnd.randrange(self.next_days)
+            minutes = 8 * 60 + 5 * rnd.randrange(12 * 12)
+            horaire = (self.start + timedelta(days=day)).replace(hour=minutes // 60, minute=minutes % 60)
+            yield horaire, rnd.choice(centre.vaccines), self.choose_dose(rnd)
+
+    def creneaux(self) -> Iterator[Union[Creneau, PasDeCreneau]]:
+        for centre in self.centres:
+            lieu = centre.lieu
+            if not centre.slots:
+                yield PasDeCreneau(lieu=lieu)
+                continue
+            for horaire, vaccine, dose in self._slots(centre):
+                yield Creneau(
+                    horaire=horaire,
+                    lieu=lieu,
+                    reservation_url=lieu.url,
+                    dose=[dose] if dose else None,
+                    type_vaccin=[vaccine],
+                )
+
+    def info_centres(self) -> dict:
+        """Le document `info_centres.json` que produirait l'exporteur pour ces créneaux."""
+        resource = ResourceTousDepartements()
+        disponibles = []
+        indisponibles = []
+        for centre in self.centres:
+            summary = resource.centre(centre.lieu).default()
+            if not centre.slots:
+                indisponibles.append(summary)
+                continue
+            vaccines = set()
+            for horaire, vaccine, _ in self._slots(centre):
+                if not summary["prochain_rdv"] or horaire < summary["prochain_rdv"]:
+                    summary["prochain_rdv"] = horaire
+                vaccines.add(vaccine.value)
+            summary["appointment_count"] = centre.slots
+            summary["vaccine_type"] = sorted(vaccines)
+            disponibles.append(resource.centre_asdict(summary))
+        return {
+            "version": 1,
+            "last_updated": self.start.astimezone(pytz.timezone("Europe/Paris")).isoformat(),
+            "centres_disponibles": sorted(disponibles, key=sort_center),
+            "centres_indisponibles": indisponibles,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère un info_centres.json synthétique.")
+    parser.add_argument("--centres", "-c", type=int, default=20000)
+    parser.add_argument("--slots-per-centre", type=float, default=100, help="moyenne des centres disponibles")
+    parser.add_argument("--available-ratio", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", default="info_centres.json")
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset(
+        centres=args.centres,
+        slots_per_centre=args.slots_per_centre,
+        available_ratio=args.available_ratio,
+        seed=args.seed,
+    )
+    with open(args.output, "w") as outfile:
+        json.dump(dataset.info_centres(), outfile, indent=2)
+    print(f"{args.centres} centres, {dataset.total_slots} créneaux écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
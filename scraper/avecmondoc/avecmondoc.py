@@ -1,27 +1,30 @@
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from scraper.profiler import Profiling
 from scraper.pattern.scraper_result import DRUG_STORE, GENERAL_PRACTITIONER
 import httpx
 import json
 
 from datetime import datetime, timedelta
-from dateutil.parser import isoparse, parse
+from dateutil.parser import isoparse
 from pytz import timezone
 from typing import Iterator, Optional, Tuple
 from scraper.creneaux.creneau import Creneau, Lieu, Plateforme, PasDeCreneau
 from scraper.pattern.scraper_request import ScraperRequest
 from scraper.pattern.center_info import CenterInfo, CenterLocation
+from scraper.pattern.motive_classifier import motive_doses
 from scraper.pattern.vaccine import Vaccine, get_vaccine_name
 from utils.vmd_config import get_conf_platform, get_config
 from utils.vmd_utils import departementUtils, DummyQueue
 
-
 AVECMONDOC_CONF = get_conf_platform("avecmondoc")
 AVECMONDOC_ENABLED = AVECMONDOC_CONF.get("enabled", False)
 AVECMONDOC_API = AVECMONDOC_CONF.get("api", {})
 AVECMONDOC_SCRAPER = AVECMONDOC_CONF.get("center_scraper", {})
 AVECMONDOC_FILTERS = AVECMONDOC_CONF.get("filters", {})
+AVECMONDOC_WORKERS = AVECMONDOC_SCRAPER.get("workers", 8)
+AVECMONDOC_SLOT_WORKERS = AVECMONDOC_CONF.get("slot_workers", 5)
 AVECMONDOC_VALID_REASONS = AVECMONDOC_FILTERS.get("valid_reasons", [])
 AVECMONDOC_HEADERS = {
     "User-Agent": os.environ.get("AVECMONDOC_API_KEY", ""),
@@ -36,36 +39,49 @@ logger = logging.getLogger("scraper")
 paris_tz = timezone("Europe/Paris")
 
 
-def search(client: httpx.Client = DEFAULT_CLIENT) -> Optional[list]:
+def search_page(page: int, client: httpx.Client = DEFAULT_CLIENT) -> Optional[dict]:
     url = AVECMONDOC_API.get("search", "")
-    limit = AVECMONDOC_API.get("search_page_size", 10)
-    page = 1
-    result = {"data": [], "hasNextPage": True}
-    while result["hasNextPage"]:
-        payload = {"limit": limit, "page": page}
-        try:
-            r = client.get(url, params=payload)
-            r.raise_for_status()
-        except httpx.TimeoutException as hex:
-            logger.warning(f"{url} timed out (search)")
-            return None
-        except httpx.HTTPStatusError as hex:
-            logger.warning(f"{url} returned error {hex.response.status_code}")
-            logger.warning(r.content)
+    payload = {"limit": AVECMONDOC_API.get("search_page_size", 10), "page": page}
+    try:
+        r = client.get(url, params=payload)
+        r.raise_for_status()
+    except httpx.TimeoutException as hex:
+        logger.warning(f"{url} timed out (search)")
+        return None
+    except httpx.HTTPStatusError as hex:
+        logger.warning(f"{url} returned error {hex.response.status_code}")
+        logger.warning(r.content)
+        return None
+    try:
+        return r.json()
+    except json.decoder.JSONDecodeError as jde:
+        logger.warning(f"{url} raised {jde}")
+        return {"data": [], "hasNextPage": False}
+
+
+def search(client: httpx.Client = DEFAULT_CLIENT) -> Optional[list]:
+    result = search_page(1, client)
+    if result is None:
+        return None
+    # Le nombre de pages est connu dès la première : les suivantes sont demandées en parallèle
+    pages = range(2, (result.get("pages") or 1) + 1) if result.get("hasNextPage") else []
+    with ThreadPoolExecutor(max_workers=AVECMONDOC_WORKERS) as executor:
+        paged_results = list(executor.map(lambda page: search_page(page, client), pages))
+    page = len(pages) + 1
+    last_result = result
+    for paged_result in paged_results:
+        if paged_result is None:
             return None
-        try:
-            paged_result = r.json()
-        except json.decoder.JSONDecodeError as jde:
-            logger.warning(f"{url} raised {jde}")
-            break
+        result["data"].extend(paged_result.get("data", []))
+        last_result = paged_result
+    # Des pages ont pu apparaître entre-temps
+    while last_result.get("hasNextPage"):
         page += 1
-        if result["data"] == []:
-            result = paged_result
-            continue
-        result["hasNextPage"] = paged_result["hasNextPage"]
-        for item in paged_result["data"]:
-            result["data"].append(item)
-        # logger.info(f"Downloaded {j['page']}/{j['pages']}")
+        last_result = search_page(page, client)
+        if last_result is None:
+            return None
+        result["data"].extend(last_result.get("data", []))
+    result["hasNextPage"] = False
     return result
 
 
@@ -201,33 +217,47 @@ def get_availabilities(
     client: httpx.Client = DEFAULT_CLIENT,
     request: ScraperRequest = None,
 ) -> list:
-    availabilities = []
+    windows = []
     page_date = start_date
     while page_date < end_date:
-        week_availabilities = get_availabilities_week(reason_id, organization_id, page_date, client)
-        if request:
-            request.increase_request_count("slots" if page_date == start_date else "next-slots")
+        windows.append(page_date)
         page_date = page_date + timedelta(days=(AVECMONDOC_DAYS_PER_PAGE - 1))
 
-        for week_availability in week_availabilities:
-            if "slots" in week_availability:
-                availabilities.append(week_availability)
-            elif "nextAvailableBusinessHour" in week_availability:
-                next_available_business_hour_in_current_week = week_availability.get(
-                    "nextAvailableBusinessHourInCurrentWeek", False
-                )
-                next_available_business_hour = week_availability.get("nextAvailableBusinessHour", False)
-                # pas de date cette semaine ni plus tard -> on arrête
-                if (next_available_business_hour_in_current_week or next_available_business_hour) == False:
-                    page_date = end_date
-                    break
-                # ce champ peut être False ou un dict
-                if next_available_business_hour is False:
-                    continue
-                if "start" not in next_available_business_hour:
-                    continue
-                # on a trouvé la date du prochain slot, on se positionne à cette date
-                page_date = isoparse(next_available_business_hour["start"]).replace(tzinfo=None)
+    # Toutes les semaines sont demandées en parallèle ; les indications de prochaine disponibilité
+    # ne servent qu'à annuler les semaines devenues inutiles
+    availabilities = []
+    with ThreadPoolExecutor(max_workers=AVECMONDOC_SLOT_WORKERS) as executor:
+        futures = [
+            executor.submit(get_availabilities_week, reason_id, organization_id, window, client) for window in windows
+        ]
+        next_date = None
+        for window, future in zip(windows, futures):
+            if next_date is not None and window + timedelta(days=(AVECMONDOC_DAYS_PER_PAGE - 1)) <= next_date:
+                future.cancel()
+                continue
+            for week_availability in future.result() or []:
+                if "slots" in week_availability:
+                    availabilities.append(week_availability)
+                elif "nextAvailableBusinessHour" in week_availability:
+                    next_available_business_hour_in_current_week = week_availability.get(
+                        "nextAvailableBusinessHourInCurrentWeek", False
+                    )
+                    next_available_business_hour = week_availability.get("nextAvailableBusinessHour", False)
+                    # pas de date cette semaine ni plus tard -> on arrête
+                    if (next_available_business_hour_in_current_week or next_available_business_hour) == False:
+                        next_date = datetime.max
+                        break
+                    # ce champ peut être False ou un dict
+                    if next_available_business_hour is False:
+                        continue
+                    if "start" not in next_available_business_hour:
+                        continue
+                    # on a trouvé la date du prochain slot, les semaines précédentes sont inutiles
+                    next_date = isoparse(next_available_business_hour["start"]).replace(tzinfo=None)
+    if request:
+        for index, future in enumerate(futures):
+            if not future.cancelled():
+                request.increase_request_count("slots" if index == 0 else "next-slots")
     return availabilities
 
 
@@ -279,7 +309,7 @@ class AvecmonDoc:
                 date = isoparse(slot["businessHours"]["start"])
                 self.found_creneau(
                     Creneau(
-                        horaire=parse(slot["businessHours"]["start"]),
+                        horaire=date,
                         reservation_url=request.url,
                         type_vaccin=[vaccine],
                         lieu=self.lieu,
@@ -293,7 +323,10 @@ class AvecmonDoc:
     def fetch(self, request, client):
         url = request.get_url()
         slug = url.split("/")[-1]
-        organization = get_organization_slug(slug, client, request)
+        # L'organisation récupérée à la découverte du centre est réutilisée
+        organization = request.input_data
+        if organization is None:
+            organization = get_organization_slug(slug, client, request)
         if organization is None:
             return None
         if "error" in organization:
@@ -344,29 +377,7 @@ class AvecmonDoc:
 def get_vaccine_dose(motive_name: str) -> Optional[list]:
     if not motive_name:
         return None
-    dose = []
-    motive_low = motive_name.lower()
-    if (
-        "première" in motive_low 
-        or "premiere" in motive_low
-        or "1è" in motive_low
-    ):
-        dose.append(1)
-    if (
-        "deuxième" in motive_low
-        or "deuxieme" in motive_low
-        or "seconde" in motive_low
-        or "2è" in motive_low
-    ):
-        dose.append(2)
-    if (
-        "rappel" in motive_low
-        or "troisième" in motive_low
-        or "troisieme" in motive_low
-        or "3è" in motive_low
-    ):
-        dose.append(3)
-    return dose
+    return motive_doses(motive_name, "avecmondoc")
 
 def center_to_centerdict(center: CenterInfo) -> dict:
     center_dict = {}
@@ -395,7 +406,7 @@ def center_iterator(client: httpx.Client = DEFAULT_CLIENT) -> Iterator[dict]:
     if not AVECMONDOC_ENABLED:
         logger.warning("Avecmondoc scrap is disabled in configuration file.")
         return []
-    organization_slugs = []
+    organization_slugs = set()
     # l'api fait parfois un timeout au premier appel
     for _ in range(0, AVECMONDOC_CONF.get("search_tries", 2)):
         search_result = search(client)
@@ -405,21 +416,26 @@ def center_iterator(client: httpx.Client = DEFAULT_CLIENT) -> Iterator[dict]:
         return []
     if "data" not in search_result:
         return []
+    slugs = {}
     for structure in search_result["data"]:
         if structure.get("businessHoursCovidCount", 0) == 0:
             continue
-        slug = structure["url"].split("/")[-1]
-        organizations = [get_organization_slug(slug, client)]
-        valid_organizations = [organization for organization in organizations if has_valid_zipcode(organization)]
-        for organization in valid_organizations:
+        slugs.setdefault(structure["url"].split("/")[-1], None)
+    # Les organisations sont récupérées en parallèle, l'ordre de la recherche est conservé
+    with ThreadPoolExecutor(max_workers=AVECMONDOC_WORKERS) as executor:
+        for organization in executor.map(lambda slug: get_organization_slug(slug, client), slugs):
+            if not has_valid_zipcode(organization):
+                continue
             organization_slug = organization["slug"]
             if organization_slug in organization_slugs:
                 continue
-            organization_slugs.append(organization_slug)
+            organization_slugs.add(organization_slug)
             center = organization_to_center(organization)
             if center is None:
                 continue
-            yield center_to_centerdict(center)
+            center_dict = center_to_centerdict(center)
+            center_dict["booking"] = organization
+            yield center_dict
 
 
 def main():  #  pragma: no cover
@@ -1,7 +1,7 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from pytz import timezone as Timezone
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 from scraper.pattern.center_location import CenterLocation
 from scraper.pattern.scraper_request import ScraperRequest
@@ -33,6 +33,31 @@ class Lieu:
     atlas_gid: Optional[int] = None
 
 
+# Bits du masque des doses d'un créneau ; toute autre valeur de dose donne DOSE_OTHER
+DOSE_BITS = {"1": 1, "2": 2, "3": 4, "1_kid": 8}
+DOSE_OTHER = 16
+DOSE_MASK_SIZE = 32
+
+
+def get_dose_mask(dose) -> int:
+    """
+    >>> get_dose_mask(["1", 2])
+    3
+    >>> get_dose_mask([None])
+    16
+    >>> get_dose_mask(None)
+    0
+    """
+    if not dose:
+        return 0
+    if isinstance(dose, (str, int)):
+        dose = [dose]
+    mask = 0
+    for value in dose:
+        mask |= DOSE_OTHER if value is None else DOSE_BITS.get(str(value), DOSE_OTHER)
+    return mask
+
+
 @dataclass
 class Creneau:
     horaire: datetime
@@ -43,6 +68,26 @@ class Creneau:
     type_vaccin: Optional[List[Vaccine]] = None
 
     disponible: bool = True
+    # Calculé une fois à la création, pour les tags par dose
+    dose_mask: int = field(default=0, init=False, repr=False, compare=False)
+    # Calculés une fois par export, pour les ressources quotidiennes
+    day_origin: Optional[date] = field(default=None, init=False, repr=False, compare=False)
+    day_offset: int = field(default=0, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.dose_mask = get_dose_mask(self.dose)
+
+    def day_index(self, first_day: date) -> int:
+        """
+        Le jour du créneau en nombre de jours depuis `first_day`, mémorisé tant que `first_day` ne change pas.
+
+        >>> Creneau(horaire=datetime(2021, 5, 28, 9, 30), lieu=None, reservation_url="").day_index(date(2021, 5, 26))
+        2
+        """
+        if self.day_origin != first_day:
+            self.day_origin = first_day
+            self.day_offset = (self.horaire.date() - first_day).days
+        return self.day_offset
 
 
 @dataclass
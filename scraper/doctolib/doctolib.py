@@ -5,7 +5,7 @@ import os
 import re
 from datetime import timedelta, datetime
 from math import floor
-from typing import Dict, Iterator, List, Optional, Tuple, Set
+from typing import Dict, Iterator, List, Optional, Tuple, Set, Union
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 import dateutil
 import httpx
@@ -96,7 +96,6 @@ class DoctolibSlots:
 
     def _fetch(self, request: ScraperRequest) -> Optional[str]:
 
-        doublon_responses = 0
         centre = _parse_centre(request.get_url())
 
         # Doctolib fetches multiple vaccination centers sometimes
@@ -133,7 +132,8 @@ class DoctolibSlots:
                 raise RequestError(centre_api_url)
                 return None
 
-        if not self.is_practice_id_valid(request, rdata):
+        booking = DoctolibBooking(rdata)
+        if not self.is_practice_id_valid(request, booking):
             logger.warning(
                 f"Invalid practice ID for this Doctolib center. Practice_id will be corrected: {request.get_url()}"
             )
@@ -143,7 +143,7 @@ class DoctolibSlots:
                 raise DoublonDoctolib(centre)
 
         if practice_id:
-            practice_id, practice_same_adress = link_practice_ids(practice_id, rdata)
+            practice_id, practice_same_adress = link_practice_ids(practice_id, booking)
         if len(rdata.get("places", [])) >= 1 and practice_id is None:
             practice_id = rdata.get("places")[0].get("practice_ids", None)
 
@@ -165,7 +165,6 @@ class DoctolibSlots:
         if visit_motive_ids_by_vaccine is None:
             return None
 
-        all_agendas = parse_agenda_ids(rdata)
         first_availability = None
 
         start_date = request.get_start_date()
@@ -184,43 +183,63 @@ class DoctolibSlots:
 
         timetable_start_date = datetime.fromisoformat(start_date)
 
+        timetable_queries = self.plan_timetables(request, booking, visit_motive_ids_by_vaccine, practice_id)
+        for (motive_ids_q, agenda_ids_q, practice_ids_q), targets in timetable_queries.items():
+            availability = self.get_timetables(
+                request, targets, motive_ids_q, agenda_ids_q, practice_ids_q, timetable_start_date
+            )
+            if availability and (not first_availability or availability < first_availability):
+                first_availability = availability
+
+        return first_availability
+
+    def plan_timetables(
+        self,
+        request: ScraperRequest,
+        rdata: Union[dict, "DoctolibBooking"],
+        visit_motive_ids_by_vaccine: dict,
+        practice_id: list,
+    ) -> Dict[Tuple[str, str, str], List[Tuple[Vaccine, Optional[str]]]]:
+        """
+        Regroupe les motifs par requête de disponibilités (motif, agendas, pratiques) avant toute requête :
+        une requête identique n'est faite qu'une fois et ses créneaux sont attribués à chaque (vaccin, dose) concerné.
+        Un doublon est détecté ici, sans requête de disponibilités.
+        """
+        booking = DoctolibBooking.of(rdata)
+        doublon_responses = 0
+        timetable_queries = {}
         for dose, motives_for_dose in visit_motive_ids_by_vaccine.items():
             for motive in motives_for_dose:
                 visite_motive_id = motive["visit_motive"]
                 vaccine = motive["vaccine_name"]
-                agenda_ids, practice_ids, doublon_responses = _find_agenda_and_practice_ids(
-                    rdata, visite_motive_id, doublon_responses, practice_id_filter=practice_id
+                agenda_ids, practice_ids, doublon_responses = booking.find_agenda_and_practice_ids(
+                    visite_motive_id, doublon_responses, practice_id_filter=practice_id
                 )
 
                 if not agenda_ids or not practice_ids:
                     continue
-                agenda_ids = self.sort_agenda_ids(all_agendas, agenda_ids)
+                agenda_ids = booking.sort_agenda_ids(agenda_ids)
 
-                agenda_ids_q = "-".join(agenda_ids)
-                practice_ids_q = "-".join(practice_ids)
-                motive_ids_q = visite_motive_id
-                availability = self.get_timetables(
-                    request, vaccine, motive_ids_q, agenda_ids_q, practice_ids_q, timetable_start_date, dose=dose
-                )
-                if availability and (not first_availability or availability < first_availability):
-                    first_availability = availability
+                query = (str(visite_motive_id), "-".join(agenda_ids), "-".join(practice_ids))
+                targets = timetable_queries.setdefault(query, [])
+                if (vaccine, dose) not in targets:
+                    targets.append((vaccine, dose))
 
             if doublon_responses == 0:
                 raise DoublonDoctolib(request.get_url())
 
-        return first_availability
+        return timetable_queries
 
     def get_timetables(
         self,
         request: ScraperRequest,
-        vaccine,
+        targets: List[Tuple[Vaccine, Optional[str]]],
         motive_ids_q,
         agenda_ids_q: str,
         practice_ids_q: str,
         start_date: datetime,
         page: int = 1,
         first_availability: Optional[str] = None,
-        dose: Optional[int] = None,
     ) -> Optional[str]:
         """
         Get timetables recursively with `doctolib.pagination.days` as the number of days to query.
@@ -234,8 +253,7 @@ class DoctolibSlots:
         sdate, appt, ended, next_slot = self.get_appointments(
             request,
             start_date.date().strftime("%Y-%m-%d"),
-            vaccine,
-            dose,
+            targets,
             motive_ids_q,
             agenda_ids_q,
             practice_ids_q,
@@ -257,14 +275,13 @@ class DoctolibSlots:
                 return first_availability
             return self.get_timetables(
                 request,
-                vaccine,
+                targets,
                 motive_ids_q,
                 agenda_ids_q,
                 practice_ids_q,
                 next_fetch_date,
                 page=1 + max(0, floor(diff.days / PLATFORM_DAYS_PER_PAGE)) + page,
                 first_availability=first_availability,
-                dose=dose,
             )
         if not sdate:
             return first_availability
@@ -275,31 +292,15 @@ class DoctolibSlots:
             return first_availability
         return self.get_timetables(
             request,
-            vaccine,
+            targets,
             motive_ids_q,
             agenda_ids_q,
             practice_ids_q,
             start_date + timedelta(days=PLATFORM_DAYS_PER_PAGE),
             1 + page,
             first_availability=first_availability,
-            dose=dose,
         )
 
-    def sort_agenda_ids(self, all_agendas, ids) -> List[str]:
-        """
-        On Doctolib front-side, agenda ids are sorted using the center.json order
-        so we need to use all agendas in order to sort.
-
-        Because: 429620-440654-434343-434052-434337-447048-434338-433994-415613-440655-415615
-        won't give the same result as: 440654-429620-434343-434052-447048-434338-433994-415613-440655-415615-434337
-        -> seems to be a doctolib issue
-        """
-        new_agenda_list = []
-        for agenda in all_agendas:
-            if str(agenda) in ids:
-                new_agenda_list.append(str(agenda))
-        return new_agenda_list
-
     def pop_practice_id(self, request: ScraperRequest):
         """
         In some cases, practice id needs to be deleted
@@ -330,7 +331,7 @@ class DoctolibSlots:
         else:
             return None
 
-    def is_practice_id_valid(self, request: ScraperRequest, rdata: dict) -> bool:
+    def is_practice_id_valid(self, request: ScraperRequest, rdata: Union[dict, "DoctolibBooking"]) -> bool:
         """
         Some practice IDs are wrong and prevent people from booking an appointment.
         So if the practice id is invalid, this center does not seems to exist anymore.
@@ -340,20 +341,13 @@ class DoctolibSlots:
         # Not practice ID found
         if not pid:
             return True
-        pid = int(pid[0])
-        places = rdata.get("places", {})
-        for place in places:
-            practice_id = int(re.findall(r"\d+", place.get("id", ""))[0])
-            if pid == practice_id:
-                return True
-        return False
+        return int(pid[0]) in DoctolibBooking.of(rdata).place_ids
 
     def get_appointments(
         self,
         request: ScraperRequest,
         start_date: str,
-        vaccine: Vaccine,
-        dose: Optional[str],
+        targets: List[Tuple[Vaccine, Optional[str]]],
         motive_ids_q: str,
         agenda_ids_q: str,
         practice_ids_q: str,
@@ -405,18 +399,21 @@ class DoctolibSlots:
                 if not first_availability or sdate < first_availability:
                     first_availability = sdate
                     motive_availability = True
-                self.found_creneau(
-                    Creneau(
-                        horaire=dateutil.parser.parse(sdate),
-                        reservation_url=request.url,
-                        type_vaccin=[vaccine],
-                        lieu=self.lieu,
-                        dose=[dose],
+                horaire = dateutil.parser.parse(sdate)
+                for vaccine, dose in targets:
+                    self.found_creneau(
+                        Creneau(
+                            horaire=horaire,
+                            reservation_url=request.url,
+                            type_vaccin=[vaccine],
+                            lieu=self.lieu,
+                            dose=[dose],
+                        )
                     )
-                )
 
         if motive_availability:
-            request.add_vaccine_type(vaccine)
+            for vaccine, _ in targets:
+                request.add_vaccine_type(vaccine)
         # Sometimes Doctolib does not allow to see slots for next weeks
         # which is a weird move, but still, we have to stop here.
 
@@ -468,24 +465,18 @@ def _parse_centre(rdv_site_web: str) -> Optional[str]:
     return centre
 
 
-def link_practice_ids(practice_id: list, rdata: dict) -> Tuple[list, bool]:
+def link_practice_ids(practice_id: list, rdata: Union[dict, "DoctolibBooking"]) -> Tuple[list, bool]:
     same_adress = False
     if not practice_id:
         return practice_id, same_adress
-    places = rdata.get("places")
-    agendas = rdata.get("agendas")
+    booking = DoctolibBooking.of(rdata)
 
-    if not places:
+    if not booking.rdata.get("places"):
         return practice_id, same_adress
     base_place = None
-    place_ids = []
 
-    for place in places:
-        place_id = place.get("id", None)
-        if not place_id:
-            continue
-        place_ids.append(int(re.findall(r"\d+", place_id)[0]))
-        if int(re.findall(r"\d+", place_id)[0]) == int(practice_id[0]):
+    for place_id, place in booking.places:
+        if place_id == int(practice_id[0]):
             # Indispensable pour eviter une erreur si le pid est en establishment-xxx
             # En effet, dans ce cas le pid change dans practice_ids et c'est lui qui est correct
             if practice_id[0] not in place.get("practice_ids", []):
@@ -493,23 +484,14 @@ def link_practice_ids(practice_id: list, rdata: dict) -> Tuple[list, bool]:
             base_place = place
             break
     if not base_place:
-        return place_ids, same_adress
+        return [place_id for place_id, _ in booking.places], same_adress
 
-    for place in places:
+    for place_id, place in booking.places:
         if place.get("id") == base_place.get("id"):
             continue
         if place.get("address") == base_place.get("address"):  # Tideous check
-            valid_practice_id = 0
-            for agenda in agendas:
-                if agenda.get("practice_id") == int(re.findall(r"\d+", place.get("id"))[0]):
-                    if (
-                        int(re.findall(r"\d+", place.get("id"))[0])
-                        in list(map(int, list(agenda["visit_motive_ids_by_practice_id"].keys())))
-                        and len(agenda["visit_motive_ids_by_practice_id"][re.findall(r"\d+", place.get("id"))[0]]) > 0
-                    ):
-                        valid_practice_id += 1
-            if valid_practice_id == 0:
-                practice_id.append(int(re.findall(r"\d+", place.get("id"))[0]))
+            if place_id not in booking.practices_with_own_motives:
+                practice_id.append(place_id)
                 same_adress = True
     return practice_id, same_adress
 
@@ -603,36 +585,93 @@ def _find_visit_motive_id(rdata: dict, visit_motive_category_id: list = None) ->
 
 
 def _find_agenda_and_practice_ids(
-    data: dict, visit_motive_id: int, responses=0, practice_id_filter: list = None
+    data: Union[dict, "DoctolibBooking"], visit_motive_id: int, responses=0, practice_id_filter: list = None
 ) -> Tuple[list, list]:
     """
     Etant donné une réponse à /booking/<centre>.json, renvoie tous les
     "agendas" et "pratiques" (jargon Doctolib) qui correspondent au motif de visite.
     On a besoin de ces valeurs pour récupérer les disponibilités.
     """
-    agenda_ids = set()
-    practice_ids = set()
-    for agenda in data.get("agendas", []):
-        if (
-            "practice_id" in agenda
-            and practice_id_filter is not None
-            and agenda["practice_id"] not in practice_id_filter
-        ):
-            continue
-        if agenda["booking_disabled"]:
-            continue
-        for practice_id in practice_id_filter:
+    return DoctolibBooking.of(data).find_agenda_and_practice_ids(visit_motive_id, responses, practice_id_filter)
+
+
+class DoctolibBooking:
+    """
+    Index d'une réponse à /booking/<centre>.json, construit une seule fois par centre :
+    identifiants numériques des lieux, position des agendas, agendas réservables de chaque motif
+    et motifs de chaque pratique par agenda.
+    """
+
+    def __init__(self, rdata: dict):
+        self.rdata = rdata
+        # (identifiant numérique, lieu) : "practice-165752" -> 165752
+        self.places: List[Tuple[int, dict]] = [
+            (int(re.findall(r"\d+", place["id"])[0]), place) for place in rdata.get("places") or [] if place.get("id")
+        ]
+        self.place_ids: Set[int] = {place_id for place_id, _ in self.places}
+        self.agenda_positions: Dict[str, int] = {
+            str(agenda_id): position for position, agenda_id in enumerate(parse_agenda_ids(rdata))
+        }
+        self.agendas: List[dict] = rdata.get("agendas") or []
+        # Pour chaque agenda : pratique -> motifs
+        self.practice_motives: List[Dict[int, Set[int]]] = []
+        # Motif -> position des agendas réservables qui le proposent
+        self.motive_agendas: Dict[int, List[int]] = defaultdict(list)
+        # Pratiques dont l'agenda propose des motifs pour elle-même
+        self.practices_with_own_motives: Set[int] = set()
+        for position, agenda in enumerate(self.agendas):
+            practice_motives = {
+                int(practice_id): set(motives)
+                for practice_id, motives in agenda.get("visit_motive_ids_by_practice_id", {}).items()
+            }
+            self.practice_motives.append(practice_motives)
+            if practice_motives.get(agenda.get("practice_id")):
+                self.practices_with_own_motives.add(agenda["practice_id"])
+            if agenda["booking_disabled"]:
+                continue
+            for motive_id in set().union(*practice_motives.values()):
+                self.motive_agendas[motive_id].append(position)
+
+    @classmethod
+    def of(cls, rdata: Union[dict, "DoctolibBooking"]) -> "DoctolibBooking":
+        return rdata if isinstance(rdata, cls) else cls(rdata)
+
+    def find_agenda_and_practice_ids(
+        self, visit_motive_id: int, responses=0, practice_id_filter: list = None
+    ) -> Tuple[list, list, int]:
+        agenda_ids = set()
+        practice_ids = set()
+        for position in self.motive_agendas.get(visit_motive_id, []):
+            agenda = self.agendas[position]
             if (
-                practice_id in list(map(int, list(agenda["visit_motive_ids_by_practice_id"].keys())))
-                and visit_motive_id in agenda["visit_motive_ids_by_practice_id"][str(practice_id)]
+                "practice_id" in agenda
+                and practice_id_filter is not None
+                and agenda["practice_id"] not in practice_id_filter
             ):
-                responses += 1
+                continue
+            practice_motives = self.practice_motives[position]
+            for practice_id in practice_id_filter or []:
+                if visit_motive_id in practice_motives.get(practice_id, ()):
+                    responses += 1
+
+            for pratice_id_agenda, visit_motive_list_agenda in practice_motives.items():
+                if visit_motive_id in visit_motive_list_agenda:  # Some motives are present in this agenda
+                    practice_ids.add(str(pratice_id_agenda))
+                    agenda_ids.add(str(agenda["id"]))
+        return sorted(agenda_ids), sorted(practice_ids), responses
+
+    def sort_agenda_ids(self, ids) -> List[str]:
+        """
+        On Doctolib front-side, agenda ids are sorted using the center.json order
+        so we need to use all agendas in order to sort.
 
-        for pratice_id_agenda, visit_motive_list_agenda in agenda["visit_motive_ids_by_practice_id"].items():
-            if visit_motive_id in visit_motive_list_agenda:  # Some motives are present in this agenda
-                practice_ids.add(str(pratice_id_agenda))
-                agenda_ids.add(str(agenda["id"]))
-    return sorted(agenda_ids), sorted(practice_ids), responses
+        Because: 429620-440654-434343-434052-434337-447048-434338-433994-415613-440655-415615
+        won't give the same result as: 440654-429620-434343-434052-447048-434338-433994-415613-440655-415615-434337
+        -> seems to be a doctolib issue
+        """
+        return sorted(
+            (agenda_id for agenda_id in ids if agenda_id in self.agenda_positions), key=self.agenda_positions.get
+        )
 
 
 def is_allowing_online_appointments(rdata: dict) -> bool:
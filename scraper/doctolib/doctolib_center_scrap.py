@@ -1,5 +1,7 @@
 import httpx
 import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.vmd_config import get_conf_platform
 from utils.vmd_logger import get_logger
@@ -18,7 +20,7 @@ from scraper.doctolib.doctolib_parsers import (
     parse_atlas,
 )
 
-from typing import List, Tuple, Dict
+from typing import List, Set, Tuple, Dict
 import json
 from urllib import parse
 
@@ -29,17 +31,34 @@ BASE_URL_DEPARTEMENT = DOCTOLIB_CONF.get("api").get("scraper_dep")
 BOOKING_URL = DOCTOLIB_CONF.get("api").get("booking")
 
 BASE_URL = DOCTOLIB_CONF.get("build_url")
+BOOKING_WORKERS = SCRAPER_CONF.get("booking_workers", 8)
+# Requêtes Doctolib simultanées, tous processus confondus : autant qu'avec un pool de processus sans threads
+MAX_CONCURRENT_REQUESTS = SCRAPER_CONF.get("max_concurrent_requests", 50)
 
 DEFAULT_CLIENT = httpx.Client()
 
 logger = get_logger()
 
+_request_slots = None
+
+
+def init_request_slots(request_slots):
+    """Initialisation des processus du pool : le sémaphore qui borne les requêtes Doctolib simultanées."""
+    global _request_slots
+    _request_slots = request_slots
+
 
 class DoctolibCenterScraper:
     def __init__(self, client: httpx.Client = DEFAULT_CLIENT):
         self._client = client
         self.atlas_centers = parse_atlas()
 
+    def _get(self, url: str) -> httpx.Response:
+        if _request_slots is None:
+            return self._client.get(url, headers=DOCTOLIB_HEADERS)
+        with _request_slots:
+            return self._client.get(url, headers=DOCTOLIB_HEADERS)
+
     def run_departement_scrap(self, departement: str):
         logger.info(f"[Doctolib centers] Parsing pages of departement {departement} through department SEO link")
         centers_departements = self.parse_pages_departement(departement)
@@ -51,7 +70,7 @@ class DoctolibCenterScraper:
         departement = department_urlify(departement)
         page_id = 1
         page_has_centers = True
-        liste_urls = []
+        liste_urls = set()
 
         for weird_dep in SCRAPER_CONF.get("dep_conversion"):
             if weird_dep == departement:
@@ -71,12 +90,10 @@ class DoctolibCenterScraper:
         return centers
 
     def parse_page_centers_departement(
-        self, departement: str, page_id: int, liste_urls: list
+        self, departement: str, page_id: int, liste_urls: Set[str]
     ) -> Tuple[List[dict], bool]:
         try:
-            r = self._client.get(
-                BASE_URL_DEPARTEMENT.format(department_urlify(departement), page_id), headers=DOCTOLIB_HEADERS
-            )
+            r = self._get(BASE_URL_DEPARTEMENT.format(department_urlify(departement), page_id))
             data = r.json()
         except:
 
@@ -85,19 +102,28 @@ class DoctolibCenterScraper:
 
         return self.centers_from_page(data, liste_urls, departement, page_id)
 
-    def centers_from_page(self, department_page_data: Dict, liste_urls, departement, page_id):
-        centers_page = []
-        # TODO parallelism can be put here
+    def centers_from_page(self, department_page_data: Dict, liste_urls: Set[str], departement, page_id):
+        doctors = []
+        stop = False
         for payload in department_page_data["data"]["doctors"]:
             # If the "doctor" hasn't already been checked
-            if payload["link"] not in liste_urls:
-                liste_urls.append(payload["link"])
-                # One "doctor" can have multiple places, hence center_from_doctor_dict returns a list
-                centers, stop = self.center_from_doctor_dict(payload, departement, page_id)
+            if payload["link"] in liste_urls:
+                continue
+            liste_urls.add(payload["link"])
+            doctors.append(payload)
+            # Les résultats suivants ne correspondent plus à la recherche
+            if not payload["exact_match"]:
+                stop = True
+                break
+
+        # Les pages de réservation des "doctors" de la page sont récupérées en parallèle, l'ordre est conservé
+        with ThreadPoolExecutor(max_workers=BOOKING_WORKERS) as executor:
+            results = executor.map(lambda doctor: self.center_from_doctor_dict(doctor, departement, page_id), doctors)
+            centers_page = []
+            # One "doctor" can have multiple places, hence center_from_doctor_dict returns a list
+            for centers, _ in results:
                 centers_page += centers
-                if stop:
-                    return centers_page, True
-        return centers_page, False
+        return centers_page, stop
 
     def center_from_doctor_dict(self, doctor_dict, departement, page_id) -> Tuple[dict, bool]:
         liste_centres = []
@@ -122,7 +148,7 @@ class DoctolibCenterScraper:
         output = None
 
         try:
-            req = self._client.get(internal_api_url, headers=DOCTOLIB_HEADERS)
+            req = self._get(internal_api_url)
             req.raise_for_status()
             data = req.json()
             output = data.get("data", {})
@@ -143,26 +169,32 @@ def fetch_department(department: str):
 
 
 def parse_doctolib_centers(page_limit=None) -> List[dict]:
-    centers = []
-    unique_center_urls = []
-
-    with multiprocessing.Pool(50) as pool:
+    start = time.perf_counter()
+    parse_atlas()  # Téléchargé une fois, avant que le pool n'en hérite
+    request_slots = multiprocessing.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+    with multiprocessing.Pool(50, initializer=init_request_slots, initargs=(request_slots,)) as pool:
         center_lists = pool.imap_unordered(fetch_department, get_departements(excluded_departments=["Guyane"]))
         centers = []
 
         for center_list in center_lists:
             centers.extend(center_list)
 
-        centers = list(filter(is_vaccination_center, centers))  # Filter vaccination centers
-        centers = list(map(center_reducer, centers))  # Remove fields irrelevant to the front
-
-        for item in list(centers):
-            if item.get("rdv_site_web") in unique_center_urls:
-                centers.remove(item)
-                continue
-            unique_center_urls.append(item.get("rdv_site_web"))
-
-        return centers
+    found = len(centers)
+    centers = filter(is_vaccination_center, centers)  # Filter vaccination centers
+    centers = map(center_reducer, centers)  # Remove fields irrelevant to the front
+
+    # Dédoublonnage par URL, en gardant la première occurrence
+    unique_centers = {}
+    for item in centers:
+        unique_centers.setdefault(item.get("rdv_site_web"), item)
+    centers = parse_atlas().resolve_ambiguous(list(unique_centers.values()))
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"[Doctolib centers] {found} lieux parcourus, {len(centers)} centres retenus en {elapsed:.1f}s "
+        f"({found / max(elapsed, 1e-9):.1f} lieux/s)"
+    )
+    return centers
 
 
 if __name__ == "__main__":  # pragma: no cover
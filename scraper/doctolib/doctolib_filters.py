@@ -25,10 +25,11 @@ def is_category_relevant(category):
     return False
 
 
+DOCTOLIB_VACCINATION_MOTIVES = frozenset(int(item) for item in DOCTOLIB_FILTERS.get("motives", {}).keys())
+
+
 # Filter by relevant appointments
 def is_appointment_relevant(motive_id):
-
-    vaccination_motives = [int(item) for item in DOCTOLIB_FILTERS["motives"].keys()]
     """Tell if an appointment name is related to COVID-19 vaccination
 
     Example
@@ -41,7 +42,7 @@ def is_appointment_relevant(motive_id):
     if not motive_id:
         return False
 
-    if motive_id in vaccination_motives:
+    if motive_id in DOCTOLIB_VACCINATION_MOTIVES:
         return True
 
     return False
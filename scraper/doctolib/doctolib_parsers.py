@@ -2,9 +2,9 @@ from types import DynamicClassAttribute
 from typing import Dict, List, Optional
 
 from scraper.pattern.scraper_result import VACCINATION_CENTER
+from utils.vmd_atlas import AtlasIndex, get_atlas_index
 from utils.vmd_config import get_conf_platform, get_conf_inputs
 from utils.vmd_utils import departementUtils, format_phone_number
-import requests
 import json
 from urllib import parse
 
@@ -49,29 +49,7 @@ def parse_doctor(doctor_dict: Dict) -> Dict:
     }
 
 
-def get_atlas_correct_match(atlas_matches, infos_page, atlas_center_list):
-    correct_atlas_gid = None
-
-    req = requests.get(
-        "https://api-adresse.data.gouv.fr/search/",
-        params=[("q", infos_page["address"]), ("postcode", infos_page["cp"])],
-    )
-    req.raise_for_status()
-
-    try:
-        data = req.json()
-        id_adr = data["features"][0]["properties"]["id"]
-        matching_atlas_for_id = [
-            center_id for center_id, center_data in atlas_center_list.items() if center_data["id_adresse"] == id_adr
-        ]
-        if matching_atlas_for_id:
-            correct_atlas_gid = matching_atlas_for_id[0]
-    except:
-        return None
-    return correct_atlas_gid
-
-
-def parse_center_places(center_output: Dict, url, atlas_center_list) -> List[Dict]:
+def parse_center_places(center_output: Dict, url, atlas_center_list: AtlasIndex) -> List[Dict]:
 
     # if url in atlas_center_list.keys():
     #     atlas_gid = atlas_center_list[url]
@@ -80,19 +58,19 @@ def parse_center_places(center_output: Dict, url, atlas_center_list) -> List[Dic
     extracted_visit_motives = [vm.get("name") for vm in center_output.get("visit_motives", [])]
     extracted_visit_ids = [vm.get("ref_visit_motive_id") for vm in center_output.get("visit_motives", [])]
 
-    atlas_matches = [center_id for center_id, center_data in atlas_center_list.items() if url in center_data["url_end"]]
-    if len(atlas_matches) == 0:
-        atlas_gid = None
+    atlas_matches = atlas_center_list.matches(url)
+    atlas_gid = None
     if len(atlas_matches) == 1:
         atlas_gid = max(atlas_matches)
 
     liste_infos_page = []
     for place in places:
         infos_page = parse_place(place)
-        if len(atlas_matches) > 1:
-            atlas_gid = get_atlas_correct_match(atlas_matches, infos_page, atlas_center_list)
         infos_page["gid"] = gid
         infos_page["atlas_gid"] = atlas_gid
+        if len(atlas_matches) > 1:
+            # Départagé par l'adresse une fois tous les centres connus (AtlasIndex.resolve_ambiguous)
+            infos_page["atlas_matches"] = atlas_matches
         infos_page["visit_motives"] = extracted_visit_motives
         infos_page["visit_motives_ids"] = extracted_visit_ids
         infos_page["booking"] = center_output
@@ -117,28 +95,8 @@ def parse_place(place: Dict) -> Dict:
     }
 
 
-def parse_atlas():
-    url = get_conf_inputs().get("from_data_gouv_website").get("centers_gouv")
-    data = requests.get(url).json()
-    doctolib_gouv_centers = {}
-    for center in data["features"]:
-        centre_pro = center["properties"].get("c_reserve_professionels_sante", False)
-        url = center["properties"].get("c_rdv_site_web", None)
-        id_adresse = center["properties"].get("c_id_adr", None)
-        gid = center["properties"].get("c_gid", None)
-
-        if centre_pro:
-            continue
-        if not url:
-            continue
-        if not gid:
-            continue
-        if not "doctolib" in url:
-            continue
-        end_url = f'{parse.urlsplit(url).path.split("/")[-1]}'
-
-        doctolib_gouv_centers[gid] = {"url_end": end_url, "id_adresse": id_adresse}
-    return doctolib_gouv_centers
+def parse_atlas() -> AtlasIndex:
+    return get_atlas_index("doctolib")
 
 
 def parse_doctolib_business_hours(place: dict) -> Optional[dict]:
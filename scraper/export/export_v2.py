@@ -1,12 +1,12 @@
-from utils.vmd_utils import q_iter
+from utils.vmd_utils import iter_bulks
 from scraper.creneaux.creneau import Creneau
 from scraper.export.resource_centres import ResourceParDepartement, ResourceTousDepartements
-from scraper.export.resource_creneaux_quotidiens import ResourceCreneauxQuotidiens
+from scraper.export.resource_creneaux_quotidiens import CreneauxQuotidiensCounters, ResourceCreneauxQuotidiens
 from scraper.pattern.tags import CURRENT_TAGS
 import os
 import json
 import logging
-from typing import Iterator
+from typing import Iterator, List
 from dataclasses import dataclass
 import sys
 from utils.vmd_config import get_conf_outputs, get_config
@@ -15,29 +15,42 @@ logger = logging.getLogger("scraper")
 
 
 class JSONExporter:
-    def __init__(self, departements=None, outpath_format="data/output/{}.json"):
+    def __init__(self, departements=None, outpath_format="data/output/{}.json", previous_centres: dict = None):
         self.outpath_format = outpath_format
         departements = departements if departements else Departement.all()
         resources_departements = {
-            departement.code: ResourceParDepartement(departement.code) for departement in departements
+            departement.code: ResourceParDepartement(departement.code, previous_centres=previous_centres)
+            for departement in departements
         }
+        # Un seul décompte des créneaux quotidiens pour tous les départements, rendu par département
+        self.creneaux_quotidiens = CreneauxQuotidiensCounters(
+            tags=CURRENT_TAGS, departements={departement.code for departement in departements}
+        )
         resources_creneaux_quotidiens = {
-            f"{departement.code}/creneaux-quotidiens": ResourceCreneauxQuotidiens(departement.code, tags=CURRENT_TAGS)
+            f"{departement.code}/creneaux-quotidiens": ResourceCreneauxQuotidiens(
+                departement.code, counters=self.creneaux_quotidiens
+            )
             for departement in departements
         }
+        self.info_centres = ResourceTousDepartements(previous_centres=previous_centres)
+        self.listeners = [self.info_centres, *resources_departements.values()]
         self.resources = {
-            "info_centres": ResourceTousDepartements(),
+            "info_centres": self.info_centres,
             **resources_departements,
             **resources_creneaux_quotidiens,
         }
 
     def export(self, creneaux: Iterator[Creneau]):
-        count = 0
-        for creneau in creneaux:
-            count += 1
+        self.export_bulks(iter_bulks(creneaux))
 
-            for resource in self.resources.values():
-                resource.on_creneau(creneau)
+    def export_bulks(self, bulks: Iterator[List[Creneau]]):
+        count = 0
+        for bulk in bulks:
+            count += len(bulk)
+            for creneau in bulk:
+                for resource in self.listeners:
+                    resource.on_creneau(creneau)
+            self.creneaux_quotidiens.on_creneaux(bulk)
 
         lieux_avec_dispo = len(self.resources["info_centres"].centres_disponibles)
         lieux_sans_dispo = len(self.resources["info_centres"].centres_indisponibles)
@@ -16,8 +16,9 @@ blocklist = get_blocklist_urls()
 
 
 class ResourceTousDepartements(Resource):
-    def __init__(self, now=datetime.now):
+    def __init__(self, now=datetime.now, previous_centres: dict = None):
         self.now = now
+        self.previous_centres = previous_centres
         self.centres_disponibles = {}
         self.centres_indisponibles = {}
         self.centres_bloques_mais_disponibles = {}
@@ -93,28 +94,39 @@ class ResourceTousDepartements(Resource):
         }
 
     def asdict(self):
+        last_updated = self.now(tz=pytz.timezone("Europe/Paris")).replace(microsecond=0).isoformat()
         return {
             "version": 1,
-            "last_updated": self.now(tz=pytz.timezone("Europe/Paris")).replace(microsecond=0).isoformat(),
+            "last_updated": last_updated,
             "centres_disponibles": sorted(
-                [self.centre_asdict(c) for c in self.centres_disponibles.values()], key=sort_center
+                [self.centre_asdict(c, last_updated) for c in self.centres_disponibles.values()], key=sort_center
             ),
-            "centres_indisponibles": [self.centre_asdict(c) for c in self.centres_indisponibles.values()],
+            "centres_indisponibles": [self.centre_asdict(c, last_updated) for c in self.centres_indisponibles.values()],
         }
 
-    def centre_asdict(self, centre):
+    def centre_asdict(self, centre, last_updated=None):
         return {
             **centre,
-            "prochain_rdv": centre["prochain_rdv"].replace(microsecond=0).isoformat()
-            if centre["prochain_rdv"]
-            else None,
+            "prochain_rdv": (
+                centre["prochain_rdv"].replace(microsecond=0).isoformat() if centre["prochain_rdv"] else None
+            ),
             "vaccine_type": centre["vaccine_type"],
+            **self.last_scan(centre, last_updated),
         }
 
+    def last_scan(self, centre, last_updated) -> dict:
+        # Sans les centres de l'exécution précédente, on ne sait pas quand un centre a eu des disponibilités
+        if self.previous_centres is None:
+            return {}
+        if centre["prochain_rdv"]:
+            return {"last_scan_with_availabilities": last_updated}
+        previous = self.previous_centres.get(centre["url"], {})
+        return {"last_scan_with_availabilities": previous.get("last_scan_with_availabilities")}
+
 
 class ResourceParDepartement(ResourceTousDepartements):
-    def __init__(self, departement, now=datetime.now):
-        super().__init__(now=now)
+    def __init__(self, departement, now=datetime.now, previous_centres: dict = None):
+        super().__init__(now=now, previous_centres=previous_centres)
         self.departement = departement
 
     def on_creneau(self, creneau: Creneau):
@@ -1,89 +1,152 @@
 import dateutil
+from array import array
+from collections import Counter
 from dateutil.tz import gettz
 from datetime import datetime, timedelta
-from typing import Iterator, Union
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 from .resource import Resource
-from scraper.creneaux.creneau import Creneau, Lieu, Plateforme, PasDeCreneau
+from scraper.creneaux.creneau import DOSE_MASK_SIZE, Creneau, Lieu, Plateforme, PasDeCreneau
+from scraper.pattern.tags import CompiledTags, tag_all
 from utils.vmd_config import get_config
 
 DEFAULT_NEXT_DAYS = get_config().get("scrape_on_n_days", 7)
 
-DEFAULT_TAGS = {"all": [lambda creneau: True]}
+DEFAULT_TAGS = {"all": [tag_all]}
 
 
-class ResourceCreneauxQuotidiens(Resource):
-    def __init__(self, departement, next_days=DEFAULT_NEXT_DAYS, now=datetime.now, tags=DEFAULT_TAGS):
+class CreneauxQuotidiensCounters(Resource):
+    """
+    Décompte des créneaux quotidiens de plusieurs départements dans des tableaux denses d'entiers :
+    `totals[cell]` et `counts[cell * len(tags) + tag]`, où `cell = lieu * days + day` et `lieu` est
+    l'index du lieu dans `lieux`. Les créneaux sont comptés par paquets ; les `ResourceCreneauxQuotidiens`
+    des départements sont rendues depuis ces tableaux.
+    """
+
+    def __init__(
+        self,
+        next_days=DEFAULT_NEXT_DAYS,
+        now=datetime.now,
+        tags=DEFAULT_TAGS,
+        departements: Optional[Set[str]] = None,
+    ):
         super().__init__()
-        self.departement = departement
-        self.now = now
-        self.next_days = next_days
         today = now(tz=gettz("Europe/Paris"))
-        self.dates = {}
-        for days_from_now in range(0, next_days + 1):
-            day = today + timedelta(days=days_from_now)
-            date = as_date(day)
-            self.dates[date] = ResourceCreneauxParDate(date=date, tags=tags)
+        self.first_day = today.date()
+        self.dates = [as_date(today + timedelta(days=days_from_now)) for days_from_now in range(0, next_days + 1)]
+        self.days = len(self.dates)
+        self.departements = departements
+        self.tags = CompiledTags.of(tags)
+        # Incréments des tags par masque de doses, et tags qui doivent être évalués sur chaque créneau
+        self.dose_increments = [
+            [(tag, table[dose_mask]) for tag, (table, _) in enumerate(self.tags.tests) if table[dose_mask]]
+            for dose_mask in range(DOSE_MASK_SIZE)
+        ]
+        self.other_tags = [(tag, others) for tag, (_, others) in enumerate(self.tags.tests) if others]
+        self.lieux: List[Tuple[str, str]] = []
+        self.lieu_index: Dict[Tuple[str, str], int] = {}
+        # Les lieux de chaque (département, jour), dans l'ordre de leur premier créneau
+        self.lieux_par_jour: Dict[Tuple[str, int], List[int]] = {}
+        self.totals = array("I")
+        self.counts = array("I")
+        self._empty_totals = array("I", [0] * self.days)
+        self._empty_counts = array("I", [0] * (self.days * len(self.tags.names)))
+
+    def _add_lieu(self, key: Tuple[str, str]) -> int:
+        index = len(self.lieux)
+        self.lieux.append(key)
+        self.lieu_index[key] = index
+        self.totals.extend(self._empty_totals)
+        self.counts.extend(self._empty_counts)
+        return index
 
     def on_creneau(self, creneau: Union[Creneau, PasDeCreneau]):
-        if creneau.disponible and creneau.lieu.departement == self.departement:
-            date = as_date(creneau.horaire)
-            if date in self.dates:
-                self.dates[date].on_creneau(creneau)
+        self.on_creneaux((creneau,))
+
+    def on_creneaux(self, creneaux: Iterable[Union[Creneau, PasDeCreneau]]):
+        """Compte un paquet de créneaux : les tags par dose sont incrémentés une fois par (lieu, jour, masque)."""
+        tags_count = len(self.tags.names)
+        cells = Counter()
+        for creneau in creneaux:
+            if not creneau.disponible:
+                continue
+            lieu = creneau.lieu
+            if self.departements is not None and lieu.departement not in self.departements:
+                continue
+            day = creneau.day_index(self.first_day)
+            if not 0 <= day < self.days:
+                continue
+            key = (lieu.departement, lieu.internal_id)
+            index = self.lieu_index.get(key)
+            if index is None:
+                index = self._add_lieu(key)
+            cell = index * self.days + day
+            cells[cell, creneau.dose_mask] += 1
+            for tag, others in self.other_tags:
+                for qualifies in others:
+                    if qualifies(creneau):
+                        self.counts[cell * tags_count + tag] += 1
+
+        for (cell, dose_mask), count in cells.items():
+            if not self.totals[cell]:
+                index, day = divmod(cell, self.days)
+                self.lieux_par_jour.setdefault((self.lieux[index][0], day), []).append(index)
+            self.totals[cell] += count
+            for tag, increment in self.dose_increments[dose_mask]:
+                self.counts[cell * tags_count + tag] += increment * count
+
+    def creneaux_quotidiens(self, departement: str) -> List[dict]:
+        names = self.tags.names
+        creneaux_quotidiens = []
+        for day, date in enumerate(self.dates):
+            total = 0
+            creneaux_par_lieu = []
+            for index in self.lieux_par_jour.get((departement, day), []):
+                cell = index * self.days + day
+                total += self.totals[cell]
+                offset = cell * len(names)
+                creneaux_par_lieu.append(
+                    {
+                        "lieu": self.lieux[index][1],
+                        "creneaux_par_tag": [
+                            {"tag": name, "creneaux": self.counts[offset + tag]} for tag, name in enumerate(names)
+                        ],
+                    }
+                )
+            creneaux_quotidiens.append({"date": date, "total": total, "creneaux_par_lieu": creneaux_par_lieu})
+        return creneaux_quotidiens
 
     def asdict(self):
-        return {
-            "departement": self.departement,
-            "creneaux_quotidiens": [
-                date.asdict() for date in self.dates.values() if isinstance(date, ResourceCreneauxParDate)
-            ],
-        }
+        departements = sorted({departement for departement, _ in self.lieux})
+        return {departement: self.creneaux_quotidiens(departement) for departement in departements}
 
 
-class ResourceCreneauxParDate(Resource):
-    def __init__(self, date: str, tags=DEFAULT_TAGS):
+class ResourceCreneauxQuotidiens(Resource):
+    def __init__(
+        self,
+        departement,
+        next_days=DEFAULT_NEXT_DAYS,
+        now=datetime.now,
+        tags=DEFAULT_TAGS,
+        counters: Optional[CreneauxQuotidiensCounters] = None,
+    ):
         super().__init__()
-        self.date = date
-        self.total = 0
-        self.tags = tags
-        self.lieux = {}
+        self.departement = departement
+        self.now = now
+        self.next_days = next_days
+        # Des compteurs partagés entre départements sont alimentés par l'exporteur, pas par cette ressource
+        self.owns_counters = counters is None
+        self.counters = counters or CreneauxQuotidiensCounters(next_days, now, tags, departements={departement})
 
     def on_creneau(self, creneau: Union[Creneau, PasDeCreneau]):
-        if creneau.disponible and as_date(creneau.horaire) == self.date:
-            self.total += 1
-            if not creneau.lieu.internal_id in self.lieux:
-                self.lieux[creneau.lieu.internal_id] = ResourceCreneauxParLieu(
-                    internal_id=creneau.lieu.internal_id, tags=self.tags
-                )
-
-            self.lieux[creneau.lieu.internal_id].on_creneau(creneau)
+        if self.owns_counters:
+            self.counters.on_creneau(creneau)
 
     def asdict(self):
         return {
-            "date": self.date,
-            "total": self.total,
-            "creneaux_par_lieu": [lieu.asdict() for lieu in self.lieux.values()],
+            "departement": self.departement,
+            "creneaux_quotidiens": self.counters.creneaux_quotidiens(self.departement),
         }
 
 
-class ResourceCreneauxParLieu(Resource):
-    def __init__(self, internal_id: str, tags=DEFAULT_TAGS):
-        super().__init__()
-        self.internal_id = internal_id
-        self.total = 0
-        self.tags = tags
-        self.par_tag = {tag: {"tag": tag, "creneaux": 0} for tag in tags.keys()}
-
-    def on_creneau(self, creneau: Union[Creneau, PasDeCreneau]):
-        if creneau.disponible and creneau.lieu.internal_id == self.internal_id:
-            self.total += 1
-            for tag, qualifies_list in self.tags.items():
-                for qualifies in qualifies_list:
-                    if qualifies(creneau):
-                        self.par_tag[tag]["creneaux"] += 1
-
-    def asdict(self):
-        return {"lieu": self.internal_id, "creneaux_par_tag": list(self.par_tag.values())}
-
-
 def as_date(datetime):
     return datetime.isoformat()[:10]
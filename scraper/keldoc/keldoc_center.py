@@ -1,8 +1,8 @@
 import logging
 import os
 import time
-from math import floor
-from typing import Optional, Union, Iterable, List
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Tuple
 from urllib.parse import urlsplit, parse_qs
 import datetime as dt
 from dateutil.parser import isoparse
@@ -30,12 +30,18 @@ else:
     KELDOC_PAGES_NUMBER = (NUMBER_OF_SCRAPED_DAYS // KELDOC_DAYS_PER_PAGE) + 1
 
 KELDOC_SLOT_TIMEOUT = KELDOC_CONF.get("timeout", 20)
+KELDOC_SLOT_WORKERS = KELDOC_CONF.get("slot_workers", 4)
 
 DEFAULT_CLIENT = httpx.Client(timeout=timeout, headers=KELDOC_HEADERS)
 logger = logging.getLogger("scraper")
 paris_tz = timezone("Europe/Paris")
 
 
+def timetable_key(motive: dict) -> Tuple[str, Tuple[int, ...]]:
+    """Deux motifs de même identifiant sur les mêmes agendas partagent le même calendrier."""
+    return motive["id"], tuple(motive["agendas"])
+
+
 class KeldocCenter:
     def __init__(self, request: ScraperRequest, client: httpx.Client = None, creneau_q=DummyQueue):
         self.request = request
@@ -50,108 +56,124 @@ class KeldocCenter:
     def found_creneau(self, creneau):
         self.creneau_q.put(creneau)
 
-    def get_timetables(
-        self,
-        start_date: dt.datetime,
-        motive_id: str,
-        agenda_ids: List[int],
-        page: int = 1,
-        timetable=None,
-        run: float = 0,
-    ) -> Iterable[Union[Optional[dict], float]]:
+    def get_calendar(self, motive_id: str, agenda_ids: List[int], start_date: dt.datetime) -> dict:
         """
-        Get timetables recursively with KELDOC_DAYS_PER_PAGE as the number of days to query.
-        Recursively limited by KELDOC_PAGES_NUMBER and appends new availabilities to a ’timetable’,
-        freshly initialized at the beginning.
-        Uses date as a reference for next availability and in order to avoid useless requests when
-        we already know if a timetable is empty.
+        Une page du calendrier d'un motif : KELDOC_DAYS_PER_PAGE jours à partir de `start_date`.
+        Les erreurs httpx sont levées et traitées par l'appelant.
         """
-        start_time = time.time()
-        if timetable is None:
-            timetable = {}
-        if run >= KELDOC_SLOT_TIMEOUT:
-            return timetable, run
         calendar_url = API_KELDOC_CALENDAR.format(motive_id)
-
         end_date = (start_date + dt.timedelta(days=KELDOC_DAYS_PER_PAGE - 1)).strftime("%Y-%m-%d")
         logger.debug(
-            f"get_timetables -> start_date: {start_date} end_date: {end_date} "
-            f"motive: {motive_id} agenda: {agenda_ids} (page: {page})"
+            f"get_calendar -> start_date: {start_date} end_date: {end_date} motive: {motive_id} agenda: {agenda_ids}"
         )
         calendar_params = {
             "from": start_date.strftime("%Y-%m-%d"),
             "to": end_date,
             "agenda_ids[]": agenda_ids,
         }
-        self.request.increase_request_count("slots")
-        try:
-            calendar_req = self.client.get(calendar_url, params=calendar_params)
-            calendar_req.raise_for_status()
-        except httpx.TimeoutException as hex:
-            logger.warning(
-                f"Keldoc request timed out for center: {self.base_url} (calendar request)"
-                f" celendar_url: {calendar_url}"
-                f" calendar_params: {calendar_params}"
-            )
-            self.request.increase_request_count("time-out")
-            return timetable, run
+        calendar_req = self.client.get(calendar_url, params=calendar_params)
+        calendar_req.raise_for_status()
+        return calendar_req.json()
 
-        except httpx.HTTPStatusError as hex:
-            logger.warning(
-                f"Keldoc request returned error {hex.response.status_code} "
-                f"for center: {self.base_url} (calendar request)"
-            )
-            self.request.increase_request_count("error")
-            return timetable, run
-
-        except (httpx.RemoteProtocolError, httpx.ConnectError) as hex:
-            logger.warning(f"Keldoc raise error {hex} for center: {self.base_url} (calendar request)")
-            self.request.increase_request_count("error")
-            return timetable, run
-        current_timetable = calendar_req.json()
-        run += time.time() - start_time
-        # No fresh timetable
-        if not current_timetable:
-            return timetable, run
-        # Get the first date only
-        if "date" in current_timetable:
-            if "date" not in timetable:
-                timetable["date"] = current_timetable.get("date")
-            """
-            Optimize query count by jumping directly to the first availability date by using ’date’ key
-            Checks for the presence of the ’availabilities’ attribute, even if it's not supposed to be set
-            """
-            if "availabilities" not in current_timetable:
-                next_expected_date = start_date + dt.timedelta(days=KELDOC_DAYS_PER_PAGE - 1)
-                next_fetch_date = isoparse(current_timetable["date"])
-                diff = next_fetch_date.replace(tzinfo=None) - next_expected_date.replace(tzinfo=None)
-
-                if page >= KELDOC_PAGES_NUMBER or run >= KELDOC_SLOT_TIMEOUT:
-                    return timetable, run
-                return self.get_timetables(
-                    next_fetch_date,
-                    motive_id,
-                    agenda_ids,
-                    1 + max(0, floor(diff.days / (KELDOC_DAYS_PER_PAGE - 1))) + page,
-                    timetable,
-                    run,
+    def merge_calendars(self, windows: List[dt.datetime], calendars: List[Future], deadline: float) -> dict:
+        """
+        Fusionne dans l'ordre les pages du calendrier d'un motif en un ’timetable’.
+        Le champ ’date’ (prochaine disponibilité) annule les pages qui la précèdent ;
+        une page vide, une erreur ou l'échéance du centre arrêtent le parcours.
+        """
+        timetable = {}
+        next_date = None
+        for window, future in zip(windows, calendars):
+            window_end = window + dt.timedelta(days=KELDOC_DAYS_PER_PAGE - 1)
+            if next_date is not None and window_end.replace(tzinfo=None) < next_date:
+                future.cancel()
+                continue
+            try:
+                current_timetable = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except (FutureTimeoutError, CancelledError):
+                break
+            except httpx.TimeoutException:
+                logger.warning(f"Keldoc request timed out for center: {self.base_url} (calendar request)")
+                self.request.increase_request_count("time-out")
+                break
+            except httpx.HTTPStatusError as hex:
+                logger.warning(
+                    f"Keldoc request returned error {hex.response.status_code} "
+                    f"for center: {self.base_url} (calendar request)"
                 )
-
-        # Insert availabilities
-        if "availabilities" in current_timetable:
-            if "availabilities" not in timetable:
-                timetable["availabilities"] = current_timetable.get("availabilities")
-            else:
-                timetable["availabilities"].update(current_timetable.get("availabilities"))
+                self.request.increase_request_count("error")
+                break
+            except (httpx.RemoteProtocolError, httpx.ConnectError) as hex:
+                logger.warning(f"Keldoc raise error {hex} for center: {self.base_url} (calendar request)")
+                self.request.increase_request_count("error")
+                break
+            # No fresh timetable
+            if not current_timetable:
+                break
+            # Get the first date only
+            if "date" in current_timetable:
+                if "date" not in timetable:
+                    timetable["date"] = current_timetable.get("date")
+                # Pas de disponibilité sur cette page : on saute directement à la prochaine disponibilité
+                if "availabilities" not in current_timetable:
+                    next_date = isoparse(current_timetable["date"]).replace(tzinfo=None)
+            # Insert availabilities
+            if "availabilities" in current_timetable:
+                if "availabilities" not in timetable:
+                    timetable["availabilities"] = current_timetable.get("availabilities")
+                else:
+                    timetable["availabilities"].update(current_timetable.get("availabilities"))
+        for future in calendars:
+            future.cancel()
         # Pop date because it prevents availability count
         if timetable.get("availabilities") and timetable.get("date"):
             timetable.pop("date")
+        return timetable
 
-        if page >= KELDOC_PAGES_NUMBER or run >= KELDOC_SLOT_TIMEOUT:
-            return timetable, run
-        return self.get_timetables(
-            start_date + dt.timedelta(days=KELDOC_DAYS_PER_PAGE - 1), motive_id, agenda_ids, 1 + page, timetable, run
-        )
+    def get_timetables(self, start_date: dt.datetime, motives: List[dict]) -> Dict[Tuple, dict]:
+        """
+        Get timetables of all motives, indexed by timetable_key, over KELDOC_PAGES_NUMBER pages
+        of KELDOC_DAYS_PER_PAGE days.
+        Toutes les pages de tous les motifs sont demandées en parallèle sous une seule échéance
+        KELDOC_SLOT_TIMEOUT pour le centre, une seule fois pour des motifs identiques (même motif, mêmes agendas) ;
+        à l'échéance, les requêtes encore en attente sont annulées.
+        """
+        deadline = time.monotonic() + KELDOC_SLOT_TIMEOUT
+        windows = [
+            start_date + dt.timedelta(days=page * (KELDOC_DAYS_PER_PAGE - 1))
+            for page in range(int(KELDOC_PAGES_NUMBER))
+        ]
+        agendas = {}
+        for motive in motives:
+            agendas.setdefault(timetable_key(motive), motive["agendas"])
+
+        executor = ThreadPoolExecutor(max_workers=KELDOC_SLOT_WORKERS)
+        futures = {key: [] for key in agendas}
+        # Les premières pages de chaque motif passent en premier
+        for window in windows:
+            for key, agenda_ids in agendas.items():
+                futures[key].append(executor.submit(self.get_calendar, key[0], agenda_ids, window))
+        timetables = {}
+        try:
+            for key, calendars in futures.items():
+                timetables[key] = self.merge_calendars(windows, calendars, deadline)
+        finally:
+            late = [future for calendars in futures.values() for future in calendars if not future.done()]
+            for future in late:
+                future.cancel()
+            # Les requêtes déjà parties se terminent en arrière-plan, leur résultat est ignoré
+            executor.shutdown(wait=False)
+        for calendars in futures.values():
+            for future in calendars:
+                if not future.cancelled():
+                    self.request.increase_request_count("slots")
+        if late and time.monotonic() >= deadline:
+            logger.warning(
+                f"Keldoc calendar requests exceeded {KELDOC_SLOT_TIMEOUT}s for center: {self.base_url}, "
+                f"{len(late)} requests cancelled"
+            )
+            self.request.increase_request_count("time-out")
+        return timetables
 
     def count_appointements(self, appointments: list, start_date: str, end_date: str) -> int:
         paris_tz = timezone("Europe/Paris")
@@ -170,30 +192,28 @@ class KeldocCenter:
     def find_first_availability(self, start_date: str):
         if not self.vaccine_motives:
             return None, 0
+        motives = [
+            relevant_motive
+            for relevant_motive in self.vaccine_motives
+            if "id" in relevant_motive and relevant_motive.get("agendas")
+        ]
+        start_time = time.time()
+        timetables = self.get_timetables(isoparse(start_date), motives)
+        logger.debug(
+            f"get_timetables -> result [{len(timetables)} timetables] -> runtime: {round(time.time() - start_time, 2)}s"
+        )
         # Find next availabilities
         first_availability = None
         appointments = []
-        for relevant_motive in self.vaccine_motives:
-            if "id" not in relevant_motive or "agendas" not in relevant_motive:
-                continue
-            motive_id = relevant_motive.get("id", None)
+        for relevant_motive in motives:
             vaccine = relevant_motive.get("vaccine_type")
-            agenda_ids = relevant_motive.get("agendas", None)
             dose = relevant_motive.get("dose", None)
-
-            if not agenda_ids:
-                continue
-            timetables, runtime = self.get_timetables(isoparse(start_date), motive_id, agenda_ids)
-            logger.debug(
-                f"get_timetables -> result [motive: {motive_id} agenda: {agenda_ids}] -> runtime: {round(runtime, 2)}s"
-            )
-            date, appointments = parse_keldoc_availability(self, timetables, appointments, vaccine, dose)
+            timetables_motive = timetables.get(timetable_key(relevant_motive))
+            date, appointments = parse_keldoc_availability(self, timetables_motive, appointments, vaccine, dose)
             if date is None:
                 continue
             self.request.add_vaccine_type(vaccine)
             # Compare first available date
             if first_availability is None or date < first_availability:
                 first_availability = date
-            if not timetables or "availabilities" not in timetables:
-                continue
         return first_availability, len(appointments)
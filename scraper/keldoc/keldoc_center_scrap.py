@@ -5,6 +5,7 @@ from typing import List, Optional
 import requests
 import httpx
 import csv
+from utils.vmd_atlas import AtlasIndex, get_atlas_index
 from utils.vmd_config import get_conf_platform, get_conf_inputs
 from utils.vmd_logger import get_logger
 from utils.vmd_utils import department_urlify, departementUtils
@@ -60,54 +61,8 @@ def set_center_type(center_data: dict):
     return center_type
 
 
-def parse_atlas():
-    url = get_conf_inputs().get("from_data_gouv_website").get("centers_gouv")
-    data = requests.get(url).json()
-    keldoc_gouv_centers = {}
-    for center in data["features"]:
-        centre_pro = center["properties"].get("c_reserve_professionels_sante", False)
-        url = center["properties"].get("c_rdv_site_web", None)
-        id_adresse = center["properties"].get("c_id_adr", None)
-        gid = center["properties"].get("c_gid", None)
-
-        if centre_pro:
-            continue
-        if not url:
-            continue
-        if not gid:
-            continue
-
-        if not "keldoc" in url:
-            continue
-        if "redirect" in url:
-            parsed = parse.parse_qs(
-                parse.urlparse(center["properties"]["c_rdv_site_web"]).query, keep_blank_values=True
-            )
-            url = f'http://keldoc.com/{parsed["dom"][0]}/{parsed["inst"][0]}/{parsed["user"][0]}'
-
-        end_url = f'{parse.urlsplit(url).path.split("/")[3]}'
-
-        keldoc_gouv_centers[gid] = {"url_end": end_url, "id_adresse": id_adresse}
-    return keldoc_gouv_centers
-
-
-def get_atlas_correct_match(infos_page, atlas_center_list):
-    data = requests.get(
-        "https://api-adresse.data.gouv.fr/search/",
-        params=[("q", infos_page["address"]), ("postcode", infos_page["cp"])],
-    ).json()
-    correct_atlas_gid = None
-
-    try:
-        id_adr = data["features"][0]["properties"]["id"]
-        matching_atlas_for_id = [
-            center_id for center_id, center_data in atlas_center_list.items() if center_data["id_adresse"] == id_adr
-        ]
-        if matching_atlas_for_id:
-            correct_atlas_gid = matching_atlas_for_id[0]
-    except:
-        return None
-    return correct_atlas_gid
+def parse_atlas() -> AtlasIndex:
+    return get_atlas_index("keldoc")
 
 
 class KeldocCenterScraper:
@@ -180,12 +135,8 @@ class KeldocCenterScraper:
             gid = f'{resources["id"]}'
         atlas_gid = None
 
-        atlas_matches = [
-            center_id
-            for center_id, center_data in self.atlas_centers.items()
-            if parse.urlsplit(url_with_query).path.split("/")[-1] in center_data["url_end"]
-            or parse.urlsplit(url_with_query).path.split("/")[-2] in center_data["url_end"]
-        ]
+        url_path = parse.urlsplit(url_with_query).path.split("/")
+        atlas_matches = self.atlas_centers.matches(url_path[-1], url_path[-2])
 
         data = {
             "nom": center["title"],
@@ -206,7 +157,8 @@ class KeldocCenterScraper:
         if len(atlas_matches) == 1:
             atlas_gid = max(atlas_matches)
         if len(atlas_matches) > 1:
-            atlas_gid = get_atlas_correct_match(data, self.atlas_centers)
+            # Départagé par l'adresse une fois tous les centres connus (AtlasIndex.resolve_ambiguous)
+            data["atlas_matches"] = atlas_matches
 
         data["type"] = set_center_type(data)
         data["atlas_gid"] = atlas_gid
@@ -262,6 +214,7 @@ def parse_keldoc_centers(page_limit=None) -> List[dict]:
     centers = []
     unique_center_urls = []
 
+    parse_atlas()  # Téléchargé une fois, avant que le pool n'en hérite
     with multiprocessing.Pool(50) as pool:
         center_lists = pool.imap_unordered(fetch_department, get_departements())
         centers = []
@@ -274,7 +227,7 @@ def parse_keldoc_centers(page_limit=None) -> List[dict]:
                 centers.remove(item)
                 continue
             unique_center_urls.append(item.get("rdv_site_web"))
-        return centers
+        return parse_atlas().resolve_ambiguous(centers)
 
 
 def parse_keldoc_resource_url(center_url: str) -> Optional[str]:
@@ -4,6 +4,7 @@ from datetime import datetime
 
 from httpx import TimeoutException
 from scraper.keldoc.keldoc_routes import API_KELDOC_MOTIVES
+from scraper.pattern.motive_classifier import get_motive_classifier
 from scraper.pattern.vaccine import get_vaccine_name
 from scraper.pattern.scraper_request import ScraperRequest
 from utils.vmd_config import get_conf_platform, get_config
@@ -94,24 +95,7 @@ def is_appointment_relevant(appointment_name: str) -> bool:
 
 
 def keldoc_dose_number(motive):
-
-    if any([tag.lower() in motive.lower() for tag in KELDOC_FILTERS.get("kid_first_dose_filter")]):
-        dose = "1_kid"
-        return dose
-
-    if any([tag.lower() in motive.lower() for tag in KELDOC_FILTERS.get("rappel_filter")]) and not any(
-        [tag.lower() in motive.lower() for tag in KELDOC_FILTERS.get("immuno_filter")]
-    ):
-        dose = "3"
-        return dose
-
-    if any([tag.lower() in motive.lower() for tag in KELDOC_FILTERS.get("dose2_filter")]):
-        dose = "2"
-        return dose
-
-    if any([tag.lower() in motive.lower() for tag in KELDOC_FILTERS.get("dose1_filter")]):
-        dose = "1"
-        return dose
+    return get_motive_classifier("keldoc").dose(motive)
 
 
 # Filter by relevant specialties
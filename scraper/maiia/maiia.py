@@ -2,15 +2,18 @@ import json
 import logging
 import httpx
 
+from concurrent.futures import ThreadPoolExecutor
+
 import datetime as dt
 from pytz import timezone
 
-from typing import Dict, Iterator, List, Optional, Tuple, Set
+from typing import Dict, Iterator, List, Optional, Tuple, Set, Union
 from dateutil.parser import isoparse, parse
 from urllib import parse as urlparse
 from urllib.parse import quote, parse_qs
 from typing import List, Optional, Tuple
 from scraper.profiler import Profiling
+from scraper.pattern.motive_classifier import get_motive_classifier
 from scraper.pattern.vaccine import get_vaccine_name
 from scraper.pattern.scraper_request import ScraperRequest
 from scraper.maiia.maiia_utils import get_paged, MAIIA_LIMIT, DEFAULT_CLIENT
@@ -38,6 +41,7 @@ NUMBER_OF_SCRAPED_DAYS = get_config().get("scrape_on_n_days", 28)
 MAIIA_DOSES = PLATFORM_SCRAPER.get("dose_types")
 
 MAIIA_DO_NOT_SCRAP_NAME = PLATFORM_SCRAPER.get("excluded_names", [])
+MAIIA_REASON_WORKERS = PLATFORM_CONF.get("reason_workers", 4)
 
 SCRAPE_ONLY_ATLAS = get_config().get("scrape_only_atlas_centers", False)
 
@@ -52,27 +56,8 @@ def fetch_slots(request: ScraperRequest, creneau_q=DummyQueue, client: httpx.Cli
 
 
 def get_vaccine_type_from_name(motive_name):
-    if not motive_name:
-        return None
-    dose = None
-    if "première" in motive_name.lower() or "premiere" in motive_name.lower() or "1" in motive_name.lower():
-        dose = 1
-    if (
-        "deuxième" in motive_name.lower()
-        or "deuxieme" in motive_name.lower()
-        or "seconde" in motive_name.lower()
-        or "2" in motive_name.lower()
-    ):
-        dose = 2
-    if (
-        "rappel" in motive_name.lower()
-        or "troisième" in motive_name.lower()
-        or "troisieme" in motive_name.lower()
-        or "3" in motive_name.lower()
-    ):
-        dose = 3
-
-    return dose
+    dose = get_motive_classifier("maiia").dose(motive_name)
+    return int(dose) if dose else None
 
 
 class MaiiaSlots:
@@ -109,7 +94,10 @@ class MaiiaSlots:
             return None
         center_id = url_query["centerid"][0]
 
-        reasons = get_reasons(center_id, client=self._client, request=request)
+        # Les motifs sont embarqués dans la liste des centres par maiia_center_scrap
+        reasons = request.input_data
+        if reasons is None:
+            reasons = get_reasons(center_id, client=self._client, request=request)
         if not reasons:
             return None
         self.lieu = Lieu(
@@ -137,12 +125,15 @@ class MaiiaSlots:
         request.update_appointment_count(slots_count)
         return first_availability.isoformat()
 
-    def parse_slots(self, slots: list, request: ScraperRequest, dose: int = None) -> Optional[dt.datetime]:
+    def parse_slots(
+        self, slots: list, request: ScraperRequest, dose: Union[int, List[int]] = None
+    ) -> Optional[dt.datetime]:
         if not slots:
             return None
         first_availability = None
-        if dose:
+        if isinstance(dose, int):
             dose = [dose]
+        dose = dose or None
         for slot in slots:
             self.found_creneau(
                 Creneau(
@@ -177,7 +168,8 @@ class MaiiaSlots:
             r.raise_for_status()
         except httpx.HTTPStatusError as hex:
             logger.warning(f"{url} returned error {hex.response.status_code}")
-            request.increase_request_count("error")
+            if request:
+                request.increase_request_count("error")
             return None
         result = r.json()
         if "firstPhysicalStartDateTime" in result:
@@ -250,31 +242,45 @@ class MaiiaSlots:
         end_date = (date + dt.timedelta(days=NUMBER_OF_SCRAPED_DAYS)).isoformat()
         first_availability = None
         slots_count = 0
+
+        # Les motifs de même nom partagent les mêmes créneaux : une seule recherche par nom, avec leurs doses
+        doses_by_name: Dict[str, List[int]] = {}
         for consultation_reason in reasons:
-            consultation_reason_name_quote = quote(consultation_reason.get("name"), "")
             if any([motive.lower() in consultation_reason["name"].lower() for motive in MAIIA_DO_NOT_SCRAP_NAME]):
                 continue
-
-            if "injectionType" in consultation_reason:
-                slots = self.get_slots(
-                    center_id, consultation_reason_name_quote, start_date, end_date, client=client, request=request
-                )
-                dose = None
-                dose_name = consultation_reason["injectionType"]
-
-                if dose_name:
-                    if dose_name != "NONE":
-                        dose = MAIIA_DOSES[dose_name]
-                    else:
-                        if not "covid" in consultation_reason.get("name").lower():
-                            continue
-                if not dose:
-                    dose = get_vaccine_type_from_name(consultation_reason.get("name"))
-
+            if "injectionType" not in consultation_reason:
+                continue
+            dose = None
+            dose_name = consultation_reason["injectionType"]
+            if dose_name:
+                if dose_name != "NONE":
+                    dose = MAIIA_DOSES[dose_name]
+                elif not "covid" in consultation_reason.get("name").lower():
+                    continue
+            if not dose:
+                dose = get_vaccine_type_from_name(consultation_reason.get("name"))
+            doses = doses_by_name.setdefault(consultation_reason.get("name"), [])
+            if dose and dose not in doses:
+                doses.append(dose)
+
+        # Les motifs sont cherchés en parallèle, les créneaux trouvés sont traités dans l'ordre des motifs
+        names = list(doses_by_name)
+
+        def search(name: str) -> Tuple[Optional[list], Optional[dict]]:
+            # Chaque recherche compte ses requêtes à part : elles sont reportées sur `request` dans le thread principal
+            counter = ScraperRequest(request.url, request.start_date) if request else None
+            slots = self.get_slots(center_id, quote(name, ""), start_date, end_date, client=client, request=counter)
+            return slots, counter.requests if counter else None
+
+        with ThreadPoolExecutor(max_workers=MAIIA_REASON_WORKERS) as executor:
+            for name, (slots, requests) in zip(names, executor.map(search, names)):
+                for request_type, count in (requests or {}).items():
+                    for _ in range(count):
+                        request.increase_request_count(request_type)
                 if slots:
                     for slot in slots:
-                        slot["vaccine_type"] = get_vaccine_name(consultation_reason.get("name"))
-                slot_availability = self.parse_slots(slots, request, dose)
+                        slot["vaccine_type"] = get_vaccine_name(name)
+                slot_availability = self.parse_slots(slots, request, sorted(doses_by_name[name]))
                 if slot_availability is None:
                     continue
                 slots_count += len(slots)
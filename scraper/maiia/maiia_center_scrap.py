@@ -2,17 +2,19 @@ import httpx
 import json
 import logging
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from utils.vmd_atlas import AtlasIndex, get_atlas_index
 from utils.vmd_config import get_conf_platform, get_conf_inputs
 from utils.vmd_utils import departementUtils, format_phone_number
 from scraper.pattern.vaccine import get_vaccine_name
 from scraper.pattern.scraper_result import DRUG_STORE, VACCINATION_CENTER
+from .maiia import get_reasons
 from .maiia_utils import get_paged
 from utils.vmd_utils import get_departements_numbers
 import time
 from urllib import parse
-import requests
 
 MAIIA_CONF = get_conf_platform("maiia")
 MAIIA_API = MAIIA_CONF.get("api", {})
@@ -27,49 +29,11 @@ MAIIA_URL = MAIIA_CONF.get("base_url")
 CENTER_TYPES = MAIIA_SCRAPER.get("categories")
 MAIIA_DO_NOT_SCRAP_ID = MAIIA_SCRAPER.get("excluded_ids", [])
 MAIIA_DO_NOT_SCRAP_NAME = MAIIA_SCRAPER.get("excluded_names", [])
+MAIIA_WORKERS = MAIIA_SCRAPER.get("workers", 8)
 
 
-def get_atlas_correct_match(infos_page, atlas_center_list):
-    data = requests.get(
-        "https://api-adresse.data.gouv.fr/search/",
-        params=[("q", infos_page["address"]), ("postcode", infos_page["com_cp"])],
-    ).json()
-    correct_atlas_gid = None
-
-    try:
-        id_adr = data["features"][0]["properties"]["id"]
-        matching_atlas_for_id = [
-            center_id for center_id, center_data in atlas_center_list.items() if center_data["id_adresse"] == id_adr
-        ]
-        if matching_atlas_for_id:
-            correct_atlas_gid = matching_atlas_for_id[0]
-    except:
-        return None
-    return correct_atlas_gid
-
-
-def parse_atlas():
-    url = get_conf_inputs().get("from_data_gouv_website").get("centers_gouv")
-    data = requests.get(url).json()
-    maiia_gouv_centers = {}
-    for center in data["features"]:
-        centre_pro = center["properties"].get("c_reserve_professionels_sante", False)
-        url = center["properties"].get("c_rdv_site_web", None)
-        id_adresse = center["properties"].get("c_id_adr", None)
-        gid = center["properties"].get("c_gid", None)
-
-        if centre_pro:
-            continue
-        if not url:
-            continue
-        if not gid:
-            continue
-        if not "maiia" in url:
-            continue
-        end_url = f'{parse.urlsplit(url).path.split("/")[-1]}'
-
-        maiia_gouv_centers[gid] = {"url_end": end_url, "id_adresse": id_adresse}
-    return maiia_gouv_centers
+def parse_atlas() -> AtlasIndex:
+    return get_atlas_index("maiia")
 
 
 def get_centers(speciality: str, client: httpx.Client = DEFAULT_CLIENT) -> list:
@@ -94,18 +58,13 @@ def maiia_schedule_to_business_hours(opening_schedules) -> dict:
     return business_hours
 
 
-def maiia_center_to_csv(center: dict, root_center: dict, atlas_centers: dict) -> dict:
+def maiia_center_to_csv(center: dict, root_center: dict, atlas_centers: AtlasIndex) -> dict:
     if "url" not in center:
         logger.warning(f"url not found - {center}")
 
-    atlas_matches = [
-        center_id
-        for center_id, center_data in atlas_centers.items()
-        if center["url"].split("/")[-1] in center_data["url_end"]
-    ]
+    atlas_matches = atlas_centers.matches(center["url"].split("/")[-1])
 
-    if len(atlas_matches) == 0:
-        atlas_gid = None
+    atlas_gid = None
     if len(atlas_matches) == 1:
         atlas_gid = max(atlas_matches)
 
@@ -153,13 +112,31 @@ def maiia_center_to_csv(center: dict, root_center: dict, atlas_centers: dict) ->
             csv["business_hours"] = maiia_schedule_to_business_hours(
                 center["publicInformation"]["officeInformation"]["openingSchedules"]
             )
-    if len(atlas_matches) > 1:
-        atlas_gid = get_atlas_correct_match(csv, atlas_centers)
     csv["atlas_gid"] = atlas_gid
+    if len(atlas_matches) > 1:
+        # Départagé par l'adresse une fois tous les centres connus (AtlasIndex.resolve_ambiguous)
+        csv["atlas_matches"] = atlas_matches
 
     return csv
 
 
+def add_reasons(centers: list, client: httpx.Client = DEFAULT_CLIENT) -> list:
+    """
+    Embarque les motifs de chaque centre (`booking`), que le scan des créneaux n'a alors plus à demander.
+    En cas d'échec, le centre est publié sans motifs et le scan les redemandera.
+    """
+
+    def center_reasons(center: dict) -> list:
+        query = parse.parse_qs(parse.urlsplit(center["rdv_site_web"]).query)
+        return get_reasons(query["centerid"][0], client=client)
+
+    with ThreadPoolExecutor(max_workers=MAIIA_WORKERS) as executor:
+        for center, reasons in zip(centers, executor.map(center_reasons, centers)):
+            if reasons:
+                center["booking"] = reasons
+    return centers
+
+
 def maiia_scrap(client: httpx.Client = DEFAULT_CLIENT, save=False):
     atlas_center_list = parse_atlas()
     centers = list()
@@ -218,6 +195,8 @@ def maiia_scrap(client: httpx.Client = DEFAULT_CLIENT, save=False):
                 ):
                     centers.append(maiia_center_to_csv(child_center, root_center, atlas_center_list))
                     centers_ids.append(child_center_id)
+    atlas_center_list.resolve_ambiguous(centers, postcode_key="com_cp")
+    add_reasons(centers, client)
     if not save:
         return centers
     # pragma: no cover
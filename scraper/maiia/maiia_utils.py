@@ -1,8 +1,12 @@
 import httpx
 import json
 import logging
+import math
 import os
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 from scraper.pattern.scraper_request import ScraperRequest
 from utils.vmd_config import get_conf_platform
 
@@ -17,6 +21,31 @@ DEFAULT_CLIENT = httpx.Client(timeout=timeout, headers=MAIIA_HEADERS)
 logger = logging.getLogger("scraper")
 
 MAIIA_LIMIT = MAIIA_SCRAPER.get("centers_per_page")
+MAIIA_PAGE_WORKERS = MAIIA_CONF.get("page_workers", 4)
+
+
+def get_page(
+    url: str,
+    limit: int,
+    page: int,
+    client: httpx.Client = DEFAULT_CLIENT,
+    request: ScraperRequest = None,
+    request_type: str = None,
+) -> Optional[dict]:
+    base_url = f"{url}&limit={limit}&page={page}&size={limit}"
+    if request:
+        request.increase_request_count(request_type)
+    try:
+        r = client.get(base_url, headers=MAIIA_HEADERS)
+        r.raise_for_status()
+    except httpx.HTTPStatusError as hex:
+        logger.warning(f"{base_url} returned error {hex.response.status_code}")
+        return None
+    try:
+        return r.json()
+    except json.decoder.JSONDecodeError as jde:
+        logger.warning(f"{base_url} raised {jde}")
+        return None
 
 
 def get_paged(
@@ -28,27 +57,34 @@ def get_paged(
 ) -> dict:
     result = dict()
     result["items"] = []
-    page = 0
-    while True:
-        base_url = f"{url}&limit={limit}&page={page}&size={limit}"
-        if request:
-            request.increase_request_count(request_type)
-        try:
-            r = client.get(base_url, headers=MAIIA_HEADERS)
-            r.raise_for_status()
-        except httpx.HTTPStatusError as hex:
-            logger.warning(f"{base_url} returned error {hex.response.status_code}")
-            break
-        try:
-            payload = r.json()
-        except json.decoder.JSONDecodeError as jde:
-            logger.warning(f"{base_url} raised {jde}")
-            break
-        result["total"] = payload["total"]
-        if not payload["items"]:
-            break
-        result["items"].extend(payload["items"])
-        if len(payload["items"]) < limit:
-            break
-        page += 1
+    payload = get_page(url, limit, 0, client, request, request_type)
+    if payload is None:
+        return result
+    result["total"] = payload["total"]
+    if not payload["items"]:
+        return result
+    result["items"].extend(payload["items"])
+    if len(payload["items"]) < limit:
+        return result
+    # Le total est connu dès la première page : les suivantes sont demandées en parallèle,
+    # leurs éléments sont ajoutés dans l'ordre jusqu'à la première page en erreur, vide ou incomplète
+    pages = range(1, math.ceil(payload["total"] / limit))
+    with ThreadPoolExecutor(max_workers=MAIIA_PAGE_WORKERS) as executor:
+        # Sans `request` : les pages sont comptées ci-dessous, dans le thread principal
+        futures = [executor.submit(get_page, url, limit, page, client) for page in pages]
+        for future in futures:
+            payload = future.result()
+            if payload is None or not payload["items"]:
+                break
+            result["total"] = payload["total"]
+            result["items"].extend(payload["items"])
+            if len(payload["items"]) < limit:
+                break
+        # Les pages suivantes pas encore demandées sont inutiles
+        for future in futures:
+            future.cancel()
+    if request:
+        for future in futures:
+            if not future.cancelled():
+                request.increase_request_count(request_type)
     return result
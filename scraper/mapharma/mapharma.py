@@ -251,7 +251,10 @@ class Mapharma:
         day_slots = {}
         # certaines campagnes ont des dispos mais 0 doses
         # si total_libres est à 0 c'est qu'il n'y a pas de vraies dispo
-        pharmacy, campagne = self.get_pharmacy_and_campagne(id_campagne, id_type)
+        # La campagne est embarquée par centre_iterator : inutile de relire le fichier opendata
+        campagne = request.input_data
+        if campagne is None:
+            pharmacy, campagne = self.get_pharmacy_and_campagne(id_campagne, id_type)
         if campagne is None or campagne["total_libres"] == 0:
             return None
         # l'api ne renvoie que 7 jours, on parse un peu plus loin dans le temps
@@ -330,6 +333,7 @@ def centre_iterator():
             if not is_campagne_valid(campagne):
                 continue
             centre = campagne_to_centre(pharmacy=pharmacy, campagne=campagne)
+            centre["booking"] = campagne
             yield centre
     # on sauvegarde la liste des campagnes inconnues pour review
     with open(Path(MAPHARMA_PATHS.get("invalid_campaigns")), "w", encoding="utf8") as f:
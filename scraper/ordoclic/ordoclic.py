@@ -2,6 +2,8 @@ import json
 import logging
 import httpx
 
+from concurrent.futures import ThreadPoolExecutor
+
 from datetime import datetime, timedelta
 from dateutil.parser import isoparse, parse as dateparse
 from pytz import timezone
@@ -20,6 +22,7 @@ ORDOCLIC_CONF = get_conf_platform("ordoclic")
 ORDOCLIC_API = ORDOCLIC_CONF.get("api", {})
 ORDOCLIC_ENABLED = ORDOCLIC_CONF.get("enabled", False)
 NUMBER_OF_SCRAPED_DAYS = get_config().get("scrape_on_n_days", 28)
+ORDOCLIC_SLOT_WORKERS = ORDOCLIC_CONF.get("slot_workers", 4)
 
 timeout = httpx.Timeout(ORDOCLIC_CONF.get("timeout", 25), connect=ORDOCLIC_CONF.get("timeout", 25))
 DEFAULT_CLIENT = httpx.Client(timeout=timeout)
@@ -226,7 +229,10 @@ class OrdoclicSlots:
         request: ScraperRequest,
     ):
         first_availability = None
-        profile = self.get_profile(request=request)
+        # Le profil est reconstruit par centre_iterator à partir du résultat de recherche
+        profile = request.input_data
+        if profile is None:
+            profile = self.get_profile(request=request)
         if not profile:
             return None
 
@@ -248,20 +254,33 @@ class OrdoclicSlots:
                 request.set_appointments_only_by_phone(True)
                 return None
 
-        for professional in profile["publicProfessionals"]:
-            medicalStaffId = professional["id"]
-            reasons = get_reasons(entityId, request=request)
-            for reason in reasons["reasons"]:
-                if not is_reason_valid(reason):
-                    continue
+        # Les motifs sont ceux de l'entité : communs à tous ses professionnels
+        reasons = get_reasons(entityId, client=self._client, request=request)
+        valid_reasons = [reason for reason in (reasons or {}).get("reasons", []) if is_reason_valid(reason)]
+        for reason in valid_reasons:
+            request.add_vaccine_type(get_vaccine_name(reason.get("name", "")))
+        start_date = request.get_start_date()
+        end_date = (datetime.strptime(start_date, "%Y-%m-%d") + timedelta(days=NUMBER_OF_SCRAPED_DAYS)).strftime(
+            "%Y-%m-%d"
+        )
+
+        # Un appel par (professionnel, motif), en parallèle ; les réponses sont traitées dans l'ordre
+        pairs = [
+            (professional["id"], reason) for professional in profile["publicProfessionals"] for reason in valid_reasons
+        ]
+        with ThreadPoolExecutor(max_workers=ORDOCLIC_SLOT_WORKERS) as executor:
+            # Sans `request` : les requêtes sont comptées ici, dans le thread principal
+            all_slots = executor.map(
+                lambda pair: self.get_slots(entityId, pair[0], pair[1]["id"], start_date, end_date), pairs
+            )
+            for (_, reason), slots in zip(pairs, all_slots):
+                request.increase_request_count("slots")
+                if slots is False:
+                    request.increase_request_count("time-out")
+                elif slots is None:
+                    request.increase_request_count("error")
                 vaccine = get_vaccine_name(reason.get("name", ""))
-                dose = get_dose_number(reason)
-                request.add_vaccine_type(vaccine)
-                reasonId = reason["id"]
-                date_obj = datetime.strptime(request.get_start_date(), "%Y-%m-%d")
-                end_date = (date_obj + timedelta(days=NUMBER_OF_SCRAPED_DAYS)).strftime("%Y-%m-%d")
-                slots = self.get_slots(entityId, medicalStaffId, reasonId, request.get_start_date(), end_date, request)
-                date = self.parse_ordoclic_slots(request, slots, vaccine, dose)
+                date = self.parse_ordoclic_slots(request, slots, vaccine, get_dose_number(reason))
                 if date is None:
                     continue
 
@@ -274,6 +293,20 @@ class OrdoclicSlots:
         return first_availability.isoformat()
 
 
+def search_item_to_profile(item: dict) -> Optional[dict]:
+    """
+    Les champs du profil public utilisés par OrdoclicSlots.fetch, tels que renvoyés par la recherche.
+    None s'il en manque : le profil sera alors demandé au scan.
+    """
+    if "bookingSettings" not in item or "professionals" not in item:
+        return None
+    return {
+        "entityId": item["id"],
+        "publicProfessionals": [{"id": professional} for professional in dict.fromkeys(item["professionals"])],
+        "attributeValues": [{"label": "booking_settings", "value": item["bookingSettings"] or {}}],
+    }
+
+
 def centre_iterator(client: httpx.Client = DEFAULT_CLIENT):
     if not ORDOCLIC_ENABLED:
         logger.warning("Ordoclic scrap is disabled in configuration file.")
@@ -297,4 +330,5 @@ def centre_iterator(client: httpx.Client = DEFAULT_CLIENT):
                 centre["location"] = item.get("location")
                 centre["iterator"] = "ordoclic"
                 centre["type"] = DRUG_STORE
+                centre["booking"] = search_item_to_profile(item)
                 yield centre
@@ -0,0 +1,83 @@
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional, Pattern, Tuple
+
+from scraper.pattern.vaccine import Vaccine, get_vaccine_name
+from utils.vmd_config import get_conf_platform
+
+# Doses dans l'ordre de priorité : la première reconnue l'emporte
+DOSE_FILTERS = [
+    ("1_kid", "kid_first_dose_filter"),
+    ("3", "rappel_filter"),
+    ("2", "dose2_filter"),
+    ("1", "dose1_filter"),
+]
+
+
+def compile_tags(tags: Optional[Iterable[str]]) -> Optional[Pattern]:
+    """
+    Une seule expression régulière qui reconnaît l'une des sous-chaînes `tags`, sans tenir compte de la casse.
+    Le texte recherché doit être passé en minuscules.
+    """
+    tags = sorted({tag.lower() for tag in tags or [] if tag}, key=len, reverse=True)
+    if not tags:
+        return None
+    return re.compile("|".join(re.escape(tag) for tag in tags))
+
+
+class MotiveClassifier:
+    """
+    Classification des motifs de rendez-vous d'une plateforme, compilée une fois depuis les filtres
+    de config.json (`dose1_filter`, `dose2_filter`, `rappel_filter`, `immuno_filter`, `kid_first_dose_filter`).
+    Les résultats sont mémorisés par nom de motif : les mêmes motifs reviennent d'un centre à l'autre.
+    """
+
+    def __init__(self, filters: dict):
+        self.dose_patterns = [
+            (dose, pattern) for dose, key in DOSE_FILTERS if (pattern := compile_tags(filters.get(key))) is not None
+        ]
+        self.immuno_pattern = compile_tags(filters.get("immuno_filter"))
+        self.classify = lru_cache(maxsize=4096)(self._classify)
+        self.doses = lru_cache(maxsize=4096)(self._doses)
+
+    def _doses(self, name: Optional[str]) -> Tuple[str, ...]:
+        """Toutes les doses reconnues dans `name`, par ordre de priorité."""
+        if not name:
+            return ()
+        name = name.lower()
+        immuno = self.immuno_pattern is not None and self.immuno_pattern.search(name) is not None
+        return tuple(
+            dose
+            for dose, pattern in self.dose_patterns
+            # Un rappel pour immunodéprimés n'est pas un rappel
+            if pattern.search(name) and not (dose == "3" and immuno)
+        )
+
+    def dose(self, name: Optional[str]) -> Optional[str]:
+        doses = self.doses(name)
+        return doses[0] if doses else None
+
+    def _classify(self, name: Optional[str]) -> Tuple[bool, Optional[Vaccine], Optional[str]]:
+        """(motif pertinent, vaccin, dose) : un motif est pertinent si une dose y est reconnue."""
+        dose = self.dose(name)
+        return dose is not None, get_vaccine_name(name), dose
+
+
+@lru_cache(maxsize=None)
+def get_motive_classifier(platform: str) -> MotiveClassifier:
+    return MotiveClassifier(get_conf_platform(platform).get("filters", {}))
+
+
+def classify_motive(name: Optional[str], platform: str) -> Tuple[bool, Optional[Vaccine], Optional[str]]:
+    """
+    >>> classify_motive("1ère injection vaccin COVID-19 (Pfizer-BioNTech)", "keldoc")
+    (True, <Vaccine.PFIZER: 'Pfizer-BioNTech'>, '1')
+    >>> classify_motive("Vaccination antigrippale", "keldoc")
+    (False, None, None)
+    """
+    return get_motive_classifier(platform).classify(name)
+
+
+def motive_doses(name: Optional[str], platform: str) -> List[int]:
+    """Les numéros de dose reconnus dans `name`, dans l'ordre croissant."""
+    return sorted(int(dose) for dose in get_motive_classifier(platform).doses(name) if dose.isdigit())
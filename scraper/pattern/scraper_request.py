@@ -21,6 +21,7 @@ class ScraperRequest:
         self.vaccine_type = None
         self.appointment_by_phone_only = False
         self.requests = None
+        # Données embarquées par le center scraper (centre["booking"]) pour ne pas les redemander au scan
         self.input_data = input_data
         self.atlas_gid = atlas_gid
 
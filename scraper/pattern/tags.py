@@ -1,47 +1,78 @@
-from scraper.creneaux.creneau import Creneau
-from scraper.pattern.vaccine import Vaccine
+from typing import Callable, Dict, List, Optional
 
+from scraper.creneaux.creneau import DOSE_BITS, DOSE_MASK_SIZE, Creneau
+from utils.vmd_config import get_config
 
-def tag_all(creneau: Creneau):
-    return True
 
+class DoseTag:
+    """
+    Prédicat de tag sur les doses d'un créneau, évalué sur son masque de doses (`Creneau.dose_mask`).
+    `mask` à None : toujours vrai ; à 0 : créneau sans dose ; sinon : l'une des doses du masque est présente.
+    """
 
-def first_dose(creneau: Creneau):
-    if creneau.dose:
-        if "1" in creneau.dose or 1 in creneau.dose:
+    def __init__(self, mask: Optional[int]):
+        self.mask = mask
+
+    def matches(self, dose_mask: int) -> bool:
+        if self.mask is None:
             return True
+        if self.mask == 0:
+            return dose_mask == 0
+        return bool(dose_mask & self.mask)
 
+    def __call__(self, creneau: Creneau) -> bool:
+        return self.matches(creneau.dose_mask)
 
-def second_dose(creneau: Creneau):
-    if creneau.dose:
-        if "2" in creneau.dose or 2 in creneau.dose:
-            return True
 
+tag_all = DoseTag(None)
+first_dose = DoseTag(DOSE_BITS["1"])
+second_dose = DoseTag(DOSE_BITS["2"])
+third_dose = DoseTag(DOSE_BITS["3"])
+kid_first_dose = DoseTag(DOSE_BITS["1_kid"])
+unknown_dose = DoseTag(0)
 
-def third_dose(creneau: Creneau):
-    if creneau.dose:
-        if "3" in creneau.dose or 3 in creneau.dose:
-            return True
 
+def dose_tag(name: str) -> DoseTag:
+    """Le prédicat d'un nom de config.json : "all", "unknown" ou une dose de DOSE_BITS ("1", "2", "3", "1_kid")."""
+    if name == "all":
+        return tag_all
+    if name == "unknown":
+        return unknown_dose
+    return DoseTag(DOSE_BITS[name])
 
 
-def kid_first_dose(creneau: Creneau):
-    if creneau.dose:
-        if "1_kid" in creneau.dose:
-            return True
+class CompiledTags:
+    """
+    Tags compilés une fois pour toutes : pour chaque tag, le nombre de ses prédicats DoseTag vérifiés
+    par chacun des DOSE_MASK_SIZE masques de doses possibles, et ses autres prédicats, appelés sur le créneau.
+    Un créneau compte une fois par prédicat vérifié.
+    """
 
+    def __init__(self, tags: Dict[str, List[Callable]]):
+        self.names = list(tags.keys())
+        self.tests = []
+        for predicates in tags.values():
+            dose_tags = [predicate for predicate in predicates if isinstance(predicate, DoseTag)]
+            others = [predicate for predicate in predicates if not isinstance(predicate, DoseTag)]
+            table = [sum(dose_tag.matches(mask) for dose_tag in dose_tags) for mask in range(DOSE_MASK_SIZE)]
+            self.tests.append((table, others))
 
-def unknown_dose(creneau: Creneau):
-    if not creneau.dose:
-        return True
-    if len(creneau.dose) == 0:
-        return True
+    @classmethod
+    def of(cls, tags) -> "CompiledTags":
+        return tags if isinstance(tags, cls) else cls(tags)
 
+    def keys(self) -> List[str]:
+        return self.names
+
+
+DEFAULT_TAGS_CONF = {
+    "all": ["all"],
+    "first_or_second_dose": ["1", "2"],
+    "kids_first_dose": ["1_kid"],
+    "third_dose": ["3"],
+    "unknown_dose": ["unknown"],
+}
 
 CURRENT_TAGS = {
-    "all": [tag_all],
-    "first_or_second_dose": [first_dose, second_dose],
-    "kids_first_dose": [kid_first_dose],
-    "third_dose": [third_dose],
-    "unknown_dose": [unknown_dose],
+    tag: [dose_tag(name) for name in names] for tag, names in get_config().get("tags", DEFAULT_TAGS_CONF).items()
 }
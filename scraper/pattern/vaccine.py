@@ -1,4 +1,6 @@
+import re
 from enum import Enum
+from functools import lru_cache
 from typing import Optional
 
 from utils.vmd_config import get_config
@@ -34,19 +36,32 @@ def get_doctolib_vaccine_name(visit_motive_id: int, fallback: Optional[Vaccine]
     return name
 
 
+# Une expression régulière par vaccin, testées dans l'ordre de VACCINES_NAMES
+VACCINES_PATTERNS = [
+    (vaccine, re.compile("|".join(re.escape(vaccine_name) for vaccine_name in vaccine_names)))
+    for vaccine, vaccine_names in VACCINES_NAMES.items()
+    if vaccine_names
+]
+
+
 def get_vaccine_name(name: Optional[str], fallback: Optional[Vaccine] = None) -> Optional[Vaccine]:
     if not name:
         return fallback
+    vaccine = _vaccine_name(name)
+    return fallback if vaccine is None else vaccine
+
+
+@lru_cache(maxsize=4096)
+def _vaccine_name(name: str) -> Optional[Vaccine]:
     name = name.lower().strip()
     if "contre indications" in name:
-        return fallback
-    for vaccine, vaccine_names in VACCINES_NAMES.items():
-        for vaccine_name in vaccine_names:
-            if vaccine_name in name:
-                if vaccine == Vaccine.ASTRAZENECA:
-                    return get_vaccine_astrazeneca_minus_55_edgecase(name)
-                return vaccine
-    return fallback
+        return None
+    for vaccine, pattern in VACCINES_PATTERNS:
+        if pattern.search(name):
+            if vaccine == Vaccine.ASTRAZENECA:
+                return get_vaccine_astrazeneca_minus_55_edgecase(name)
+            return vaccine
+    return None
 
 
 def get_vaccine_astrazeneca_minus_55_edgecase(name: str) -> Vaccine:
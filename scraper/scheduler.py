@@ -0,0 +1,117 @@
+import logging
+from datetime import datetime, timedelta
+from random import random
+from typing import Iterable, Iterator, Optional
+
+import dateutil.parser
+from dateutil.tz import gettz
+
+from scraper.creneaux.creneau import Lieu, Plateforme
+from scraper.pattern.center_location import CenterLocation
+from utils.vmd_config import get_config
+
+SCHEDULER_CONF = get_config().get("scheduler", {})
+RECENT_AVAILABILITY = timedelta(hours=SCHEDULER_CONF.get("recent_availability_hours", 24))
+MAX_BACKOFF = SCHEDULER_CONF.get("max_backoff", 16)
+
+logger = logging.getLogger("scraper")
+
+
+class CentreScheduler:
+    """
+    Choisit et ordonne les centres à scanner selon leur rendement attendu,
+    d'après les centres publiés par l'exécution précédente :
+
+    - les centres nouveaux, disponibles, sans dernière disponibilité connue, ou disponibles il y a moins
+      de `recent_availability` sont toujours scannés ;
+    - au-delà, la probabilité de scan est divisée par deux à chaque période `recent_availability`
+      sans disponibilité, sans descendre sous `1 / max_backoff`.
+
+    `partial_scrape` s'applique en plus, uniformément, comme l'ancien `PARTIAL_SCRAPE`.
+    """
+
+    def __init__(
+        self,
+        previous_centres: dict,
+        now=datetime.now,
+        recent_availability: timedelta = RECENT_AVAILABILITY,
+        max_backoff: int = MAX_BACKOFF,
+        partial_scrape: float = 1.0,
+        random=random,
+    ):
+        self.previous_centres = {url.lower(): centre for url, centre in previous_centres.items()}
+        self.now = now(tz=gettz("Europe/Paris"))
+        self.recent_availability = recent_availability
+        self.max_backoff = max(1, max_backoff)
+        self.partial_scrape = partial_scrape
+        self.random = random
+        self.skipped = []
+
+    def previous_centre(self, centre: dict) -> Optional[dict]:
+        return self.previous_centres.get(centre["rdv_site_web"].lower())
+
+    def expected_yield(self, centre: dict) -> float:
+        previous = self.previous_centre(centre)
+        if previous is None or previous.get("prochain_rdv"):
+            return 1.0
+        last_scan = previous.get("last_scan_with_availabilities")
+        if not last_scan:
+            # Historique inconnu (centre publié avant `last_scan_with_availabilities`) : on ne l'espace pas
+            return 1.0
+        try:
+            empty_for = self.now - dateutil.parser.parse(last_scan)
+        except (ValueError, TypeError, OverflowError):
+            return 1.0
+        periods = int(empty_for / self.recent_availability)
+        if periods < 1:
+            return 1.0
+        return max(1 / 2 ** min(periods, 64), 1 / self.max_backoff)
+
+    def schedule(self, centres: Iterable[dict]) -> Iterator[dict]:
+        """
+        Renvoie au fil de l'eau les centres à scanner : ceux dont le rendement attendu est plein
+        passent tout de suite, les autres, tirés au sort, sont gardés pour la fin par rendement décroissant.
+        Les lieux des centres non scannés, à republier sans créneau, sont accumulés dans `self.skipped`.
+        """
+        self.skipped = []
+        deferred = []
+        for centre in centres:
+            expected_yield = self.expected_yield(centre)
+            if self.random() >= expected_yield * self.partial_scrape:
+                if expected_yield >= 1:
+                    continue
+                lieu = previous_lieu(self.previous_centre(centre))
+                if lieu is not None:
+                    self.skipped.append(lieu)
+                    continue
+                # Impossible de le republier tel quel : on le scanne
+            if expected_yield >= 1:
+                yield centre
+            else:
+                deferred.append((expected_yield, centre))
+
+        deferred.sort(key=lambda item: item[0], reverse=True)
+        logger.info(f"{len(self.skipped)} centres sans disponibilité récente ne seront pas scannés")
+        for _, centre in deferred:
+            yield centre
+
+
+def previous_lieu(previous: Optional[dict]) -> Optional[Lieu]:
+    """Reconstruit le lieu d'un centre tel que publié dans `info_centres.json`."""
+    if not previous:
+        return None
+    try:
+        location = previous.get("location")
+        return Lieu(
+            departement=previous["departement"],
+            nom=previous["nom"],
+            url=previous["url"],
+            lieu_type=previous.get("type"),
+            internal_id=previous["internal_id"],
+            location=CenterLocation(**location) if location else None,
+            metadata=previous.get("metadata"),
+            plateforme=Plateforme(previous["plateforme"]),
+            atlas_gid=previous.get("atlas_gid"),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
@@ -9,17 +9,19 @@ from multiprocessing import (
     Queue,
     cpu_count,
 )  # Use actual Process for Collecting creneau (CPU intensive)
-from random import random
 from typing import Tuple
 import sys
 from terminaltables import SingleTable, PorcelainTable, DoubleTable
 from .export.export_v2 import JSONExporter
 from scraper.error import Blocked403, DoublonDoctolib
+from scraper.creneaux.creneau import PasDeCreneau
 from scraper.pattern.center_info import CenterInfo
 from scraper.pattern.scraper_request import ScraperRequest
 from scraper.pattern.scraper_result import ScraperResult, VACCINATION_CENTER
 from scraper.profiler import Profiling
+from scraper.scheduler import CentreScheduler
 from utils.vmd_config import get_conf_platform, get_config
+from utils.vmd_state import ScrapeState
 from utils.vmd_logger import (
     enable_logger_for_production,
     enable_logger_for_debug,
@@ -27,7 +29,15 @@ from utils.vmd_logger import (
     log_platform_requests,
     log_requests_time,
 )
-from utils.vmd_utils import fix_scrap_urls, get_last_scans, get_start_date, q_iter, EOQ, DummyQueue, BulkQueue
+from utils.vmd_utils import (
+    fix_scrap_urls,
+    get_last_scans,
+    fetch_previous_centres,
+    get_start_date,
+    EOQ,
+    DummyQueue,
+    BulkQueue,
+)
 from .doctolib.doctolib import center_iterator as doctolib_center_iterator
 from .doctolib.doctolib import fetch_slots as doctolib_fetch_slots
 from .keldoc.keldoc import fetch_slots as keldoc_fetch_slots
@@ -72,37 +82,46 @@ def scrape_debug(urls):  # pragma: no cover
         log_requests(result.request)
 
 
-def scrape(platforms=None):  # pragma: no cover
+def scrape(platforms=None, centres=None):  # pragma: no cover
 
     compte_centres = 0
     compte_centres_avec_dispo = 0
     compte_bloqués = 0
     profiler = Profiling()
+    state = ScrapeState()
+    # Téléchargé pendant le démarrage du manager et du pool
+    previous_centres_future = fetch_previous_centres(state)
     with Manager() as manager:
         with profiler, Pool(POOL_SIZE, **profiler.pool_args()) as pool:
             creneau_q = BulkQueue(manager.Queue(maxsize=100))
-            export_process = Process(target=export_by_creneau, args=(creneau_q,))
+            previous_centres = previous_centres_future.result()
+            scheduler = CentreScheduler(previous_centres, partial_scrape=PARTIAL_SCRAPE)
+            export_process = Process(target=export_by_creneau, args=(creneau_q, previous_centres))
             export_process.start()
-            centre_iterator_proportion = (
-                (c, creneau_q) for c in centre_iterator(platforms=platforms) if random() < PARTIAL_SCRAPE
-            )
+            if centres is None:
+                centres = centre_iterator(platforms=platforms)
+            centre_iterator_proportion = ((c, creneau_q) for c in scheduler.schedule(centres))
             centres_cherchés = pool.imap_unordered(cherche_prochain_rdv_dans_centre, centre_iterator_proportion, 1)
 
-            centres_cherchés = get_last_scans(centres_cherchés)
+            centres_cherchés = get_last_scans(centres_cherchés, previous_centres)
             log_requests_time(centres_cherchés)
             log_platform_requests(centres_cherchés)
+            state.record(centres_cherchés)
+            state.close()
 
+        # Les centres non scannés restent publiés, sans créneau
+        for lieu in scheduler.skipped:
+            creneau_q.put(PasDeCreneau(lieu=lieu))
         creneau_q.put(EOQ)
         export_process.join()
+    return centres_cherchés, profiler.summary
 
 
-def export_by_creneau(
-    creneaux_q,
-):
+def export_by_creneau(creneaux_q, previous_centres=None):
 
     print(f" ----- EXPORTER RUNNING IN PROCESS {os.getpid()} ------")
-    exporter = JSONExporter()
-    exporter.export(q_iter(creneaux_q))
+    exporter = JSONExporter(previous_centres=previous_centres)
+    exporter.export_bulks(creneaux_q.bulks())
 
 
 def cherche_prochain_rdv_dans_centre(data: Tuple[dict, Queue]) -> CenterInfo:  # pragma: no cover
@@ -154,10 +173,11 @@ def cherche_prochain_rdv_dans_centre(data: Tuple[dict, Queue]) -> CenterInfo:  #
             f"circuit '{error.name}' désactivé lors du traîtement de la ligne avec le gid {centre['gid']}: {str(error)}"
         )
         has_error = error
-    except Exception:
+    except Exception as error:
 
         logger.error(f"erreur lors du traitement de la ligne avec le gid {centre['gid']}")
         traceback.print_exc()
+        has_error = error
 
     else:
         next_appointment = (
@@ -192,6 +212,8 @@ def cherche_prochain_rdv_dans_centre(data: Tuple[dict, Queue]) -> CenterInfo:  #
         center_data.type = VACCINATION_CENTER
     center_data.gid = centre.get("gid", "")
     center_data.time_for_request = time_for_request
+    # Le message seul : l'exception ne se reconstruit pas toujours une fois renvoyée par le pool (pickle)
+    center_data.erreur = str(has_error) if has_error else None
     return center_data
 
 
@@ -14,14 +14,14 @@ python3 -m stats_generation.chronodoses_by_vaccine \
 ```
 
 """
+
 import argparse
-from collections import defaultdict
 import json
 import sys
-from functools import reduce
 from pathlib import Path
-from typing import DefaultDict, Iterator, List, Tuple
+from typing import List
 
+from stats_generation.stats_aggregate import StatsCentres
 from utils.vmd_config import get_conf_outputs, get_conf_outstats
 
 _default_input = Path(get_conf_outputs().get("last_scans"))
@@ -45,35 +45,13 @@ def parse_args(args: List[str]) -> argparse.Namespace:
     return parser.parse_args(args)
 
 
-def merge(data: dict, new: tuple) -> dict:
-    vaccine_type, appointments = new
-    if vaccine_type in data:
-        data[vaccine_type] += appointments
-    else:
-        data[vaccine_type] = appointments
-    return data
-
-
-def flatten_vaccine_types_schedules(data: dict) -> Iterator[Tuple[str, int]]:
-    count = defaultdict(int)
-    for center in data["centres_disponibles"]:
-        for vaccine_name in center["vaccine_type"]:
-            count[vaccine_name] += 1
-    return (
-        (vaccine_name, count[vaccine_name])
-        for center in data["centres_disponibles"]
-        for vaccine_name in center["vaccine_type"]
-    )
-
-
 def main(argv):
     args = parse_args(argv[1:])
 
     with open(args.input) as f:
         data = json.load(f)
 
-    available_center_schedules = flatten_vaccine_types_schedules(data)
-    by_vaccine_type = reduce(merge, available_center_schedules, {})
+    by_vaccine_type = StatsCentres.from_info_centres(data).vaccins
 
     with open(args.output, "w") as f:
         json.dump(by_vaccine_type, f)
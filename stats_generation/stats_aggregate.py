@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, Tuple
+
+
+@dataclass
+class Compteur:
+    disponibles: int = 0
+    indisponibles: int = 0
+    creneaux: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.disponibles + self.indisponibles
+
+
+def vaccine_names(centre: dict) -> Iterator[str]:
+    # Les anciens info_centres.json listent des dictionnaires {"Pfizer-BioNTech": True}
+    for vaccine in centre.get("vaccine_type") or []:
+        if isinstance(vaccine, dict):
+            yield from vaccine.keys()
+        else:
+            yield vaccine
+
+
+class StatsCentres:
+    """
+    Agrégats d'un `info_centres.json`, calculés en une seule passe sur les centres
+    et partagés par toutes les statistiques (globales, par date, par département, par type, par vaccin, cartes).
+    """
+
+    def __init__(self):
+        self.tout_departement = Compteur()
+        self.departements: Dict[str, Compteur] = {}
+        self.plateformes: Dict[str, Compteur] = {}
+        self.center_types: Dict[str, Compteur] = {}
+        self.vaccins: Dict[str, int] = {}
+
+    @classmethod
+    def from_info_centres(cls, info_centres: dict) -> "StatsCentres":
+        stats = cls()
+        for centre in info_centres["centres_disponibles"]:
+            stats.add(centre, disponible=True)
+        for centre in info_centres["centres_indisponibles"]:
+            stats.add(centre, disponible=False)
+        return stats
+
+    def add(self, centre: dict, disponible: bool):
+        creneaux = centre.get("appointment_count", 0) or 0
+        departement = self.departements.get(centre["departement"])
+        if departement is None:
+            departement = self.departements[centre["departement"]] = Compteur()
+        for compteur in (self.tout_departement, departement):
+            if disponible:
+                compteur.disponibles += 1
+                compteur.creneaux += creneaux
+            else:
+                compteur.indisponibles += 1
+
+        # Par plateforme et par type, un centre est disponible s'il a un prochain rendez-vous
+        next_app = bool(centre.get("prochain_rdv"))
+        for compteurs, key in (
+            (self.plateformes, centre.get("plateforme") or "Autre"),
+            (self.center_types, centre.get("type") or "Autre"),
+        ):
+            compteur = compteurs.get(key)
+            if compteur is None:
+                compteur = compteurs[key] = Compteur()
+            if next_app:
+                compteur.disponibles += 1
+            else:
+                compteur.indisponibles += 1
+            compteur.creneaux += creneaux
+
+        if disponible:
+            for vaccine in vaccine_names(centre):
+                self.vaccins[vaccine] = self.vaccins.get(vaccine, 0) + 1
+
+    def centres_stats(self) -> dict:
+        """Le contenu de `stats.json`."""
+        centres_stats = {
+            "tout_departement": {
+                "disponibles": self.tout_departement.disponibles,
+                "total": self.tout_departement.total,
+                "creneaux": self.tout_departement.creneaux,
+            }
+        }
+        for departement, compteur in self.departements.items():
+            centres_stats[departement] = {
+                "disponibles": compteur.disponibles,
+                "indisponibles": compteur.indisponibles,
+                "creneaux": compteur.creneaux,
+                "total": compteur.total,
+            }
+        return centres_stats
+
+    def plateforme_data(self) -> Tuple[dict, dict]:
+        """Les compteurs par plateforme et par type de centre, au format de `stats_center_types.json`."""
+
+        def as_dict(compteurs: Dict[str, Compteur]) -> dict:
+            return {
+                key: {"disponible": compteur.disponibles, "total": compteur.total, "creneaux": compteur.creneaux}
+                for key, compteur in compteurs.items()
+            }
+
+        return as_dict(self.plateformes), as_dict(self.center_types)
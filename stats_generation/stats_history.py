@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Iterator, List, Optional, Tuple
+
+import pytz
+import requests
+
+from utils.vmd_config import get_config
+
+logger = logging.getLogger("scraper")
+
+DATA_AUTO = get_config().get("base_urls").get("gitlab_public_path")
+STATS_HISTORY_CONF = get_config().get("stats_history", {})
+STATS_HISTORY_PATH = STATS_HISTORY_CONF.get("path", "data/state/stats_history.sqlite3")
+HOURLY_RETENTION_DAYS = STATS_HISTORY_CONF.get("hourly_retention_days", 0)
+RUN_INTERVAL = timedelta(minutes=get_config().get("run_interval_minutes", 60))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    serie TEXT NOT NULL,
+    date TEXT NOT NULL,
+    path TEXT NOT NULL,
+    value,
+    PRIMARY KEY (serie, date, path)
+) WITHOUT ROWID;
+"""
+
+
+def flatten(document: dict, prefix: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], Any]]:
+    """Les feuilles d'un document de statistiques, avec leur chemin : (("dep_centres", "75"), [3, 4, 4])."""
+    for key, value in document.items():
+        if isinstance(value, dict):
+            yield from flatten(value, prefix + (key,))
+        elif prefix or key != "dates":
+            yield prefix + (key,), value
+
+
+class StatsHistory:
+    """
+    Historique des statistiques horaires (`stats_by_date.json`, `stats_by_date_dep.json`, `stats_center_types.json`),
+    une ligne par (série, heure, chemin) dans une base sqlite locale.
+
+    Ajouter un point ne dépend pas de la taille de l'historique, et un seul point est gardé par heure ;
+    les fichiers JSON consommés par le front sont réexportés depuis la base.
+    """
+
+    def __init__(self, path: str = STATS_HISTORY_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def has_date(self, serie: str, date: str) -> bool:
+        query = "SELECT 1 FROM points WHERE serie = ? AND date = ? LIMIT 1"
+        return self.connection.execute(query, (serie, date)).fetchone() is not None
+
+    def is_empty(self, serie: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM points WHERE serie = ? LIMIT 1", (serie,)).fetchone() is None
+
+    def last_date(self, serie: str) -> Optional[str]:
+        return self.connection.execute("SELECT MAX(date) FROM points WHERE serie = ?", (serie,)).fetchone()[0]
+
+    def append(self, serie: str, date: str, document: dict) -> bool:
+        """
+        Ajoute le point `date` de la série, `document` ayant la forme du JSON exporté avec une valeur par liste.
+        Renvoie False si un point existait déjà pour cette heure : le premier est conservé.
+        """
+        if self.has_date(serie, date):
+            return False
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO points (serie, date, path, value) VALUES (?, ?, ?, ?)",
+                ((serie, date, json.dumps(path), value) for path, value in flatten(document)),
+            )
+        return True
+
+    def import_document(self, serie: str, document: dict, after: Optional[str] = None):
+        """
+        Reprend un historique au format JSON, limité aux dates postérieures à `after` s'il est donné.
+        Les séries plus courtes que `dates` (un département apparu en cours de route)
+        sont alignées sur les dernières dates.
+        """
+        dates = document.get("dates", [])
+        rows = []
+        for path, values in flatten(document):
+            offset = len(dates) - len(values)
+            for index, value in enumerate(values):
+                if offset + index >= 0 and (after is None or dates[offset + index] > after):
+                    rows.append((serie, dates[offset + index], json.dumps(path), value))
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO points (serie, date, path, value) VALUES (?, ?, ?, ?)", rows
+            )
+        imported = [date for date in dates if after is None or date > after]
+        logger.info(f"{len(imported)} dates importées dans l'historique {serie}")
+
+    def export(self, serie: str, template: Optional[dict] = None) -> dict:
+        """Le document JSON de la série, dates croissantes ; `template` donne les clés attendues même vides."""
+        document = json.loads(json.dumps(template)) if template else {}
+        dates: List[str] = []
+        for (date,) in self.connection.execute(
+            "SELECT DISTINCT date FROM points WHERE serie = ? ORDER BY date", (serie,)
+        ):
+            dates.append(date)
+        document["dates"] = dates
+        for path, value in self.connection.execute(
+            "SELECT path, value FROM points WHERE serie = ? ORDER BY path, date", (serie,)
+        ):
+            *parents, key = json.loads(path)
+            node = document
+            for parent in parents:
+                node = node.setdefault(parent, {})
+            node.setdefault(key, []).append(value)
+        return document
+
+    def downsample(self, serie: str, before: str):
+        """Avant `before`, ne garde que le premier point de chaque jour."""
+        with self.connection:
+            self.connection.execute(
+                """
+                DELETE FROM points WHERE serie = :serie AND date < :before AND date NOT IN (
+                    SELECT MIN(date) FROM points WHERE serie = :serie AND date < :before GROUP BY substr(date, 1, 10)
+                )
+                """,
+                {"serie": serie, "before": before},
+            )
+
+
+def fetch_published_stats(stats_path: str) -> Optional[dict]:
+    """L'historique publié, vide s'il n'a jamais été publié, None s'il n'a pas pu être récupéré."""
+    try:
+        r = requests.get(f"{DATA_AUTO}{stats_path}")
+        if r.status_code == 404:
+            return {}
+        r.raise_for_status()
+        return r.json()
+    except Exception:
+        logger.warning(f"Unable to fetch {DATA_AUTO}{stats_path}")
+        return None
+
+
+def append_stats(
+    serie: str,
+    stats_path: str,
+    current_time: str,
+    document: dict,
+    template: dict,
+    now=datetime.now,
+    history_path: str = STATS_HISTORY_PATH,
+):
+    """
+    Ajoute le point de l'heure courante à l'historique local et réécrit le JSON exporté.
+    Le cache de la CI pouvant être ancien ou venir d'un autre runner, les points publiés depuis
+    le dernier point local sont repris à chaque lancement ; si l'historique publié n'a pas pu être récupéré
+    et que l'historique local date de plus d'une exécution, le JSON publié n'est pas écrasé.
+    """
+    current = now(tz=pytz.timezone("Europe/Paris"))
+    with StatsHistory(history_path) as history:
+        last_date = history.last_date(serie)
+        data = fetch_published_stats(stats_path)
+        if data:
+            history.import_document(serie, data, after=last_date)
+        elif data is None:
+            oldest = (current - RUN_INTERVAL).strftime("%Y-%m-%d %H:00:00")
+            if last_date is None or last_date < oldest:
+                raise RuntimeError(
+                    f"Historique {serie} publié indisponible et historique local périmé ({last_date}) : "
+                    f"{stats_path} n'est pas réécrit"
+                )
+        if history.append(serie, current_time, document):
+            logger.info(f"Updated stats file: {stats_path}")
+        else:
+            logger.info(f"Stats file already updated: {stats_path}")
+        if HOURLY_RETENTION_DAYS:
+            before = (current - timedelta(days=HOURLY_RETENTION_DAYS)).strftime("%Y-%m-%d 00:00:00")
+            history.downsample(serie, before)
+        stats_data = history.export(serie, template)
+
+    with open(os.path.join("data", "output", stats_path), "w") as stat_graph_file:
+        json.dump(stats_data, stat_graph_file)
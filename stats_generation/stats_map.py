@@ -1,15 +1,22 @@
-from collections import defaultdict
-import io
+import hashlib
+import os
+import re
 import csv
 import httpx
 import logging
 
+from bisect import bisect_left
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 import pytz
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
+from urllib.parse import urlparse
 
+from stats_generation.stats_aggregate import Compteur, StatsCentres
 from utils.vmd_config import get_conf_inputs
 from utils.vmd_logger import enable_logger_for_debug
+from utils.vmd_state import ScrapeState
 from utils.vmd_utils import get_departements_numbers
 
 timeout = httpx.Timeout(30.0, connect=30.0)
@@ -24,6 +31,7 @@ MAP_SRC_PATH = Path(get_conf_inputs().get("from_main_branch").get("map"))
 CSV_POP_URL = get_conf_inputs().get("from_main_branch").get("dep_pop")
 CSV_RDV_URL = get_conf_inputs().get("from_data_gouv_website").get("rdv_gouv")
 JSON_INFO_CENTRES_URL = get_conf_inputs().get("from_gitlab_public").get("last_scans")
+CACHE_PATH = Path("data", "state", "cache")
 
 
 def get_pop():
@@ -35,17 +43,54 @@ def get_pop():
     return dept_pop
 
 
-def get_csv(url: str, header=True, delimiter=";", encoding="utf-8", client: httpx.Client = DEFAULT_CLIENT):
+def download(
+    url: str, client: httpx.Client = DEFAULT_CLIENT, cache_path: Path = CACHE_PATH, state: Optional[ScrapeState] = None
+) -> Optional[Path]:
+    """
+    Copie locale de `url`, retéléchargée seulement si elle a changé (requête conditionnelle ETag / Last-Modified)
+    et écrite au fil de l'eau sur le disque. En cas d'erreur, la dernière copie connue est utilisée.
+    """
+    if state is None:
+        with ScrapeState() as state:
+            return download(url, client, cache_path, state)
+
+    path = Path(cache_path, hashlib.sha1(url.encode("utf8")).hexdigest()[:16] + Path(urlparse(url).path).suffix)
+    headers = {}
+    etag, last_modified = state.get_validators(url) if path.exists() else (None, None)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
     try:
-        r = client.get(url)
-        r.raise_for_status()
+        with client.stream("GET", url, headers=headers) as r:
+            if r.status_code == 304:
+                logger.info(f"{url} n'a pas changé, utilisation de la copie locale")
+                return path
+            r.raise_for_status()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial_path = path.with_name(path.name + ".part")
+            with open(partial_path, "wb") as f:
+                for chunk in r.iter_bytes():
+                    f.write(chunk)
+            os.replace(partial_path, path)
+            state.set_validators(url, r.headers.get("ETag"), r.headers.get("Last-Modified"))
     except httpx.HTTPStatusError as hex:
         logger.warning(f"{url} returned error {hex.response.status_code}")
-        return None
+    except httpx.HTTPError as hex:
+        logger.warning(f"{url} unreachable: {hex}")
+    return path if path.exists() else None
 
-    reader = io.StringIO(r.content.decode(encoding))
-    csvreader = csv.DictReader(reader, delimiter=delimiter)
-    return csvreader
+
+def iter_csv(path: Path, delimiter=";", encoding="utf-8") -> Iterator[dict]:
+    with open(path, encoding=encoding, newline="") as file:
+        yield from csv.DictReader(file, delimiter=delimiter)
+
+
+def get_csv(url: str, header=True, delimiter=";", encoding="utf-8", client: httpx.Client = DEFAULT_CLIENT):
+    path = download(url, client)
+    if path is None:
+        return None
+    return iter_csv(path, delimiter=delimiter, encoding=encoding)
 
 
 def get_json(url: str, client: httpx.Client = DEFAULT_CLIENT):
@@ -58,28 +103,81 @@ def get_json(url: str, client: httpx.Client = DEFAULT_CLIENT):
     return r.json()
 
 
+class MapTemplate:
+    """
+    Le fond de carte découpé une fois pour toutes autour de ses marqueurs
+    (style, titre, date de mise à jour, légendes `@e0` à `@e9`) : chaque carte est rendue par une simple concaténation.
+    """
+
+    PLACEHOLDERS = re.compile(r"/\*@@@STYLETAG@@@\*/|@@@TITRETAG@@@|@@@UPDATETAG@@@|@e\d")
+
+    def __init__(self, svg: str):
+        self.segments = []
+        self.placeholders = []
+        position = 0
+        for match in self.PLACEHOLDERS.finditer(svg):
+            self.segments.append(svg[position : match.start()])
+            self.placeholders.append(match.group())
+            position = match.end()
+        self.segments.append(svg[position:])
+
+    @classmethod
+    def load(cls, path: Path = MAP_SRC_PATH) -> "MapTemplate":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f.read())
+
+    def render(self, style: str, title: str, update: str, echelle_labels: list = []) -> str:
+        values = {"/*@@@STYLETAG@@@*/": style, "@@@TITRETAG@@@": title, "@@@UPDATETAG@@@": update}
+        for i in range(0, 10):
+            values[f"@e{i}"] = str(echelle_labels[i]) if i < len(echelle_labels) else ""
+        parts = [self.segments[0]]
+        for placeholder, segment in zip(self.placeholders, self.segments[1:]):
+            parts.append(values[placeholder])
+            parts.append(segment)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=None)
+def get_map_template(path: Path = MAP_SRC_PATH) -> MapTemplate:
+    return MapTemplate.load(path)
+
+
+def update_tag() -> str:
+    paris_tz = pytz.timezone("Europe/Paris")
+    return f'Dernière mise à jour: {datetime.now().astimezone(paris_tz).strftime("%d/%m/%Y %H:%M")}'
+
+
 def make_svg(
-    style: str, filename: str, echelle: list, echelle_labels: list = [], title: str = "vitemadose.covidtracker.fr"
+    style: str,
+    filename: str,
+    echelle: list,
+    echelle_labels: list = [],
+    title: str = "vitemadose.covidtracker.fr",
+    template: Optional[MapTemplate] = None,
 ):
     logger.info(f"making {filename}...")
-    map_svg = ""
-    paris_tz = pytz.timezone("Europe/Paris")
-    with open(MAP_SRC_PATH, "r", encoding="utf-8") as f:
-        map_svg = f.read()
-    map_svg = map_svg.replace("/*@@@STYLETAG@@@*/", style)
-    map_svg = map_svg.replace("@@@TITRETAG@@@", title)
-    map_svg = map_svg.replace(
-        "@@@UPDATETAG@@@", f'Dernière mise à jour: {datetime.now().astimezone(paris_tz).strftime("%d/%m/%Y %H:%M")}'
-    )
-    for i in range(0, 10):
-        echelle_title = ""
-        if i < len(echelle_labels):
-            echelle_title = str(echelle_labels[i])
-        map_svg = map_svg.replace(f"@e{i}", echelle_title)
+    template = template or get_map_template()
+    map_svg = template.render(style, title, update_tag(), echelle_labels)
     with open(Path("data", "output", filename), "w", encoding="utf-8") as f:
         f.write(map_svg)
 
 
+@lru_cache(maxsize=None)
+def echelle_style(palette: tuple) -> str:
+    lines = [
+        f".echelle {{ stroke:{ECHELLE_STROKE}; stroke-width:0.5;}}\n",
+        f".echelle-font {{ stroke:{ECHELLE_FONT}; }}\n",
+    ]
+    for i in range(0, 10):
+        color = "none"
+        stroke = "none"
+        if i < len(palette):
+            color = palette[i]
+            stroke = ECHELLE_STROKE
+        lines.append(f".echelle{i} {{ fill: {color}; stroke: {stroke}; }}\n")
+    return "".join(lines)
+
+
 def make_style(
     depts: dict,
     filename: str,
@@ -87,33 +185,19 @@ def make_style(
     echelle: list,
     echelle_labels: list = [],
     title: str = "https://vitemadose.covidtracker.fr",
+    template: Optional[MapTemplate] = None,
 ):
-    style = ""
     if echelle_labels == []:
         echelle_labels = echelle
+    lines = []
     for dept, dept_stat in depts.items():
         logger.debug(f"[{dept}] {dept_stat}")
-        color = palette[len(palette) - 1]
-        for i in range(0, len(echelle)):
-            if dept_stat <= echelle[i]:
-                color = palette[i]
-                break
-        dept_style = f".departement{dept.lower()} {{ fill: {color}; }}\n"
-        style += dept_style
-
-    style += f".echelle {{ stroke:{ECHELLE_STROKE}; stroke-width:0.5;}}\n"
-    style += f".echelle-font {{ stroke:{ECHELLE_FONT}; }}\n"
-
-    for i in range(0, 10):
-        color = "none"
-        stroke = "none"
-        if i < len(palette):
-            color = palette[i]
-            stroke = ECHELLE_STROKE
-        echelle_style = f".echelle{i} {{ fill: {color}; stroke: {stroke}; }}\n"
-        style += echelle_style
+        # Première classe dont la borne est supérieure ou égale à la valeur, la dernière couleur au-delà
+        color = palette[min(bisect_left(echelle, dept_stat), len(palette) - 1)]
+        lines.append(f".departement{dept.lower()} {{ fill: {color}; }}\n")
+    lines.append(echelle_style(tuple(palette)))
 
-    make_svg(style, filename, echelle, echelle_labels, title)
+    make_svg("".join(lines), filename, echelle, echelle_labels, title, template)
 
 
 def make_stats_creneaux(stats):
@@ -172,16 +256,31 @@ def make_stats_creneaux_pop(stats: dict):
     )
 
 
+def rdv_week(today: Optional[date] = None) -> str:
+    """Le lundi de la semaine en cours, seule semaine affichée sur la carte des rendez-vous."""
+    today = today or date.today()
+    return (today - timedelta(days=today.weekday())).strftime("%Y-%m-%d")
+
+
+def get_rdv_by_departement(rows: Iterable[dict], week: str) -> dict:
+    """Doses allouées et rendez-vous pris par département pour la semaine `week`, lus au fil de l'eau."""
+    dept_rdv = {}
+    for row in rows:
+        if row["date_debut_semaine"] != week:
+            continue
+        week_stat = dept_rdv.setdefault(row["code_departement"], {}).setdefault(
+            week, {"doses_allouees": 0, "rdv_pris": 0}
+        )
+        week_stat["doses_allouees"] += int(row["doses_allouees"])
+        week_stat["rdv_pris"] += int(row["rdv_pris"])
+    return dept_rdv
+
+
 def make_stats_rdv(dept_rdv: dict):
     echelle = [0, 40, 50, 60, 70, 80, 90]
     labels = ["-", "40%", "50%", "60%", "70%", "80%", "90%", ">"]
     depts = {}
-    today = date.today()
-    next_monday = (today + timedelta(days=7 - today.weekday())).strftime("%Y-%m-%d")
-    previous_monday = (today + timedelta(days=0 - today.weekday())).strftime("%Y-%m-%d")
-    logger.debug(f"next_monday: {next_monday}")
-    logger.debug(f"previous_monday: {previous_monday}")
-    monday = previous_monday
+    monday = rdv_week()
     for dept, dept_stat in dept_rdv.items():
         doses_allouees = 0
         rdv_pris = 0
@@ -197,58 +296,24 @@ def make_stats_rdv(dept_rdv: dict):
     make_style(depts, "map_taux_rdv.svg", PALETTE_FB_RDV, echelle, echelle_labels=labels, title="rdv")
 
 
-def make_maps(info_centres: dict):
+def make_maps(info_centres: dict, aggregate: Optional[StatsCentres] = None):
     dept_pop = {}
     dept_pop = get_pop()
-    dept_rdv = {}
     csv_rdv = get_csv(CSV_RDV_URL, header=True, delimiter=",", encoding="windows-1252")
     if not csv_rdv:
         logger.error("Pas possible de générer les cartes, le fichier n'est pas disponible")
         return
+    dept_rdv = get_rdv_by_departement(csv_rdv, rdv_week())
 
-    for row in csv_rdv:
-        date_debut_semaine = row["date_debut_semaine"]
-        code_departement = row["code_departement"]
-        doses_allouees = int(row["doses_allouees"])
-        rdv_pris = int(row["rdv_pris"])
-        if code_departement not in dept_rdv:
-            dept_rdv[code_departement] = dict()
-        if date_debut_semaine not in dept_rdv[code_departement]:
-            dept_rdv[code_departement][date_debut_semaine] = {"doses_allouees": 0, "rdv_pris": 0}
-        dept_rdv[code_departement][date_debut_semaine]["doses_allouees"] += doses_allouees
-        dept_rdv[code_departement][date_debut_semaine]["rdv_pris"] += rdv_pris
-
+    if aggregate is None:
+        aggregate = StatsCentres.from_info_centres(info_centres)
     stats = {}
-    centres_total = defaultdict(int)
-    centres_disponibles = defaultdict(int)
-    creneaux_disponibles = defaultdict(int)
-
-    for centre in info_centres["centres_disponibles"]:
-        centres_disponibles[centre["departement"]] += 1
-        centres_total[centre["departement"]] += 1
-        creneaux_disponibles[centre["departement"]] += sum(
-            [
-                center.get("appointment_count", 0)
-                for center in info_centres["centres_disponibles"]
-                if centre["departement"] == center["departement"]
-            ]
-        )
-    # for dept, info_centres_dept in info_centres.items():
-    #     stats[dept] = {}
-    #     centres_disponibles = 0
-    #     centres_total = 0
-    #     creneaux_disponibles = 0
-    #     for centre_disponible in info_centres_dept.get("centres_disponibles", []):
-    #         centres_disponibles += 1
-    #         creneaux_disponibles += centre_disponible["appointment_count"]
-    #     centres_total = centres_disponibles
-    #     centres_total += len(info_centres_dept.get("centres_indisponibles", []))
-    depts = get_departements_numbers()
-    for dept in depts:
+    for dept in get_departements_numbers():
+        compteur = aggregate.departements.get(dept, Compteur())
         stats[dept] = {
-            "disponibles": centres_disponibles[dept],
-            "total": centres_total[dept],
-            "creneaux": creneaux_disponibles[dept],
+            "disponibles": compteur.disponibles,
+            "total": compteur.total,
+            "creneaux": compteur.creneaux,
             "population": dept_pop.get(dept, 0),
         }
 
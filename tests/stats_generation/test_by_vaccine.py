@@ -1,21 +1,11 @@
-from functools import reduce
-from stats_generation import by_vaccine
-
-
-def test_merge():
-    data = {}
-    by_vaccine.merge(data, ("Astra", 10))
-    assert data == {"Astra": 10}
+import json
 
-    by_vaccine.merge(data, ("Astra", 10))
-    assert data == {"Astra": 20}
-
-    by_vaccine.merge(data, ("Pfizer", 100))
-    assert data == {"Astra": 20, "Pfizer": 100}
+from stats_generation import by_vaccine
+from stats_generation.stats_aggregate import StatsCentres
 
 
-def test_flatten_vaccine_types():
-    data = {
+def info_centres() -> dict:
+    return {
         "version": 1,
         "last_updated": "2021-07-19T23:02:28+02:00",
         "centres_disponibles": [
@@ -82,7 +72,19 @@ def test_flatten_vaccine_types():
                 "request_counts": None,
             },
         ],
+        "centres_indisponibles": [],
     }
-    flattened = list(by_vaccine.flatten_vaccine_types_schedules(data))
-    assert flattened == [("Janssen", 1), ("Pfizer-BioNTech", 1)]
-    assert reduce(by_vaccine.merge, flattened, {}) == {"Janssen": 1, "Pfizer-BioNTech": 1}
+
+
+def test_vaccine_types():
+    assert StatsCentres.from_info_centres(info_centres()).vaccins == {"Janssen": 1, "Pfizer-BioNTech": 1}
+
+
+def test_main(tmp_path):
+    input_path = tmp_path / "info_centres.json"
+    input_path.write_text(json.dumps(info_centres()))
+    output_path = tmp_path / "by_vaccine.json"
+
+    by_vaccine.main(["by_vaccine", f"--input={input_path}", f"--output={output_path}"])
+
+    assert json.loads(output_path.read_text()) == {"Janssen": 1, "Pfizer-BioNTech": 1}
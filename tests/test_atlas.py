@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+from utils.vmd_atlas import AtlasIndex
+
+FEATURES = [
+    {
+        "c_gid": 1,
+        "c_rdv_site_web": "https://partners.doctolib.fr/centre-de-sante/lyon/centre-lyon",
+        "c_id_adr": "69383_0001",
+    },
+    {
+        "c_gid": 2,
+        "c_rdv_site_web": "https://www.doctolib.fr/centre-de-sante/paris/centre-paris",
+        "c_id_adr": "75056_0001",
+    },
+    {
+        "c_gid": 3,
+        "c_rdv_site_web": "https://www.doctolib.fr/centre-de-sante/paris/centre-paris?pid=practice-1",
+        "c_id_adr": "75056_0002",
+    },
+    {
+        "c_gid": 4,
+        "c_rdv_site_web": "https://www.doctolib.fr/centre-de-sante/paris/centre-pro",
+        "c_id_adr": "75056_0003",
+        "c_reserve_professionels_sante": True,
+    },
+    {
+        "c_gid": 5,
+        "c_rdv_site_web": "https://vaccination-covid.keldoc.com/centre-hospitalier/lorient-56100/ghbs?specialty=144",
+        "c_id_adr": "56121_0001",
+    },
+    {
+        "c_gid": 6,
+        "c_rdv_site_web": "https://vaccination-covid.keldoc.com/redirect/?dom=cabinet-medical&inst=paris-75015&user=dr-x",
+        "c_id_adr": "75115_0001",
+    },
+    {"c_gid": None, "c_rdv_site_web": "https://www.doctolib.fr/centre-de-sante/paris/sans-gid"},
+]
+
+
+def test_atlas_index_doctolib():
+    atlas = AtlasIndex.from_features(FEATURES, "doctolib")
+
+    assert len(atlas) == 3
+    assert atlas.matches("centre-lyon") == [1]
+    assert atlas.matches("centre-paris") == [2, 3]
+    assert atlas.matches("centre-pro", "sans-gid") == []
+    assert atlas.gid_for_adresse("75056_0002") == 3
+    assert atlas.gid_for_adresse("75056_0003") is None
+
+
+def test_atlas_index_keldoc():
+    atlas = AtlasIndex.from_features(FEATURES, "keldoc")
+
+    assert atlas.matches("ghbs") == [5]
+    assert atlas.matches("dr-x", "paris-75015") == [6]
+    assert AtlasIndex().matches("ghbs") == []
+
+
+def test_atlas_index_matches_substring():
+    atlas = AtlasIndex(
+        {
+            1: {"url_end": "centre-de-vaccination-lyon-8", "id_adresse": None},
+            2: {"url_end": "centre-lyon", "id_adresse": None},
+            3: {"url_end": "vaccination-lyon", "id_adresse": None},
+        }
+    )
+
+    # Comme le test de sous-chaîne historique : une fin d'URL ATLAS plus longue correspond aussi
+    assert atlas.matches("vaccination-lyon") == [1, 3]
+    assert atlas.matches("lyon", "centre") == [1, 2, 3]
+    assert atlas.matches("lyon-8\ncentre") == []
+    assert atlas.matches("centre-paris") == []
+
+
+def test_atlas_resolve_ambiguous():
+    atlas = AtlasIndex.from_features(FEATURES, "doctolib")
+    centers = [
+        {"address": "1 rue de Paris", "cp": "75001", "atlas_gid": None, "atlas_matches": [2, 3]},
+        {"address": "1 rue de Lyon", "cp": "69003", "atlas_gid": 1},
+    ]
+    geojson = {"features": [{"properties": {"id": "75056_0002"}}]}
+    with patch("utils.vmd_atlas.search_addresses", return_value=[geojson]) as search_addresses:
+        atlas.resolve_ambiguous(centers)
+
+    search_addresses.assert_called_once_with([("1 rue de Paris", "75001")])
+    assert centers == [
+        {"address": "1 rue de Paris", "cp": "75001", "atlas_gid": 3},
+        {"address": "1 rue de Lyon", "cp": "69003", "atlas_gid": 1},
+    ]
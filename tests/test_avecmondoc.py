@@ -132,7 +132,7 @@ def test_get_valid_reasons():
         {
             "reason": "Seconde injection vaccinale COVID-19",
             "id": 605,
-        }
+        },
     ]
 
 
@@ -152,6 +152,35 @@ def test_get_availabilities():
     assert get_availabilities(604, 159, datetime(2021, 5, 20), datetime(2021, 6, 1), client=client) == data
 
 
+def test_get_availabilities_next_hints():
+    def week(period_start: str, next_available):
+        return [
+            {"start": period_start, "slots": [{"isAvailable": True, "businessHours": {"start": period_start}}]},
+            {"nextAvailableBusinessHourInCurrentWeek": False, "nextAvailableBusinessHour": next_available},
+        ]
+
+    def app(request: httpx.Request) -> httpx.Response:
+        period_start = json.loads(request.content)["periodStart"]
+        if period_start.startswith("2021-05-20"):
+            return httpx.Response(200, json=week(period_start, {"start": "2021-06-08T08:00:00.000Z"}))
+        return httpx.Response(200, json=week(period_start, {"start": "2021-06-14T08:00:00.000Z"}))
+
+    # Les semaines précédant la prochaine disponibilité annoncée sont ignorées
+    client = httpx.Client(transport=httpx.MockTransport(app))
+    availabilities = get_availabilities(604, 159, datetime(2021, 5, 20), datetime(2021, 6, 15), client=client)
+    assert [availability["start"][:10] for availability in availabilities] == ["2021-05-20", "2021-06-07", "2021-06-13"]
+
+    def app_no_more(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=week(json.loads(request.content)["periodStart"], False))
+
+    # Plus aucune disponibilité annoncée : les semaines suivantes sont ignorées
+    client = httpx.Client(transport=httpx.MockTransport(app_no_more))
+    request = ScraperRequest("https://patient.avecmondoc.com/fiche/structure/delphine-rousseau-159", "2021-05-20")
+    availabilities = get_availabilities(604, 159, datetime(2021, 5, 20), datetime(2021, 6, 15), client, request)
+    assert [availability["start"][:10] for availability in availabilities] == ["2021-05-20"]
+    assert request.requests["slots"] == 1
+
+
 def test_get_availabilities_week():
     def app(request: httpx.Request) -> httpx.Response:
         assert request.url.path == "/api/BusinessHours/availabilitiesPerDay"
@@ -239,6 +268,27 @@ def test_fetch_slots():
     assert request.vaccine_type == ["Pfizer-BioNTech", "Janssen"]
 
 
+def test_fetch_slots_with_organization():
+    # L'organisation récupérée par center_iterator n'est pas redemandée
+    def app(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/BusinessHours/availabilitiesPerDay":
+            path = Path("tests/fixtures/avecmondoc/get_availabilities.json")
+            return httpx.Response(200, json=json.loads(path.read_text(encoding="utf8")))
+        return httpx.Response(404)
+
+    organization = json.loads(Path("tests/fixtures/avecmondoc/get_organization_slug.json").read_text(encoding="utf8"))
+    center_info = CenterInfo(
+        departement="28",
+        nom="Delphine ROUSSEAU",
+        url="https://patient.avecmondoc.com/fiche/structure/delphine-rousseau-159",
+        location=CenterLocation(longitude=1.481373, latitude=48.447586, city="Chartres", cp="28000"),
+    )
+    client = httpx.Client(transport=httpx.MockTransport(app))
+    request = ScraperRequest(center_info.url, "2021-05-20", center_info=center_info, input_data=organization)
+    assert fetch_slots(request, client=client) == "2021-05-20T09:00:00+00:00"
+    assert "cabinets" not in request.requests
+
+
 def test_center_to_centerdict():
     center = CenterInfo(
         "28", "Delphine ROUSSEAU", "https://patient.avecmondoc.com/fiche/structure/delphine-rousseau-159"
@@ -291,6 +341,34 @@ def test_center_iterator():
     client = httpx.Client(transport=httpx.MockTransport(app))
     centres = [centre for centre in center_iterator(client)]
     assert len(centres) > 0
+    organization = json.loads(Path("tests/fixtures/avecmondoc/get_organization_slug.json").read_text(encoding="utf8"))
+    assert centres[0].pop("booking") == organization
     data_file = Path("tests/fixtures/avecmondoc/centerdict.json")
     data = json.loads(data_file.read_text(encoding="utf8"))
     assert centres[0] == data
+
+
+def test_search_pages():
+    requested_pages = []
+
+    def app(request: httpx.Request) -> httpx.Response:
+        page = int(httpx.QueryParams(request.url.query)["page"])
+        requested_pages.append(page)
+        return httpx.Response(
+            200, json={"page": page, "pages": 3, "hasNextPage": page < 3, "data": [{"url": f"/structure/{page}"}]}
+        )
+
+    client = httpx.Client(transport=httpx.MockTransport(app))
+    result = search(client)
+    assert sorted(requested_pages) == [1, 2, 3]
+    assert [structure["url"] for structure in result["data"]] == ["/structure/1", "/structure/2", "/structure/3"]
+    assert result["hasNextPage"] is False
+
+    def app_error(request: httpx.Request) -> httpx.Response:
+        page = int(httpx.QueryParams(request.url.query)["page"])
+        if page == 2:
+            return httpx.Response(500, json={})
+        return httpx.Response(200, json={"page": page, "pages": 3, "hasNextPage": page < 3, "data": []})
+
+    client = httpx.Client(transport=httpx.MockTransport(app_error))
+    assert search(client) is None
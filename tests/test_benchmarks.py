@@ -0,0 +1,42 @@
+import argparse
+
+import httpx
+
+from benchmarks import motives
+from benchmarks.replay import FixtureReplay, fixture_centres, replay_centres
+
+
+def test_fixture_replay():
+    client = httpx.Client(transport=FixtureReplay().transport())
+
+    response = client.get("https://partners.doctolib.fr/booking/centre42.json")
+    assert response.status_code == 200
+    assert "data" in response.json()
+
+    response = client.get("https://www.maiia.com/api/pat-public/consultation-reason-hcd?page=1")
+    assert response.json() == {"items": [], "total": 0}
+
+    response = client.get("https://example.com/unknown")
+    assert response.status_code == 404
+
+
+def test_replay_centres():
+    centres = list(replay_centres(scale=3))
+    assert len(centres) == 3 * len(fixture_centres())
+    assert len({centre["rdv_site_web"] for centre in centres}) == len(centres)
+
+    centres = list(replay_centres(scale=2, platforms=["doctolib", "bimedoc"]))
+    assert [centre["rdv_site_web"].split("/")[2] for centre in centres] == [
+        "partners.doctolib.fr",
+        "app.bimedoc.com",
+        "partners.doctolib.fr",
+        "app.bimedoc.com",
+    ]
+
+
+def test_motives_benchmark():
+    assert len(motives.motive_names()) > 100
+    for platform in ("keldoc", "maiia", "avecmondoc"):
+        results = motives.run(argparse.Namespace(platform=platform, rounds=1))
+        assert results["mismatches"] == []
+        assert set(results["us_per_call"]) == {"substring", "compiled", "memoized"}
@@ -12,7 +12,7 @@ from scraper.doctolib.doctolib_filters import (
     is_appointment_relevant,
     parse_practitioner_type,
 )
-from scraper.error import Blocked403
+from scraper.error import Blocked403, DoublonDoctolib
 from scraper.pattern.vaccine import Vaccine
 from scraper.pattern.center_info import CenterInfo
 from scraper.creneaux.creneau import Creneau, Lieu, Plateforme, PasDeCreneau
@@ -20,12 +20,14 @@ from datetime import datetime
 
 import httpx
 from scraper.doctolib.doctolib import (
+    DoctolibBooking,
     DoctolibSlots,
     _find_agenda_and_practice_ids,
     _find_visit_motive_category_id,
     _find_visit_motive_id,
     _parse_centre,
     _parse_practice_id,
+    link_practice_ids,
     set_doctolib_center_internal_id,
     PLATFORM_CONF as DOCTOLIB_CONF,
 )
@@ -524,6 +526,87 @@ def test_find_agenda_and_practice_ids():
     assert responses == 0
 
 
+def test_doctolib_shared_motive_requested_once():
+    start_date = "2021-04-03"
+    base_url = "https://partners.doctolib.fr/centre-de-vaccinations-internationales/ville1/centre1?pid=practice-165752&enable_cookies_consent=1"  # noqa
+    center_info = CenterInfo(departement="07", nom="Mon Super Centre", url=base_url)
+    scrap_request = ScraperRequest(base_url, start_date, center_info)
+    booking = json.loads(Path("tests", "fixtures", "doctolib", "basic-booking.json").read_text(encoding="utf-8"))
+    # Le même motif listé deux fois, par exemple dans deux catégories
+    booking["data"]["visit_motives"].append(copy.deepcopy(booking["data"]["visit_motives"][0]))
+    start_dates = []
+
+    def app(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/booking/centre1.json":
+            return httpx.Response(200, json=booking)
+        assert request.url.path == "/availabilities.json"
+        start_dates.append(httpx.QueryParams(request.url.query)["start_date"])
+        path = Path("tests", "fixtures", "doctolib", "basic-availabilities.json")
+        return httpx.Response(200, json=json.loads(path.read_text(encoding="utf-8")))
+
+    client = httpx.Client(transport=httpx.MockTransport(app))
+    q = SimpleQueue()
+    slots = DoctolibSlots(client=client, cooldown_interval=0, creneau_q=q)
+
+    assert slots.fetch(scrap_request) == "2021-04-10T21:45:00.000+02:00"
+    assert len(start_dates) == len(set(start_dates)) == scrap_request.requests["slots"]
+
+
+def test_plan_timetables():
+    rdata = {
+        "agendas": [
+            {"id": 10, "booking_disabled": False, "visit_motive_ids_by_practice_id": {"20": [1, 2, 3]}},
+            {"id": 11, "booking_disabled": False, "visit_motive_ids_by_practice_id": {"20": [3]}},
+        ],
+    }
+    visit_motive_ids_by_vaccine = {
+        "1": [
+            {"visit_motive": 1, "vaccine_name": Vaccine.PFIZER},
+            {"visit_motive": 2, "vaccine_name": Vaccine.MODERNA},
+            {"visit_motive": 1, "vaccine_name": Vaccine.PFIZER},
+        ],
+        "2": [{"visit_motive": 3, "vaccine_name": Vaccine.PFIZER}],
+    }
+    request = ScraperRequest("https://partners.doctolib.fr/centre1?pid=practice-20", "2021-04-03")
+    slots = DoctolibSlots(cooldown_interval=0)
+
+    queries = slots.plan_timetables(request, rdata, visit_motive_ids_by_vaccine, [20])
+    assert queries == {
+        ("1", "10", "20"): [(Vaccine.PFIZER, "1")],
+        ("2", "10", "20"): [(Vaccine.MODERNA, "1")],
+        ("3", "10-11", "20"): [(Vaccine.PFIZER, "2")],
+    }
+
+    # Aucun agenda de la pratique demandée : doublon, détecté avant toute requête de disponibilités
+    with pytest.raises(DoublonDoctolib):
+        slots.plan_timetables(request, rdata, visit_motive_ids_by_vaccine, [21])
+
+
+def test_doctolib_booking():
+    rdata = {
+        "places": [
+            {"id": "practice-20", "practice_ids": [20], "address": "1 rue de la Paix"},
+            {"id": "practice-21", "practice_ids": [21], "address": "1 rue de la Paix"},
+            {"id": "establishment-22", "practice_ids": [23], "address": "2 rue de la Paix"},
+        ],
+        "agendas": [
+            {"id": 12, "practice_id": 20, "booking_disabled": False, "visit_motive_ids_by_practice_id": {"20": [1]}},
+            {"id": 10, "practice_id": 21, "booking_disabled": False, "visit_motive_ids_by_practice_id": {"21": []}},
+            {"id": 11, "practice_id": 20, "booking_disabled": True, "visit_motive_ids_by_practice_id": {"20": [2]}},
+        ],
+    }
+    booking = DoctolibBooking(rdata)
+
+    assert booking.place_ids == {20, 21, 22}
+    assert dict(booking.motive_agendas) == {1: [0]}
+    assert booking.practices_with_own_motives == {20}
+    assert booking.sort_agenda_ids(["10", "11", "12", "13"]) == ["12", "10", "11"]
+    # Même adresse, sans motif propre : la pratique 21 est rattachée à la pratique 20
+    assert link_practice_ids([20], booking) == ([20, 21], True)
+    assert link_practice_ids([22], booking) == ([22, 23], False)
+    assert link_practice_ids([24], booking) == ([20, 21, 22], False)
+
+
 def test_category_relevant():
     assert is_category_relevant("Pfizer")
     assert is_category_relevant("Astra Zeneca")
@@ -6,12 +6,18 @@ from scraper.doctolib.doctolib_parsers import (
     parse_center_places,
     parse_doctor,
 )
+from scraper.doctolib import doctolib_center_scrap
 from scraper.doctolib.doctolib_center_scrap import DoctolibCenterScraper
+from utils.vmd_atlas import AtlasIndex
 
 from utils.vmd_utils import get_departements
 
 import httpx
 import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # -- Tests de l'API (offline) --
@@ -252,7 +258,7 @@ EXPECTED_PARSED_PAGES = [
 def test_parse_places():
     with open("tests/fixtures/doctolib/booking-with-doctors.json", "r", encoding="utf8") as f:
         booking = json.load(f)
-        assert parse_center_places(booking["data"], None, {}) == EXPECTED_PARSED_PAGES
+        assert parse_center_places(booking["data"], None, AtlasIndex()) == EXPECTED_PARSED_PAGES
 
 
 def test_parse_place():
@@ -499,3 +505,51 @@ def test_doctolib_center_scrap():
     scraper = DoctolibCenterScraper(client=client)
     result = scraper.run_departement_scrap("test")
     assert result == json.loads(Path("tests/fixtures/doctolib/scrap-center-result.json").read_text(encoding="utf-8"))
+
+
+@patch("scraper.doctolib.doctolib_center_scrap.parse_atlas", return_value=AtlasIndex())
+def test_centers_from_page_dedup(mock_atlas):
+    doctors = [
+        {"link": "/centre/ville/a", "exact_match": True},
+        {"link": "/centre/ville/b", "exact_match": True},
+        {"link": "/centre/ville/a", "exact_match": True},
+        {"link": "/centre/ville/c", "exact_match": False},
+        {"link": "/centre/ville/d", "exact_match": True},
+    ]
+    scraper = DoctolibCenterScraper()
+    with patch.object(
+        scraper,
+        "center_from_doctor_dict",
+        side_effect=lambda doctor, departement, page_id: ([{"link": doctor["link"]}], not doctor["exact_match"]),
+    ):
+        liste_urls = {"/centre/ville/b"}
+        centers, stop = scraper.centers_from_page({"data": {"doctors": doctors}}, liste_urls, "indre", 1)
+
+    assert stop
+    assert centers == [{"link": "/centre/ville/a"}, {"link": "/centre/ville/c"}]
+    assert liste_urls == {"/centre/ville/a", "/centre/ville/b", "/centre/ville/c"}
+
+
+@patch("scraper.doctolib.doctolib_center_scrap.parse_atlas", return_value=AtlasIndex())
+def test_centers_from_page_request_slots(mock_atlas, monkeypatch):
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def app(request: httpx.Request) -> httpx.Response:
+        with lock:
+            active.append(request)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.remove(request)
+        return httpx.Response(200, json={"data": {}})
+
+    # Le sémaphore partagé par les processus du pool borne les requêtes de tous leurs threads
+    monkeypatch.setattr(doctolib_center_scrap, "_request_slots", multiprocessing.BoundedSemaphore(2))
+    scraper = DoctolibCenterScraper(client=httpx.Client(transport=httpx.MockTransport(app)))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: scraper.get_dict_infos_center_page(f"/centre/ville/{i}", "indre", 1), range(8)))
+
+    assert len(peak) == 8
+    assert max(peak) <= 2
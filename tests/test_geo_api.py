@@ -1,4 +1,22 @@
-from utils.vmd_geo_api import get_location_from_address, get_location_from_coordinates, Location, Coordinates
+import csv
+import email
+import io
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.vmd_geo_api import (
+    get_location_from_address,
+    get_location_from_coordinates,
+    Location,
+    Coordinates,
+    GeocodingCache,
+    search_address,
+    search_addresses,
+)
 
 location1: Location = {
     "full_address": "389 avenue mal de lattre de tassigny 71000 Mâcon",
@@ -41,6 +59,7 @@ location3: Location = {
 # while not being an actual problem
 # it's not that frequent
 
+
 def test_get_location_from_address():
     # Common address
     address: str = "389 Avenue Maréchal de Lattre de Tassigny"
@@ -83,3 +102,135 @@ def test_get_location_from_coordinates():
     get_location_from_coordinates(coordinates)
     assert get_location_from_coordinates.cache_info().hits == 1
     assert get_location_from_coordinates.cache_info().misses == 1
+
+
+class StandInApiAdresse(BaseHTTPRequestHandler):
+    """Remplaçant local de l'API Adresse : /search/ et /search/csv/."""
+
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, content_type: str, body: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        StandInApiAdresse.requests.append(self.path)
+        if "q=erreur" in self.path:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        feature = {
+            "properties": {
+                "label": "389 avenue mal de lattre de tassigny 71000 Mâcon",
+                "name": "389 avenue mal de lattre de tassigny",
+                "city": "Mâcon",
+                "postcode": "71000",
+                "citycode": "71270",
+                "context": "71, Saône-et-Loire, Bourgogne-Franche-Comté",
+                "type": "housenumber",
+                "id": "71270_0400_00389",
+            },
+            "geometry": {"coordinates": [4.840267, 46.316225]},
+        }
+        self._reply("application/json", json.dumps({"features": [feature]}).encode("utf-8"))
+
+    def do_POST(self):
+        StandInApiAdresse.requests.append(self.path)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        form = email.message_from_bytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+        data = next(
+            part for part in form.get_payload() if part.get_param("name", header="content-disposition") == "data"
+        )
+        rows = list(csv.reader(io.StringIO(data.get_payload(decode=True).decode("utf-8"))))[1:]
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["q", "postcode", "latitude", "longitude", "result_label", "result_score", "result_id"])
+        for q, postcode in rows:
+            if q == "introuvable":
+                writer.writerow([q, postcode, "", "", "", "", ""])
+            else:
+                writer.writerow([q, postcode, "48.85", "2.35", f"{q} {postcode}", "0.9", f"id-{q}"])
+        self._reply("text/csv", output.getvalue().encode("utf-8"))
+
+
+@pytest.fixture
+def api_adresse():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInApiAdresse)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StandInApiAdresse.requests = []
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_search_address_cache(api_adresse, tmp_path):
+    cache = GeocodingCache(str(tmp_path / "geocoding.sqlite3"))
+    address = "389 Avenue Maréchal de Lattre de Tassigny"
+
+    geojson = search_address(address, zipcode="71000", cache=cache, api_url=api_adresse)
+    assert geojson["features"][0]["properties"]["id"] == "71270_0400_00389"
+    # Le cache est sur disque : il survit à l'exécution
+    cache = GeocodingCache(str(tmp_path / "geocoding.sqlite3"))
+    assert search_address(address, zipcode="71000", cache=cache, api_url=api_adresse) == geojson
+    assert len(StandInApiAdresse.requests) == 1
+
+
+def test_search_address_cache_expiry(api_adresse, tmp_path):
+    now = datetime(2021, 7, 1, 12, 0)
+    cache = GeocodingCache(str(tmp_path / "geocoding.sqlite3"), max_age=timedelta(days=30), now=lambda: now)
+    address = "389 Avenue Maréchal de Lattre de Tassigny"
+
+    search_address(address, zipcode="71000", cache=cache, api_url=api_adresse)
+    now = datetime(2021, 7, 30, 12, 0)
+    search_address(address, zipcode="71000", cache=cache, api_url=api_adresse)
+    assert len(StandInApiAdresse.requests) == 1
+    # Au-delà de 30 jours, l'adresse est redemandée
+    now = datetime(2021, 8, 1, 12, 0)
+    search_address(address, zipcode="71000", cache=cache, api_url=api_adresse)
+    assert len(StandInApiAdresse.requests) == 2
+
+
+def test_search_address_error(api_adresse, tmp_path):
+    cache = GeocodingCache(str(tmp_path / "geocoding.sqlite3"))
+
+    assert search_address("erreur", zipcode="71000", cache=cache, api_url=api_adresse) == {"features": []}
+    # Une erreur n'est pas mise en cache
+    search_address("erreur", zipcode="71000", cache=cache, api_url=api_adresse)
+    assert len(StandInApiAdresse.requests) == 2
+
+
+def test_search_addresses_batch(api_adresse, tmp_path):
+    cache = GeocodingCache(str(tmp_path / "geocoding.sqlite3"))
+    search_address("389 Avenue Maréchal de Lattre de Tassigny", zipcode="71000", cache=cache, api_url=api_adresse)
+
+    addresses = [
+        ("1 rue de Paris", "75001"),
+        ("389 Avenue Maréchal de Lattre de Tassigny", "71000"),
+        ("introuvable", "00000"),
+        ("1 rue de Paris", "75001"),
+        ("2 rue de Lyon", "69001"),
+    ]
+    results = search_addresses(addresses, cache=cache, api_url=api_adresse, batch_size=2)
+
+    assert [r["features"][0]["properties"]["id"] if r["features"] else None for r in results] == [
+        "id-1 rue de Paris",
+        "71270_0400_00389",
+        None,
+        "id-1 rue de Paris",
+        "id-2 rue de Lyon",
+    ]
+    # 1 recherche unitaire puis 2 lots pour les 3 adresses inconnues
+    assert StandInApiAdresse.requests == [
+        "/search/?q=389+Avenue+Mar%C3%A9chal+de+Lattre+de+Tassigny&limit=1&postcode=71000",
+        "/search/csv/",
+        "/search/csv/",
+    ]
+    search_addresses(addresses, cache=cache, api_url=api_adresse)
+    assert len(StandInApiAdresse.requests) == 3
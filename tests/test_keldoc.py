@@ -3,10 +3,12 @@ import datetime
 import json
 from pathlib import Path
 import datetime as dt
+import threading
+import time
 import httpx
 import pytest
 from .utils import mock_datetime_now
-from scraper.keldoc import keldoc
+from scraper.keldoc import keldoc, keldoc_center
 from scraper.keldoc.keldoc import fetch_slots
 from scraper.keldoc.keldoc_center import KeldocCenter, DEFAULT_CLIENT
 from scraper.keldoc.keldoc_filters import (
@@ -427,3 +429,58 @@ def test_cabinet_error():
     keldoc.session = httpx.Client(transport=httpx.MockTransport(app))
     date = fetch_slots(request)
     assert not date
+
+
+def test_get_timetables_shared_motives():
+    center1_url = "https://vaccination-covid.keldoc.com/centre-hospitalier-regional/lorient-56100/groupe-hospitalier-bretagne-sud-lorient-hopital-du-scorff?cabinet=16913&specialty=144"
+    queries = []
+
+    def app(request: httpx.Request) -> httpx.Response:
+        params = httpx.QueryParams(request.url.query)
+        queries.append((request.url.path, params["from"]))
+        day = params["from"]
+        return httpx.Response(200, json={"availabilities": {day: [{"start_time": f"{day}T10:00:00.000000+0200"}]}})
+
+    request = ScraperRequest(center1_url, "2021-06-01")
+    center = KeldocCenter(request, client=httpx.Client(transport=httpx.MockTransport(app)))
+    motives = [
+        {"id": 1, "vaccine_type": "Pfizer-BioNTech", "agendas": [10, 11], "dose": "1"},
+        {"id": 1, "vaccine_type": "Pfizer-BioNTech", "agendas": [10, 11], "dose": "1"},
+        {"id": 2, "vaccine_type": "Moderna", "agendas": [10, 11], "dose": "2"},
+    ]
+    timetables = center.get_timetables(dt.datetime(2021, 6, 1), motives)
+
+    pages = int(keldoc_center.KELDOC_PAGES_NUMBER)
+    assert len(queries) == len(set(queries)) == 2 * pages
+    assert request.requests["slots"] == 2 * pages
+    assert list(timetables) == [(1, (10, 11)), (2, (10, 11))]
+    assert len(timetables[(1, (10, 11))]["availabilities"]) == pages
+    assert list(timetables[(1, (10, 11))]["availabilities"])[:2] == ["2021-06-01", "2021-06-05"]
+
+
+def test_get_timetables_deadline(monkeypatch):
+    center1_url = "https://vaccination-covid.keldoc.com/centre-hospitalier-regional/lorient-56100/groupe-hospitalier-bretagne-sud-lorient-hopital-du-scorff?cabinet=16913&specialty=144"
+    release = threading.Event()
+
+    def app(request: httpx.Request) -> httpx.Response:
+        day = httpx.QueryParams(request.url.query)["from"]
+        if day != "2021-06-01":
+            release.wait(5)
+        return httpx.Response(200, json={"availabilities": {day: [{"start_time": f"{day}T10:00:00.000000+0200"}]}})
+
+    monkeypatch.setattr(keldoc_center, "KELDOC_SLOT_TIMEOUT", 0.3)
+    request = ScraperRequest(center1_url, "2021-06-01")
+    center = KeldocCenter(request, client=httpx.Client(transport=httpx.MockTransport(app)))
+    motives = [{"id": 1, "vaccine_type": "Pfizer-BioNTech", "agendas": [10], "dose": "1"}]
+    start = time.monotonic()
+    try:
+        timetables = center.get_timetables(dt.datetime(2021, 6, 1), motives)
+        elapsed = time.monotonic() - start
+    finally:
+        release.set()
+
+    assert elapsed < 2
+    assert request.requests["time-out"] == 1
+    # Seules les requêtes parties avant l'échéance sont comptées
+    assert request.requests["slots"] == min(int(keldoc_center.KELDOC_PAGES_NUMBER), keldoc_center.KELDOC_SLOT_WORKERS)
+    assert list(timetables[(1, (10,))]["availabilities"]) == ["2021-06-01"]
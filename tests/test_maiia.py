@@ -6,6 +6,7 @@ from scraper.pattern.center_info import CenterInfo
 from utils.vmd_utils import DummyQueue
 import httpx
 import datetime as dt
+from unittest import mock
 from pathlib import Path
 from scraper.pattern.center_location import CenterLocation
 import scraper
@@ -17,6 +18,7 @@ from scraper.maiia.maiia import (
     MAIIA_LIMIT,
 )
 from scraper.maiia.maiia_center_scrap import maiia_scrap
+from scraper.maiia.maiia_utils import get_paged
 from scraper.pattern.scraper_request import ScraperRequest
 from .utils import mock_datetime_now
 
@@ -134,6 +136,43 @@ def test_get_first_availability():
     assert first_availability.isoformat() == "2021-05-13T13:40:00+00:00"
 
 
+def test_get_first_availability_same_reason_name():
+    # Deux motifs de même nom : une seule recherche de créneaux, avec les doses des deux motifs
+    queried_reasons = []
+    pages = []
+
+    def counting_app(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/availabilities"):
+            qs = parse_qs(request.url._uri_reference.query)
+            pages.append(qs)
+            if int(qs.get("page", ["0"])[0]) == 0:
+                queried_reasons.append(qs["consultationReasonName"][0])
+        return app(request)
+
+    creneaux = []
+    queue = mock.Mock(put=creneaux.append)
+    reasons = [
+        {"name": "Première injection vaccin anti covid-19", "injectionType": "FIRST"},
+        {"name": "Première injection vaccin anti covid-19", "injectionType": "SECOND"},
+        {"name": "Test antigénique", "injectionType": "NONE"},
+    ]
+    request = ScraperRequest("https://www.maiia.com/centre?centerid=5ffc744c68dedf073a5b87a2", "2021-04-29")
+    instance = MaiiaSlots(creneau_q=queue, client=None)
+    first_availability, slots_count = instance.get_first_availability(
+        "5ffc744c68dedf073a5b87a2",
+        "2021-04-29",
+        reasons,
+        client=httpx.Client(transport=httpx.MockTransport(counting_app)),
+        request=request,
+    )
+    assert queried_reasons == ["Première injection vaccin anti covid-19"]
+    assert slots_count == 798
+    assert first_availability.isoformat() == "2021-05-13T13:40:00+00:00"
+    assert creneaux[0].dose == [1, 2]
+    # Les requêtes faites par les threads de recherche sont toutes comptées
+    assert request.requests["slots"] == len(pages)
+
+
 @pytest.mark.skip(
     reason="je n'ai aucune connaissance de ce scrapper et je dois supprimer les artifacts qui encombrent gitlab :D"
 )
@@ -202,3 +241,57 @@ def test_center_iterator():
     for centre in center_iterator():
         centres.append(centre)
     assert len(centres) > 0
+
+
+def test_fetch_slots_with_reasons():
+    # Les motifs embarqués par maiia_center_scrap ne sont pas redemandés
+    url = "https://www.maiia.com/centre-de-vaccination/42400-saint-chamond/centre-de-vaccination-covid---hopital-du-gier-?centerid=5ffc744c68dedf073a5b87a2"
+    reasons = get_reasons("5ffc744c68dedf073a5b87a2", limit=MAIIA_LIMIT, client=client)
+    request = ScraperRequest(
+        url=url,
+        start_date="2021-04-16",
+        center_info=CenterInfo(departement="42", nom="Centre de vaccination COVID - Hôpital du Gier ", url=url),
+        input_data=reasons,
+    )
+    assert fetch_slots(request, client=client) == "2021-05-13T13:40:00+00:00"
+    assert "motives" not in request.requests
+
+
+def test_get_paged():
+    served = []
+
+    def paged_app(total: int, error_page: int = None):
+        def app(request: httpx.Request) -> httpx.Response:
+            qs = parse_qs(request.url._uri_reference.query)
+            page, limit = int(qs["page"][0]), int(qs["limit"][0])
+            served.append(page)
+            if page == error_page:
+                return httpx.Response(500, content="")
+            items = [{"id": index} for index in range(page * limit, min(total, (page + 1) * limit))]
+            return httpx.Response(200, json={"items": items, "total": total})
+
+        return httpx.Client(transport=httpx.MockTransport(app))
+
+    request = ScraperRequest("https://www.maiia.com/centre?centerid=1", "2021-04-16")
+    result = get_paged(
+        "https://www.maiia.com/api?x=1", limit=10, client=paged_app(45), request=request, request_type="slots"
+    )
+    assert [item["id"] for item in result["items"]] == list(range(45))
+    assert result["total"] == 45
+    assert request.requests["slots"] == 5
+
+    # Les pages qui suivent une page en erreur sont ignorées ; celles déjà demandées sont comptées
+    served.clear()
+    request = ScraperRequest("https://www.maiia.com/centre?centerid=1", "2021-04-16")
+    result = get_paged(
+        "https://www.maiia.com/api?x=1",
+        limit=10,
+        client=paged_app(45, error_page=2),
+        request=request,
+        request_type="slots",
+    )
+    assert [item["id"] for item in result["items"]] == list(range(20))
+    assert request.requests["slots"] == len(served)
+
+    result = get_paged("https://www.maiia.com/api?x=1", limit=10, client=paged_app(0))
+    assert result == {"items": [], "total": 0}
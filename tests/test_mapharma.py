@@ -123,3 +123,18 @@ def test_mapharma_fetch_slots():
 
     client = httpx.Client(transport=httpx.MockTransport(app))
     request = ScraperRequest("https://mapharma.net/97200?c=60&l=1", "2021-04-14")
+
+
+def test_fetch_slots_with_campagne():
+    # La campagne embarquée par centre_iterator évite la lecture du fichier opendata
+    def app(request: httpx.Request) -> httpx.Response:
+        with open(TEST_SLOT_FILE, encoding="utf8") as f:
+            return httpx.Response(200, content=f.read())
+
+    client = httpx.Client(transport=httpx.MockTransport(app))
+    center_info = CenterInfo(departement="972", nom="Pharmacie", url="https://mapharma.net/97200?c=60&l=1")
+    campagne = {"id_campagne": 60, "id_type": 1, "nom": "Vaccination Janssen", "total_libres": 4}
+    request = ScraperRequest(center_info.url, "2021-04-14", center_info=center_info, input_data=campagne)
+    first_availability = fetch_slots(request, client=client, opendata_file=Path("does-not-exist.json"))
+    assert first_availability == "2021-04-19T17:15:00"
+    assert request.vaccine_type == ["Janssen"]
@@ -0,0 +1,50 @@
+from scraper.avecmondoc.avecmondoc import get_vaccine_dose
+from scraper.keldoc.keldoc_filters import keldoc_dose_number
+from scraper.maiia.maiia import get_vaccine_type_from_name
+from scraper.pattern.motive_classifier import MotiveClassifier, classify_motive, compile_tags, motive_doses
+from scraper.pattern.vaccine import Vaccine
+
+
+def test_compile_tags():
+    pattern = compile_tags(["Inj 1", "1ère", "", "inj 1"])
+    assert pattern.search("vaccin 1ère inj.")
+    assert pattern.search("inj 1 pfizer")
+    assert not pattern.search("2ème injection")
+    assert compile_tags([]) is None
+    assert compile_tags(None) is None
+
+
+def test_motive_classifier():
+    classifier = MotiveClassifier(
+        {
+            "dose1_filter": ["1ère"],
+            "dose2_filter": ["2ème"],
+            "rappel_filter": ["Rappel"],
+            "immuno_filter": ["immuno"],
+            "kid_first_dose_filter": ["5-11"],
+        }
+    )
+    assert classifier.classify("1ère injection Pfizer") == (True, Vaccine.PFIZER, "1")
+    assert classifier.classify("RAPPEL Moderna") == (True, Vaccine.MODERNA, "3")
+    assert classifier.classify("Rappel 2ème dose immunodéprimés") == (True, None, "2")
+    assert classifier.classify("1ère injection 5-11 ans") == (True, None, "1_kid")
+    assert classifier.classify("Test antigénique") == (False, None, None)
+    assert classifier.classify(None) == (False, None, None)
+    assert classifier.doses("1ère ou 2ème injection") == ("2", "1")
+
+
+def test_platform_doses():
+    assert classify_motive("Vaccination antigrippale", "keldoc") == (False, None, None)
+    assert keldoc_dose_number("Rappel vaccin COVID") == "3"
+    assert keldoc_dose_number("Rappel IMM") is None
+
+    assert get_vaccine_type_from_name("Première injection") == 1
+    assert get_vaccine_type_from_name("Deuxième injection - Rappel") == 3
+    assert get_vaccine_type_from_name("Vaccination") is None
+    assert get_vaccine_type_from_name(None) is None
+
+    assert get_vaccine_dose("1ère ou 2ème injection") == [1, 2]
+    assert get_vaccine_dose("Injection de rappel") == [3]
+    assert get_vaccine_dose("Vaccination") == []
+    assert get_vaccine_dose("") is None
+    assert motive_doses("Rappel", "maiia") == [3]
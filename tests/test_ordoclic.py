@@ -13,6 +13,7 @@ from scraper.ordoclic.ordoclic import (
     get_reasons,
     fetch_slots,
     centre_iterator,
+    search_item_to_profile,
     is_reason_valid,
 )
 
@@ -232,11 +233,25 @@ def test_center_iterator():
 
     client = httpx.Client(transport=httpx.MockTransport(app))
     generated = list(centre_iterator(client))
+    for centre in generated:
+        assert centre.pop("booking")["entityId"].startswith(centre["gid"])
     result_path = Path("tests/fixtures/ordoclic/search-result.json")
     expected = json.loads(result_path.read_text())
     assert generated == expected
 
 
+def test_search_item_to_profile():
+    search_result = json.loads(Path("tests/fixtures/ordoclic/search.json").read_text())
+    item = next(item for item in search_result["items"] if item["publicProfile"]["slug"] == "pharmacie-oceane-paris")
+    assert search_item_to_profile(item) == {
+        "entityId": "03674d71-b200-4682-8e0a-3ab9687b2b59",
+        "publicProfessionals": [{"id": "5c8fc562-d836-4aed-84d6-225e5af8075e"}],
+        "attributeValues": [{"label": "booking_settings", "value": {"option": "internal"}}],
+    }
+    del item["bookingSettings"]
+    assert search_item_to_profile(item) is None
+
+
 def test_fetch_slots():
     # Basic full working test
     def app(request: httpx.Request) -> httpx.Response:
@@ -336,3 +351,91 @@ def test_fetch_slots():
     request = ScraperRequest("https://app.ordoclic.fr/app/pharmacie/pharmacie-oceane-paris", "2021-05-08", center_info)
     res = fetch_slots(request, client=client)
     assert res is None
+
+
+def test_fetch_slots_with_profile():
+    # Le profil reconstruit depuis la recherche n'est pas redemandé
+    def app(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/v1/solar/entities/03674d71-b200-4682-8e0a-3ab9687b2b59/reasons":
+            return httpx.Response(
+                200, json=json.loads(Path("tests/fixtures/ordoclic/fetchslot-reasons.json").read_text())
+            )
+        if request.url.path == "/v1/solar/slots/availableSlots":
+            return httpx.Response(
+                200, json=json.loads(Path("tests/fixtures/ordoclic/fetchslot-slots.json").read_text())
+            )
+        return httpx.Response(403, json={})
+
+    search_result = json.loads(Path("tests/fixtures/ordoclic/search.json").read_text())
+    item = next(item for item in search_result["items"] if item["publicProfile"]["slug"] == "pharmacie-oceane-paris")
+    center_info = CenterInfo(
+        departement="75",
+        nom="Pharmacie Oceane",
+        url="https://app.ordoclic.fr/app/pharmacie/pharmacie-oceane-paris",
+        location=CenterLocation(longitude=2.2914519, latitude=48.84922659999999, city="Paris", cp="75015"),
+    )
+    client = httpx.Client(transport=httpx.MockTransport(app))
+    request = ScraperRequest(center_info.url, "2021-05-08", center_info, input_data=search_item_to_profile(item))
+    assert fetch_slots(request, client=client) == "2021-05-12T16:00:00+00:00"
+    assert "booking" not in request.requests
+
+
+def test_fetch_slots_reasons_once():
+    # Les motifs de l'entité sont demandés une seule fois, quel que soit le nombre de professionnels
+    calls = {"reasons": 0, "slots": []}
+
+    def app(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/v1/solar/entities/03674d71-b200-4682-8e0a-3ab9687b2b59/reasons":
+            calls["reasons"] += 1
+            return httpx.Response(
+                200, json=json.loads(Path("tests/fixtures/ordoclic/fetchslot-reasons.json").read_text())
+            )
+        if request.url.path == "/v1/solar/slots/availableSlots":
+            calls["slots"].append(json.loads(request.content)["medicalStaffId"])
+            return httpx.Response(
+                200, json=json.loads(Path("tests/fixtures/ordoclic/fetchslot-slots.json").read_text())
+            )
+        return httpx.Response(403, json={})
+
+    profile = json.loads(Path("tests/fixtures/ordoclic/fetchslot-profile.json").read_text())
+    profile["publicProfessionals"] = [{"id": f"pro-{index}"} for index in range(5)]
+    center_info = CenterInfo(
+        departement="75",
+        nom="Pharmacie Oceane",
+        url="https://app.ordoclic.fr/app/pharmacie/pharmacie-oceane-paris",
+    )
+    client = httpx.Client(transport=httpx.MockTransport(app))
+    request = ScraperRequest(center_info.url, "2021-05-08", center_info, input_data=profile)
+    assert fetch_slots(request, client=client) == "2021-05-12T16:00:00+00:00"
+    assert calls["reasons"] == 1
+    assert sorted(calls["slots"]) == [f"pro-{index}" for index in range(5)]
+    assert request.requests["slots"] == 5
+
+
+def test_fetch_slots_request_counts():
+    # Les requêtes lancées en parallèle sont toutes comptées, erreurs comprises
+    def app(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/v1/solar/entities/03674d71-b200-4682-8e0a-3ab9687b2b59/reasons":
+            return httpx.Response(
+                200, json=json.loads(Path("tests/fixtures/ordoclic/fetchslot-reasons.json").read_text())
+            )
+        medical_staff_id = json.loads(request.content)["medicalStaffId"]
+        if medical_staff_id == "pro-1":
+            raise httpx.TimeoutException(message="Timeout", request=request)
+        if medical_staff_id == "pro-2":
+            return httpx.Response(500, json={})
+        return httpx.Response(200, json=json.loads(Path("tests/fixtures/ordoclic/fetchslot-slots.json").read_text()))
+
+    profile = json.loads(Path("tests/fixtures/ordoclic/fetchslot-profile.json").read_text())
+    profile["publicProfessionals"] = [{"id": f"pro-{index}"} for index in range(20)]
+    center_info = CenterInfo(
+        departement="75",
+        nom="Pharmacie Oceane",
+        url="https://app.ordoclic.fr/app/pharmacie/pharmacie-oceane-paris",
+    )
+    client = httpx.Client(transport=httpx.MockTransport(app))
+    request = ScraperRequest(center_info.url, "2021-05-08", center_info, input_data=profile)
+    assert fetch_slots(request, client=client) == "2021-05-12T16:00:00+00:00"
+    assert request.requests["slots"] == 20
+    assert request.requests["time-out"] == 1
+    assert request.requests["error"] == 1
@@ -5,7 +5,8 @@ from scraper.export.resource_centres import ResourceParDepartement
 from datetime import datetime
 from scraper.pattern.vaccine import Vaccine
 from scraper.pattern.center_location import CenterLocation
-from scraper.export.resource_creneaux_quotidiens import ResourceCreneauxQuotidiens
+from scraper.export.resource_creneaux_quotidiens import CreneauxQuotidiensCounters, ResourceCreneauxQuotidiens
+from scraper.pattern.tags import CURRENT_TAGS
 
 stubbed_now = dateutil.parser.parse("2021-05-26T21:34:00+02:00")
 
@@ -228,6 +229,130 @@ def test_resource_creneaux_quotidiens__2_creneau_with_custom_tags():
     assert actual.asdict() == expected
 
 
+def test_resource_creneaux_quotidiens__dose_tags():
+    # Given
+    departement = "07"
+    creneaux = [
+        Creneau(
+            horaire=dateutil.parser.parse("2021-05-27T18:12:00.000Z"),
+            lieu=centre_saint_andeol,
+            reservation_url="https://some.url/reservation",
+            timezone=gettz("Europe/Paris"),
+            type_vaccin=[Vaccine.PFIZER],
+            dose=dose,
+        )
+        for dose in [["1", "2"], [3], ["1_kid"], None]
+    ]
+    # When
+    actual = next(
+        ResourceCreneauxQuotidiens.from_creneaux(
+            creneaux, next_days=7, departement=departement, now=now, tags=CURRENT_TAGS
+        )
+    )
+    # Then
+    assert actual.asdict()["creneaux_quotidiens"][1] == {
+        "date": "2021-05-27",
+        "total": 4,
+        "creneaux_par_lieu": [
+            {
+                "lieu": centre_saint_andeol.internal_id,
+                "creneaux_par_tag": [
+                    {"tag": "all", "creneaux": 4},
+                    {"tag": "first_or_second_dose", "creneaux": 2},
+                    {"tag": "kids_first_dose", "creneaux": 1},
+                    {"tag": "third_dose", "creneaux": 1},
+                    {"tag": "unknown_dose", "creneaux": 1},
+                ],
+            }
+        ],
+    }
+
+
+def test_resource_creneaux_quotidiens__day_index_per_run_date():
+    # Given
+    creneau = Creneau(
+        horaire=dateutil.parser.parse("2021-05-28T09:30:00+02:00"),
+        lieu=centre_saint_andeol,
+        reservation_url="https://some.url/reservation",
+    )
+    later = lambda *args, **kwargs: dateutil.parser.parse("2021-05-27T08:00:00+02:00")
+    # When
+    first = next(ResourceCreneauxQuotidiens.from_creneaux([creneau], next_days=2, departement="07", now=now))
+    second = next(ResourceCreneauxQuotidiens.from_creneaux([creneau], next_days=2, departement="07", now=later))
+    # Then
+    assert [date["total"] for date in first.asdict()["creneaux_quotidiens"]] == [0, 0, 1]
+    assert [date["total"] for date in second.asdict()["creneaux_quotidiens"]] == [0, 1, 0]
+
+
+def test_creneaux_quotidiens_counters__shared_by_departements():
+    # Given
+    counters = CreneauxQuotidiensCounters(
+        next_days=2,
+        now=now,
+        tags={"all": [lambda c: True], "third_dose": CURRENT_TAGS["third_dose"]},
+        departements={"07", "26"},
+    )
+    resources = {
+        departement: ResourceCreneauxQuotidiens(departement, counters=counters) for departement in ["07", "26", "69"]
+    }
+    centre_valence = Lieu(
+        departement="26",
+        nom="Valence",
+        url="https://some.url",
+        lieu_type="vaccination-center",
+        internal_id="valence",
+        location=None,
+        metadata={},
+        plateforme=Plateforme.DOCTOLIB,
+    )
+    creneaux = [
+        Creneau(
+            horaire=dateutil.parser.parse(horaire),
+            lieu=lieu,
+            reservation_url="https://some.url/reservation",
+            dose=dose,
+        )
+        for horaire, lieu, dose in [
+            ("2021-05-27T10:00:00+02:00", centre_valence, ["3"]),
+            ("2021-05-27T11:00:00+02:00", centre_saint_andeol, ["1"]),
+            ("2021-05-27T12:00:00+02:00", centre_valence, ["3"]),
+            ("2021-05-28T12:00:00+02:00", centre_valence, ["1"]),
+            ("2021-06-28T12:00:00+02:00", centre_valence, ["1"]),
+        ]
+    ]
+    # When
+    counters.on_creneaux(creneaux[:2])
+    counters.on_creneaux(creneaux[2:])
+    for resource in resources.values():
+        resource.on_creneau(creneaux[0])
+    # Then
+    assert resources["26"].asdict()["creneaux_quotidiens"] == [
+        {"date": "2021-05-26", "total": 0, "creneaux_par_lieu": []},
+        {
+            "date": "2021-05-27",
+            "total": 2,
+            "creneaux_par_lieu": [
+                {
+                    "lieu": "valence",
+                    "creneaux_par_tag": [{"tag": "all", "creneaux": 2}, {"tag": "third_dose", "creneaux": 2}],
+                }
+            ],
+        },
+        {
+            "date": "2021-05-28",
+            "total": 1,
+            "creneaux_par_lieu": [
+                {
+                    "lieu": "valence",
+                    "creneaux_par_tag": [{"tag": "all", "creneaux": 1}, {"tag": "third_dose", "creneaux": 0}],
+                }
+            ],
+        },
+    ]
+    assert resources["07"].asdict()["creneaux_quotidiens"][1]["total"] == 1
+    assert all(date["total"] == 0 for date in resources["69"].asdict()["creneaux_quotidiens"])
+
+
 centre_lamastre = Lieu(
     departement="07",
     nom="CENTRE DE VACCINATION COVID - LAMASTRE",
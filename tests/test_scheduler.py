@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+import dateutil
+
+from scraper.creneaux.creneau import Creneau, PasDeCreneau, Plateforme
+from scraper.export.resource_centres import ResourceTousDepartements
+from scraper.scheduler import CentreScheduler, previous_lieu
+
+expected_now = dateutil.parser.parse("2021-05-26T21:34:00+02:00")
+
+
+def now(tz=None):
+    return expected_now
+
+
+def previous_centre(url, prochain_rdv=None, last_scan=None):
+    return {
+        "departement": "07",
+        "nom": "Centre",
+        "url": url,
+        "location": {"longitude": 4.1, "latitude": 44.2, "city": "Privas", "cp": "07000"},
+        "metadata": {"address": "1 rue du Centre, 07000 Privas", "business_hours": None},
+        "prochain_rdv": prochain_rdv,
+        "plateforme": "Doctolib",
+        "type": "vaccination-center",
+        "appointment_count": 0,
+        "internal_id": f"doctolib{url[-1]}",
+        "vaccine_type": [],
+        "last_scan_with_availabilities": last_scan,
+    }
+
+
+def ago(**kwargs):
+    return (expected_now - timedelta(**kwargs)).isoformat()
+
+
+PREVIOUS_CENTRES = {
+    "https://centre.fr/1": previous_centre("https://centre.fr/1", prochain_rdv=ago(days=-1), last_scan=ago(hours=1)),
+    "https://centre.fr/2": previous_centre("https://centre.fr/2", last_scan=ago(hours=3)),
+    "https://centre.fr/3": previous_centre("https://centre.fr/3", last_scan=ago(days=2, hours=1)),
+    "https://centre.fr/4": previous_centre("https://centre.fr/4", last_scan=ago(days=30)),
+    "https://centre.fr/5": previous_centre("https://centre.fr/5"),
+}
+
+
+def test_expected_yield():
+    scheduler = CentreScheduler(PREVIOUS_CENTRES, now=now, recent_availability=timedelta(days=1), max_backoff=16)
+
+    assert scheduler.expected_yield({"rdv_site_web": "https://centre.fr/0"}) == 1
+    assert scheduler.expected_yield({"rdv_site_web": "https://centre.fr/1"}) == 1
+    assert scheduler.expected_yield({"rdv_site_web": "https://CENTRE.fr/2"}) == 1
+    assert scheduler.expected_yield({"rdv_site_web": "https://centre.fr/3"}) == 1 / 4
+    assert scheduler.expected_yield({"rdv_site_web": "https://centre.fr/4"}) == 1 / 16
+    assert scheduler.expected_yield({"rdv_site_web": "https://centre.fr/5"}) == 1
+
+
+def test_schedule_orders_and_skips():
+    centres = [{"rdv_site_web": f"https://centre.fr/{i}"} for i in [5, 4, 3, 2, 1, 0]]
+
+    scheduler = CentreScheduler(PREVIOUS_CENTRES, now=now, recent_availability=timedelta(days=1), random=lambda: 0)
+    assert [c["rdv_site_web"][-1] for c in scheduler.schedule(centres)] == ["5", "2", "1", "0", "3", "4"]
+    assert scheduler.skipped == []
+
+    scheduler = CentreScheduler(PREVIOUS_CENTRES, now=now, recent_availability=timedelta(days=1), random=lambda: 0.5)
+    assert [c["rdv_site_web"][-1] for c in scheduler.schedule(centres)] == ["5", "2", "1", "0"]
+    assert [lieu.url for lieu in scheduler.skipped] == ["https://centre.fr/4", "https://centre.fr/3"]
+
+
+def test_schedule_partial_scrape():
+    centres = [{"rdv_site_web": f"https://centre.fr/{i}"} for i in [0, 1, 4]]
+    scheduler = CentreScheduler(
+        PREVIOUS_CENTRES, now=now, recent_availability=timedelta(days=1), partial_scrape=0.4, random=lambda: 0.5
+    )
+    assert list(scheduler.schedule(centres)) == []
+    assert [lieu.url for lieu in scheduler.skipped] == ["https://centre.fr/4"]
+
+
+def test_previous_lieu():
+    lieu = previous_lieu(PREVIOUS_CENTRES["https://centre.fr/3"])
+    assert lieu.internal_id == "doctolib3"
+    assert lieu.plateforme == Plateforme.DOCTOLIB
+    assert lieu.location.city == "Privas"
+    assert previous_lieu({"url": "https://centre.fr/6"}) is None
+
+
+def test_export_last_scan_with_availabilities():
+    resource = ResourceTousDepartements(now=now, previous_centres=PREVIOUS_CENTRES)
+    lieu_disponible = previous_lieu(PREVIOUS_CENTRES["https://centre.fr/1"])
+    resource.on_creneau(Creneau(horaire=expected_now, lieu=lieu_disponible, reservation_url=lieu_disponible.url))
+    resource.on_creneau(PasDeCreneau(lieu=previous_lieu(PREVIOUS_CENTRES["https://centre.fr/3"])))
+
+    info_centres = resource.asdict()
+    assert info_centres["centres_disponibles"][0]["last_scan_with_availabilities"] == "2021-05-26T21:34:00+02:00"
+    assert info_centres["centres_indisponibles"][0]["last_scan_with_availabilities"] == ago(days=2, hours=1)
@@ -1,10 +1,12 @@
 import datetime as dt
 import json
+import pickle
 
 from scraper.pattern.center_info import CenterInfo
 from scraper.pattern.scraper_result import GENERAL_PRACTITIONER, ScraperResult
 from scraper.pattern.vaccine import Vaccine, get_vaccine_name
 from utils.vmd_utils import departementUtils
+import scraper.scraper
 from scraper.scraper import fetch_centre_slots
 from scraper.pattern.scraper_request import ScraperRequest
 from scraper.error import Blocked403
@@ -114,3 +116,22 @@ def test_scraper_request():
         "platform": "Doctolib",
         "request": request,
     }
+
+
+def test_cherche_prochain_rdv_dans_centre_blocked403_pickle(monkeypatch):
+    def blocked_fetch_centre_slots(rdv_site_web, *args, **kwargs):
+        raise Blocked403("Doctolib", rdv_site_web)
+
+    monkeypatch.setattr(scraper.scraper, "fetch_centre_slots", blocked_fetch_centre_slots)
+    centre = {
+        "gid": "1234",
+        "nom": "Mon Centre",
+        "rdv_site_web": "https://partners.doctolib.fr/centre",
+        "com_insee": "59350",
+    }
+    center_info = scraper.scraper.cherche_prochain_rdv_dans_centre((centre, DummyQueue()))
+
+    # Le résultat repasse par le pool de processus
+    unpickled = pickle.loads(pickle.dumps(center_info))
+    assert unpickled.erreur == str(Blocked403("Doctolib", "https://partners.doctolib.fr/centre"))
+    assert unpickled.gid == "1234"
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest import mock
+
+import dateutil
+
+from scraper.pattern.center_info import CenterInfo
+from scraper.pattern.center_location import CenterLocation
+from scraper.scheduler import previous_lieu
+from utils.vmd_state import ScrapeState
+from utils.vmd_utils import get_previous_centres
+
+expected_now = dateutil.parser.parse("2021-05-26T21:34:00+02:00")
+
+
+def now(tz=None):
+    return expected_now
+
+
+def center_info(url, prochain_rdv=None, erreur=None):
+    centre = CenterInfo(
+        "07",
+        "Centre 1",
+        url,
+        location=CenterLocation(longitude=4.1, latitude=44.2, city="Privas", cp="07000"),
+        metadata={"address": "1 rue du Centre, 07000 Privas", "business_hours": None},
+        plateforme="Doctolib",
+        prochain_rdv=prochain_rdv,
+        erreur=erreur,
+        internal_id="doctolib1",
+        type="vaccination-center",
+        appointment_count=3 if prochain_rdv else 0,
+    )
+    centre.time_for_request = 1.5
+    if prochain_rdv:
+        centre.last_scan_with_availabilities = expected_now.isoformat()
+    return centre
+
+
+def test_state_record_and_previous_centres():
+    with ScrapeState(":memory:", now=now) as state:
+        assert state.is_empty()
+        state.record([center_info("https://centre.fr/1", prochain_rdv="2021-05-27T10:00:00")])
+        state.record([center_info("https://centre.fr/1")])
+
+        assert not state.is_empty()
+        row = state.centre("https://centre.fr/1")
+        assert row["last_scan"] == "2021-05-26T21:34:00+02:00"
+        assert row["appointment_count"] == 0
+        assert row["time_for_request"] == 1.5
+        assert row["metadata_hash"]
+
+        previous = get_previous_centres(state)
+        assert list(previous.keys()) == ["https://centre.fr/1"]
+        assert previous["https://centre.fr/1"]["prochain_rdv"] is None
+        # la dernière disponibilité connue est conservée d'un scan à l'autre
+        assert previous["https://centre.fr/1"]["last_scan_with_availabilities"] == "2021-05-26T21:34:00+02:00"
+
+        lieu = previous_lieu(previous["https://centre.fr/1"])
+        assert lieu.internal_id == "doctolib1"
+        assert lieu.location.city == "Privas"
+
+
+def test_state_is_current():
+    info_centres = {"centres_disponibles": [{"url": "https://centre.fr/2"}], "centres_indisponibles": []}
+    response = mock.Mock(json=lambda: info_centres)
+    with ScrapeState(":memory:", now=now) as state:
+        assert not state.is_current()
+        state.record([center_info("https://centre.fr/1")])
+        assert state.is_current()
+        assert list(get_previous_centres(state).keys()) == ["https://centre.fr/1"]
+
+        # Cache de la CI resté deux heures en arrière : le fichier publié fait foi
+        state.now = lambda tz=None: expected_now + timedelta(hours=2)
+        assert not state.is_current()
+        with mock.patch("utils.vmd_utils.requests.get", return_value=response):
+            assert list(get_previous_centres(state).keys()) == ["https://centre.fr/2"]
+
+
+def test_state_error_streak():
+    with ScrapeState(":memory:", now=now) as state:
+        state.record([center_info("https://centre.fr/1", erreur=Exception("Timeout"))])
+        state.record([center_info("https://centre.fr/1", erreur=Exception("Timeout"))])
+        assert state.error_streak("https://centre.fr/1") == 2
+        assert state.centre("https://centre.fr/1")["last_error"] == "Timeout"
+
+        state.record([center_info("https://centre.fr/1")])
+        assert state.error_streak("https://centre.fr/1") == 0
+        assert state.error_streak("https://centre.fr/2") == 0
+
+
+def test_state_validators():
+    with ScrapeState(":memory:", now=now) as state:
+        assert state.get_validators("https://example.com/data.csv") == (None, None)
+        state.set_validators("https://example.com/data.csv", '"abc"', "Wed, 26 May 2021 19:34:00 GMT", b"a;b")
+        assert state.get_validators("https://example.com/data.csv") == ('"abc"', "Wed, 26 May 2021 19:34:00 GMT")
@@ -1,9 +1,18 @@
 # -- Tests des statistiques --
 import json
 import os
+from datetime import date, datetime
+
+import httpx
+import pytest
 
 from pathlib import Path
+from stats_generation.stats_aggregate import StatsCentres
 from stats_generation.stats_available_centers import export_centres_stats
+from stats_generation import stats_history
+from stats_generation.stats_history import StatsHistory, append_stats
+from stats_generation.stats_map import MapTemplate, download, get_rdv_by_departement, iter_csv, rdv_week
+from utils.vmd_state import ScrapeState
 
 
 def test_stat_count():
@@ -21,3 +30,137 @@ def test_stat_count():
     assert stats["tout_departement"]["disponibles"] == 2
     assert stats["tout_departement"]["total"] == 4
     os.remove(f"{output_file_name}")
+
+
+def test_stats_centres_aggregate():
+    with open(Path("tests", "fixtures", "stats", "info-centres.json")) as f:
+        info_centres = json.load(f)
+    info_centres["centres_disponibles"].append(dict(info_centres["centres_disponibles"][0], appointment_count=3))
+
+    aggregate = StatsCentres.from_info_centres(info_centres)
+
+    centres_stats = aggregate.centres_stats()
+    assert centres_stats["tout_departement"] == {"disponibles": 3, "total": 5, "creneaux": 660}
+    assert centres_stats["75"] == {"disponibles": 2, "indisponibles": 2, "creneaux": 10, "total": 4}
+    assert centres_stats["94"] == {"disponibles": 1, "indisponibles": 0, "creneaux": 650, "total": 1}
+
+    plateformes, center_types = aggregate.plateforme_data()
+    assert plateformes["Maiia"] == {"disponible": 3, "total": 3, "creneaux": 660}
+    assert plateformes["Doctolib"] == {"disponible": 0, "total": 2, "creneaux": 0}
+    assert center_types["drugstore"] == {"disponible": 2, "total": 4, "creneaux": 10}
+    assert aggregate.vaccins == {"Janssen": 2, "Pfizer-BioNTech": 1}
+
+
+def test_stats_history():
+    with StatsHistory(":memory:") as history:
+        assert history.is_empty("by_date_dep")
+        history.import_document(
+            "by_date_dep",
+            {
+                "dates": ["2021-05-01 10:00:00", "2021-05-01 11:00:00"],
+                "dep_centres": {"75": [3, 4], "94": [1]},
+                "dep_appointments": {"75": [10, 12], "94": [5]},
+            },
+        )
+        assert history.append(
+            "by_date_dep", "2021-05-02 10:00:00", {"dep_centres": {"75": 5, "94": 2}, "dep_appointments": {"75": 8}}
+        )
+        # Un seul point par heure : le premier est conservé
+        assert not history.append("by_date_dep", "2021-05-02 10:00:00", {"dep_centres": {"75": 6}})
+
+        template = {"dates": [], "dep_centres_disponibles": {}, "dep_centres": {}, "dep_appointments": {}}
+        assert history.export("by_date_dep", template) == {
+            "dates": ["2021-05-01 10:00:00", "2021-05-01 11:00:00", "2021-05-02 10:00:00"],
+            "dep_centres_disponibles": {},
+            "dep_centres": {"75": [3, 4, 5], "94": [1, 2]},
+            "dep_appointments": {"75": [10, 12, 8], "94": [5]},
+        }
+
+        history.downsample("by_date_dep", "2021-05-02 00:00:00")
+        assert history.export("by_date_dep")["dates"] == ["2021-05-01 10:00:00", "2021-05-02 10:00:00"]
+        assert history.export("by_date_dep")["dep_centres"] == {"75": [3, 5], "94": [2]}
+
+
+def test_append_stats_merges_published_points(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("data", "output"))
+    history_path = str(tmp_path / "stats_history.sqlite3")
+    with StatsHistory(history_path) as history:
+        history.append("by_date", "2021-05-01 10:00:00", {"total_centres": 3})
+    # Le cache local est resté à 10h, l'historique publié a continué
+    published = {"dates": ["2021-05-01 10:00:00", "2021-05-01 11:00:00"], "total_centres": [2, 4]}
+    monkeypatch.setattr(stats_history, "fetch_published_stats", lambda stats_path: published)
+    now = lambda tz=None: datetime(2021, 5, 1, 12, 5, tzinfo=tz)
+
+    append_stats("by_date", "stats_by_date.json", "2021-05-01 12:00:00", {"total_centres": 5}, {}, now, history_path)
+
+    with open(os.path.join("data", "output", "stats_by_date.json")) as f:
+        assert json.load(f) == {
+            "dates": ["2021-05-01 10:00:00", "2021-05-01 11:00:00", "2021-05-01 12:00:00"],
+            "total_centres": [3, 4, 5],
+        }
+
+
+def test_append_stats_unavailable_published_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("data", "output"))
+    history_path = str(tmp_path / "stats_history.sqlite3")
+    with StatsHistory(history_path) as history:
+        history.append("by_date", "2021-05-01 10:00:00", {"total_centres": 3})
+    monkeypatch.setattr(stats_history, "fetch_published_stats", lambda stats_path: None)
+    output_path = os.path.join("data", "output", "stats_by_date.json")
+
+    # Historique local périmé : le JSON publié n'est pas écrasé
+    now = lambda tz=None: datetime(2021, 5, 1, 13, 5, tzinfo=tz)
+    with pytest.raises(RuntimeError):
+        append_stats(
+            "by_date", "stats_by_date.json", "2021-05-01 13:00:00", {"total_centres": 5}, {}, now, history_path
+        )
+    assert not os.path.exists(output_path)
+
+    # Historique local à jour de la dernière exécution
+    now = lambda tz=None: datetime(2021, 5, 1, 11, 5, tzinfo=tz)
+    append_stats("by_date", "stats_by_date.json", "2021-05-01 11:00:00", {"total_centres": 5}, {}, now, history_path)
+    with open(output_path) as f:
+        assert json.load(f)["dates"] == ["2021-05-01 10:00:00", "2021-05-01 11:00:00"]
+
+
+def test_map_template():
+    template = MapTemplate("<svg><style>/*@@@STYLETAG@@@*/</style><text>@@@UPDATETAG@@@</text>@e0|@e1|@e9</svg>")
+
+    svg = template.render(".departement75 { fill: #fff; }", "Titre", "Mise à jour", ["0", "5"])
+
+    assert svg == "<svg><style>.departement75 { fill: #fff; }</style><text>Mise à jour</text>0|5|</svg>"
+
+
+def test_download_rdv_csv(tmp_path):
+    csv_content = (
+        "code_departement,date_debut_semaine,doses_allouees,rdv_pris\n"
+        "75,2021-05-03,100,60\n"
+        "75,2021-05-03,50,30\n"
+        "75,2021-05-10,80,10\n"
+        "94,2021-05-03,20,20\n"
+    ).encode("windows-1252")
+    requests = []
+
+    def app(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=csv_content, headers={"ETag": '"v1"'})
+
+    client = httpx.Client(transport=httpx.MockTransport(app))
+    url = "https://www.data.gouv.fr/fr/datasets/r/rdv.csv"
+    with ScrapeState(":memory:") as state:
+        path = download(url, client, tmp_path, state)
+        assert path.read_bytes() == csv_content
+        # Deuxième téléchargement : la copie locale est revalidée, pas retéléchargée
+        assert download(url, client, tmp_path, state) == path
+    assert requests[1].headers["If-None-Match"] == '"v1"'
+
+    dept_rdv = get_rdv_by_departement(iter_csv(path, delimiter=",", encoding="windows-1252"), "2021-05-03")
+    assert dept_rdv == {
+        "75": {"2021-05-03": {"doses_allouees": 150, "rdv_pris": 90}},
+        "94": {"2021-05-03": {"doses_allouees": 20, "rdv_pris": 20}},
+    }
+    assert rdv_week(date(2021, 5, 6)) == "2021-05-03"
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from benchmarks.synthetic import SyntheticDataset
+from scraper.creneaux.creneau import Creneau, PasDeCreneau, Plateforme
+from scraper.export.resource_centres import ResourceTousDepartements
+from scraper.pattern.vaccine import Vaccine
+
+
+def test_synthetic_dataset_is_reproducible():
+    first = [(c.lieu.internal_id, getattr(c, "horaire", None)) for c in SyntheticDataset(centres=50, seed=3).creneaux()]
+    second = [
+        (c.lieu.internal_id, getattr(c, "horaire", None)) for c in SyntheticDataset(centres=50, seed=3).creneaux()
+    ]
+    assert first == second
+
+
+def test_synthetic_dataset_distributions():
+    dataset = SyntheticDataset(
+        centres=100,
+        slots_per_centre=5,
+        available_ratio=0.5,
+        departements={"07": 1, "29": 1},
+        platforms={Plateforme.MAIIA: 1},
+        vaccines={Vaccine.MODERNA: 1},
+        doses={"3": 1},
+    )
+    creneaux = list(dataset.creneaux())
+
+    assert len([c for c in creneaux if isinstance(c, Creneau)]) == dataset.total_slots
+    assert len([c for c in creneaux if isinstance(c, PasDeCreneau)]) == len([c for c in dataset.centres if not c.slots])
+    assert {c.lieu.departement for c in creneaux} == {"07", "29"}
+    assert {c.lieu.plateforme for c in creneaux} == {Plateforme.MAIIA}
+    assert all(c.type_vaccin == [Vaccine.MODERNA] and c.dose == ["3"] for c in creneaux if isinstance(c, Creneau))
+
+
+def test_synthetic_info_centres_matches_exporter():
+    fake_now = datetime(2021, 5, 5, 10, 30)
+    dataset = SyntheticDataset(centres=40, slots_per_centre=10, now=lambda tz: fake_now.replace(tzinfo=tz))
+    resource = ResourceTousDepartements()
+    for creneau in dataset.creneaux():
+        resource.on_creneau(creneau)
+    exported = resource.asdict()
+    synthetic = dataset.info_centres()
+
+    def summary(centres):
+        return {
+            centre["internal_id"]: (centre["appointment_count"], centre["prochain_rdv"], sorted(centre["vaccine_type"]))
+            for centre in centres
+        }
+
+    assert summary(synthetic["centres_disponibles"]) == summary(exported["centres_disponibles"])
+    assert {c["internal_id"] for c in synthetic["centres_indisponibles"]} == {
+        c["internal_id"] for c in exported["centres_indisponibles"]
+    }
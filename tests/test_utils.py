@@ -1,6 +1,18 @@
 import datetime as dt
-
-from utils.vmd_utils import format_phone_number, get_last_scans, append_date_days, department_urlify
+from unittest import mock
+
+from utils.vmd_state import ScrapeState
+from utils.vmd_utils import (
+    format_phone_number,
+    get_last_scans,
+    append_date_days,
+    department_urlify,
+    fetch_previous_centres,
+    iter_bulks,
+    BulkQueue,
+    EOQ,
+)
+from queue import Queue
 from .utils import mock_datetime_now
 from scraper.pattern.center_info import CenterInfo
 
@@ -43,6 +55,35 @@ def test_get_last_scans():
     assert centres_cherchés[1].last_scan_with_availabilities == "2021-05-05T00:00:00"
 
 
+def test_get_last_scans_previous_centres():
+    center_info1 = CenterInfo("01", "Centre 1", "https://example1.fr")
+    previous_centres = {"https://example1.fr": {"last_scan_with_availabilities": "2021-05-04T10:00:00"}}
+
+    centres_cherchés = get_last_scans(iter([center_info1]), previous_centres)
+
+    assert centres_cherchés[0].last_scan_with_availabilities == "2021-05-04T10:00:00"
+
+
+def test_fetch_previous_centres():
+    info_centres = {
+        "centres_disponibles": [{"url": "https://example1.fr", "last_scan_with_availabilities": "2021-05-04T10:00:00"}],
+        "centres_indisponibles": [{"url": "https://example2.fr", "last_scan_with_availabilities": None}],
+    }
+    response = mock.Mock(json=lambda: info_centres)
+    with ScrapeState(":memory:") as state:
+        with mock.patch("utils.vmd_utils.requests.get", return_value=response) as get:
+            previous_centres = fetch_previous_centres(state).result(timeout=5)
+        get.assert_called_once()
+        assert list(previous_centres.keys()) == ["https://example1.fr", "https://example2.fr"]
+
+        state.record([CenterInfo("01", "Centre 1", "https://example1.fr")])
+        with mock.patch("utils.vmd_utils.requests.get") as get:
+            previous_centres = fetch_previous_centres(state).result(timeout=5)
+        # L'état local suffit : pas de téléchargement
+        get.assert_not_called()
+        assert list(previous_centres.keys()) == ["https://example1.fr"]
+
+
 def test_department_urlify():
     url = "FooBar 42"
     assert department_urlify(url) == "foobar-42"
@@ -58,3 +99,14 @@ def test_append_days_date():
     for test_date in TEST_DATES:
         item = test_date["item"]
         assert append_date_days(item[0], item[1]) == test_date["result"]
+
+
+def test_iter_bulks():
+    assert list(iter_bulks(range(7), bulksize=3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_bulk_queue_bulks():
+    queue = BulkQueue(Queue(), bulksize=2)
+    for item in [1, 2, 3, EOQ]:
+        queue.put(item)
+    assert list(queue.bulks()) == [[1, 2], [3]]
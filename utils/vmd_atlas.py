@@ -0,0 +1,138 @@
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib import parse
+
+import requests
+
+from utils.vmd_config import get_conf_inputs
+from utils.vmd_geo_api import search_addresses
+from utils.vmd_logger import get_logger
+
+logger = get_logger()
+
+ATLAS_URL = get_conf_inputs().get("from_data_gouv_website").get("centers_gouv")
+
+
+def doctolib_url_end(url: str) -> Optional[str]:
+    return parse.urlsplit(url).path.split("/")[-1]
+
+
+def keldoc_url_end(url: str) -> Optional[str]:
+    if "redirect" in url:
+        parsed = parse.parse_qs(parse.urlparse(url).query, keep_blank_values=True)
+        try:
+            url = f'http://keldoc.com/{parsed["dom"][0]}/{parsed["inst"][0]}/{parsed["user"][0]}'
+        except (KeyError, IndexError):
+            return None
+    path = parse.urlsplit(url).path.split("/")
+    return path[3] if len(path) > 3 else None
+
+
+# Pour chaque plateforme, comment extraire de l'URL de rendez-vous ATLAS la fin d'URL propre au centre
+URL_END = {
+    "doctolib": doctolib_url_end,
+    "keldoc": keldoc_url_end,
+    "maiia": doctolib_url_end,
+}
+
+
+@lru_cache(maxsize=None)
+def get_atlas_features(url: str = ATLAS_URL) -> tuple:
+    """
+    Les lieux de vaccination publiés sur data.gouv (ATLAS), téléchargés une seule fois par exécution.
+    À appeler avant de créer un pool de processus pour que ceux-ci en héritent.
+    """
+    logger.info(f"Téléchargement des centres ATLAS depuis {url}")
+    data = requests.get(url).json()
+    return tuple(feature["properties"] for feature in data["features"])
+
+
+class AtlasIndex:
+    """
+    Les centres ATLAS d'une plateforme, indexés par identifiant d'adresse (BAN). Leurs fins d'URL de rendez-vous
+    sont mises bout à bout dans une seule chaîne, où une fin d'URL de centre scrapé est cherchée en une fois.
+    `centres` associe le gid ATLAS à {"url_end": ..., "id_adresse": ...}.
+    """
+
+    def __init__(self, centres: Optional[Dict[str, dict]] = None):
+        self.centres = centres or {}
+        self.gids = list(self.centres.keys())
+        url_ends = [centre["url_end"] for centre in self.centres.values()]
+        # Position de chaque fin d'URL dans `url_ends`, séparées par des retours à la ligne
+        self.url_end_starts = []
+        position = 0
+        for url_end in url_ends:
+            self.url_end_starts.append(position)
+            position += len(url_end) + 1
+        self.url_ends = "\n".join(url_ends)
+        self.by_id_adresse: Dict[str, str] = {}
+        for gid, centre in self.centres.items():
+            if centre["id_adresse"]:
+                self.by_id_adresse.setdefault(centre["id_adresse"], gid)
+
+    @classmethod
+    def from_features(cls, features: Iterable[dict], platform: str, url_end: Optional[Callable] = None):
+        url_end = url_end or URL_END.get(platform, doctolib_url_end)
+        centres = {}
+        for properties in features:
+            url = properties.get("c_rdv_site_web", None)
+            gid = properties.get("c_gid", None)
+            if properties.get("c_reserve_professionels_sante", False):
+                continue
+            if not url or not gid:
+                continue
+            if platform not in url:
+                continue
+            end = url_end(url)
+            if end:
+                centres[gid] = {"url_end": end, "id_adresse": properties.get("c_id_adr", None)}
+        return cls(centres)
+
+    def __len__(self):
+        return len(self.centres)
+
+    def matches(self, *url_ends: str) -> List[str]:
+        """Les gid ATLAS dont la fin d'URL contient l'une de `url_ends`, dans l'ordre d'ATLAS."""
+        indexes = set()
+        for url_end in url_ends:
+            if not url_end:
+                # Comme `"" in url_end` : toutes les fins d'URL
+                indexes.update(range(len(self.gids)))
+                continue
+            if "\n" in url_end:
+                # Ne peut pas être à cheval sur deux fins d'URL
+                continue
+            position = self.url_ends.find(url_end)
+            while position != -1:
+                index = bisect_right(self.url_end_starts, position) - 1
+                indexes.add(index)
+                if index + 1 >= len(self.gids):
+                    break
+                position = self.url_ends.find(url_end, self.url_end_starts[index + 1])
+        return [self.gids[index] for index in sorted(indexes)]
+
+    def gid_for_adresse(self, id_adresse: str) -> Optional[str]:
+        return self.by_id_adresse.get(id_adresse)
+
+    def resolve_ambiguous(self, centers: List[dict], postcode_key: str = "cp") -> List[dict]:
+        """
+        Départage les centres associés à plusieurs centres ATLAS (`atlas_matches`)
+        par l'identifiant BAN de leur adresse, géocodée en une fois pour tous ces centres.
+        """
+        ambiguous = [center for center in centers if center.pop("atlas_matches", None)]
+        if not ambiguous:
+            return centers
+        addresses = [(center.get("address"), center.get(postcode_key)) for center in ambiguous]
+        for center, geojson in zip(ambiguous, search_addresses(addresses)):
+            try:
+                center["atlas_gid"] = self.gid_for_adresse(geojson["features"][0]["properties"]["id"])
+            except (TypeError, KeyError, IndexError):
+                center["atlas_gid"] = None
+        logger.info(f"{len(ambiguous)} centres ATLAS départagés par leur adresse")
+        return centers
+
+
+@lru_cache(maxsize=None)
+def get_atlas_index(platform: str) -> AtlasIndex:
+    return AtlasIndex.from_features(get_atlas_features(), platform)
@@ -1,10 +1,25 @@
-from typing import TypedDict, Optional, NamedTuple
+from typing import Dict, Iterable, List, TypedDict, Optional, NamedTuple, Tuple
+import csv
+import io
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+
 import requests
+from utils.vmd_config import get_config
 from utils.vmd_logger import get_logger
 from functools import lru_cache
 
 logger = get_logger()
 
+GEOCODING_CONF = get_config().get("geocoding", {})
+API_ADRESSE_URL = GEOCODING_CONF.get("api_url", "https://api-adresse.data.gouv.fr")
+GEOCODING_CACHE_PATH = GEOCODING_CONF.get("cache_path", "data/state/geocoding.sqlite3")
+BATCH_SIZE = GEOCODING_CONF.get("batch_size", 1000)
+CACHE_MAX_AGE = timedelta(days=GEOCODING_CONF.get("cache_days", 30))
+
 
 class Location(TypedDict):
     full_address: str
@@ -22,31 +37,179 @@ class Coordinates(NamedTuple):
     latitude: float
 
 
-@lru_cache
-def get_location_from_address(
+class GeocodingCache:
+    """
+    Réponses de l'API Adresse conservées d'une exécution à l'autre dans une base sqlite locale,
+    redemandées au-delà de `max_age`.
+    Une connexion est ouverte par opération : le cache peut être partagé par les processus d'un pool.
+    """
+
+    def __init__(self, path: str = GEOCODING_CACHE_PATH, max_age: timedelta = CACHE_MAX_AGE, now=datetime.now):
+        self.path = path
+        self.max_age = max_age
+        self.now = now
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS geocoding (key TEXT PRIMARY KEY, response TEXT NOT NULL, fetched_at TEXT)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key: str) -> Optional[dict]:
+        oldest = (self.now() - self.max_age).isoformat()
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT response FROM geocoding WHERE key = ? AND fetched_at >= ?", (key, oldest)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_many(self, responses: Dict[str, dict]):
+        fetched_at = self.now().isoformat()
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO geocoding (key, response, fetched_at) VALUES (?, ?, ?)",
+                ((key, json.dumps(response), fetched_at) for key, response in responses.items()),
+            )
+
+
+@lru_cache(maxsize=None)
+def get_geocoding_cache(path: str = GEOCODING_CACHE_PATH) -> GeocodingCache:
+    return GeocodingCache(path)
+
+
+def _cache_key(endpoint: str, *params) -> str:
+    return json.dumps([endpoint, *params], ensure_ascii=False)
+
+
+def search_address(
     address: str,
     zipcode: Optional[str] = None,
     inseecode: Optional[str] = None,
-) -> Optional[Location]:
-    params = {"q": address, "limit": 1}
+    cache: Optional[GeocodingCache] = None,
+    api_url: str = API_ADRESSE_URL,
+) -> dict:
+    """
+    La réponse GeoJSON de l'API Adresse pour `address`, depuis le cache local si elle y est.
+    Une réponse en erreur n'est pas mise en cache et donne un résultat vide.
+    """
+    cache = cache or get_geocoding_cache()
+    key = _cache_key("search", address, zipcode, None if zipcode else inseecode)
+    geojson = cache.get(key)
+    if geojson is not None:
+        return geojson
 
+    params = {"q": address, "limit": 1}
     if zipcode:
         params["postcode"] = zipcode
     elif inseecode:
         params["citycode"] = inseecode
 
-    r = requests.get("https://api-adresse.data.gouv.fr/search/", params=params)
-
-    return _parse_geojson(r.json())
+    try:
+        r = requests.get(f"{api_url}/search/", params=params)
+        r.raise_for_status()
+    except requests.HTTPError as e:
+        logger.warning(f"Géocodage de l'adresse {address} impossible: {e}")
+        return {"features": []}
+    geojson = r.json()
+    cache.set_many({key: geojson})
+    return geojson
+
+
+def search_addresses(
+    addresses: Iterable[Tuple[str, Optional[str]]],
+    cache: Optional[GeocodingCache] = None,
+    api_url: str = API_ADRESSE_URL,
+    batch_size: int = BATCH_SIZE,
+) -> List[Optional[dict]]:
+    """
+    Géocode une liste de couples (adresse, code postal) par lots, via l'import CSV de l'API Adresse.
+    Les adresses déjà en cache ne sont pas redemandées ; un lot en erreur donne None pour ses adresses.
+    """
+    cache = cache or get_geocoding_cache()
+    addresses = list(addresses)
+    results = {}
+    missing = []
+    for address, zipcode in dict.fromkeys(addresses):
+        key = _cache_key("search", address, zipcode, None)
+        geojson = cache.get(key)
+        if geojson is None:
+            missing.append((address, zipcode))
+        results[(address, zipcode)] = geojson
+
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start : start + batch_size]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["q", "postcode"])
+        writer.writerows((address, zipcode or "") for address, zipcode in batch)
+        try:
+            r = requests.post(
+                f"{api_url}/search/csv/",
+                files={"data": ("adresses.csv", buffer.getvalue().encode("utf-8"), "text/csv")},
+                data={"columns": "q", "postcode": "postcode"},
+            )
+            r.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning(f"Géocodage par lot de {len(batch)} adresses impossible: {e}")
+            continue
+        fetched = {}
+        for (address, zipcode), row in zip(batch, csv.DictReader(io.StringIO(r.content.decode("utf-8-sig")))):
+            geojson = _geojson_from_csv(row)
+            fetched[_cache_key("search", address, zipcode, None)] = geojson
+            results[(address, zipcode)] = geojson
+        cache.set_many(fetched)
+        logger.info(f"{len(fetched)} adresses géocodées par lot")
+
+    return [results[address] for address in addresses]
 
 
 @lru_cache
-def get_location_from_coordinates(coordinates: Coordinates) -> Optional[Location]:
-    params = {"lon": getattr(coordinates, "longitude"), "lat": getattr(coordinates, "latitude")}
+def get_location_from_address(
+    address: str,
+    zipcode: Optional[str] = None,
+    inseecode: Optional[str] = None,
+) -> Optional[Location]:
+    return _parse_geojson(search_address(address, zipcode=zipcode, inseecode=inseecode))
 
-    r = requests.get("https://api-adresse.data.gouv.fr/reverse/", params=params)
 
-    return _parse_geojson(r.json())
+@lru_cache
+def get_location_from_coordinates(coordinates: Coordinates) -> Optional[Location]:
+    cache = get_geocoding_cache()
+    longitude, latitude = getattr(coordinates, "longitude"), getattr(coordinates, "latitude")
+    key = _cache_key("reverse", longitude, latitude)
+    geojson = cache.get(key)
+    if geojson is None:
+        r = requests.get(f"{API_ADRESSE_URL}/reverse/", params={"lon": longitude, "lat": latitude})
+        geojson = r.json()
+        cache.set_many({key: geojson})
+
+    return _parse_geojson(geojson)
+
+
+def _geojson_from_csv(row: dict) -> dict:
+    """Une ligne de résultat de l'import CSV, au format de la réponse GeoJSON de /search/."""
+    if not row.get("result_label"):
+        return {"features": []}
+    return {
+        "features": [
+            {
+                "properties": {
+                    "label": row["result_label"],
+                    "name": row.get("result_name"),
+                    "city": row.get("result_city"),
+                    "postcode": row.get("result_postcode"),
+                    "citycode": row.get("result_citycode"),
+                    "context": row.get("result_context"),
+                    "type": row.get("result_type"),
+                    "id": row.get("result_id"),
+                    "score": float(row["result_score"]) if row.get("result_score") else None,
+                },
+                "geometry": {"coordinates": [float(row["longitude"]), float(row["latitude"])]},
+            }
+        ]
+    }
 
 
 def _parse_geojson(geojson: str) -> Location:
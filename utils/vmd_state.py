@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Tuple
+
+import pytz
+
+from utils.vmd_config import get_config
+from utils.vmd_logger import get_logger
+
+logger = get_logger()
+
+STATE_PATH = get_config().get("state", {}).get("path", "data/state/vitemadose.sqlite3")
+RUN_INTERVAL = timedelta(minutes=get_config().get("run_interval_minutes", 60))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS centres (
+    url TEXT PRIMARY KEY,
+    internal_id TEXT,
+    plateforme TEXT,
+    last_scan TEXT NOT NULL,
+    prochain_rdv TEXT,
+    appointment_count INTEGER NOT NULL DEFAULT 0,
+    last_scan_with_availabilities TEXT,
+    error_streak INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    time_for_request REAL,
+    request_counts TEXT,
+    metadata_hash TEXT,
+    centre TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    fetched_at TEXT NOT NULL
+);
+"""
+
+
+def content_hash(content) -> str:
+    if not isinstance(content, (bytes, str)):
+        content = json.dumps(content, sort_keys=True, default=str)
+    if isinstance(content, str):
+        content = content.encode("utf8")
+    return hashlib.sha1(content).hexdigest()
+
+
+class ScrapeState:
+    """
+    État du scraper conservé d'une exécution à l'autre dans une base sqlite locale :
+    dernier scan, dernière disponibilité, erreurs consécutives et temps de réponse de chaque centre,
+    ainsi que les ETag des fichiers téléchargés.
+    """
+
+    def __init__(self, path: str = STATE_PATH, now=datetime.now):
+        self.path = path
+        self.now = now
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def is_empty(self) -> bool:
+        return self.connection.execute("SELECT 1 FROM centres LIMIT 1").fetchone() is None
+
+    def is_current(self, max_age: timedelta = RUN_INTERVAL) -> bool:
+        """Vrai si le dernier scan enregistré a moins de `max_age` : le cache de la CI peut être ancien."""
+        last_scan = self.connection.execute("SELECT MAX(last_scan) FROM centres").fetchone()[0]
+        if last_scan is None:
+            return False
+        return datetime.fromisoformat(last_scan) >= self.now(tz=pytz.timezone("Europe/Paris")) - max_age
+
+    def record(self, centres: Iterable):
+        """Enregistre le résultat du scan de chaque centre (`CenterInfo`)."""
+        now = self.now(tz=pytz.timezone("Europe/Paris")).isoformat()
+        rows = []
+        for centre in centres:
+            if not centre.url:
+                continue
+            erreur = str(centre.erreur) if centre.erreur else None
+            data = dict(centre.default())
+            rows.append(
+                {
+                    "url": centre.url,
+                    "internal_id": centre.internal_id,
+                    "plateforme": centre.plateforme,
+                    "last_scan": now,
+                    "prochain_rdv": centre.prochain_rdv,
+                    "appointment_count": centre.appointment_count or 0,
+                    "last_scan_with_availabilities": centre.last_scan_with_availabilities,
+                    "error": 1 if erreur else 0,
+                    "last_error": erreur,
+                    "time_for_request": getattr(centre, "time_for_request", None),
+                    "request_counts": json.dumps(centre.request_counts) if centre.request_counts else None,
+                    "metadata_hash": content_hash(centre.metadata) if centre.metadata else None,
+                    "centre": json.dumps(data, default=str),
+                }
+            )
+        with self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO centres (
+                    url, internal_id, plateforme, last_scan, prochain_rdv, appointment_count,
+                    last_scan_with_availabilities, error_streak, last_error, time_for_request,
+                    request_counts, metadata_hash, centre
+                ) VALUES (
+                    :url, :internal_id, :plateforme, :last_scan, :prochain_rdv, :appointment_count,
+                    :last_scan_with_availabilities, :error, :last_error, :time_for_request,
+                    :request_counts, :metadata_hash, :centre
+                )
+                ON CONFLICT(url) DO UPDATE SET
+                    internal_id = excluded.internal_id,
+                    plateforme = excluded.plateforme,
+                    last_scan = excluded.last_scan,
+                    prochain_rdv = excluded.prochain_rdv,
+                    appointment_count = excluded.appointment_count,
+                    last_scan_with_availabilities = COALESCE(
+                        excluded.last_scan_with_availabilities, centres.last_scan_with_availabilities
+                    ),
+                    error_streak = CASE WHEN excluded.error_streak > 0 THEN centres.error_streak + 1 ELSE 0 END,
+                    last_error = excluded.last_error,
+                    time_for_request = excluded.time_for_request,
+                    request_counts = excluded.request_counts,
+                    metadata_hash = excluded.metadata_hash,
+                    centre = excluded.centre
+                """,
+                rows,
+            )
+        logger.info(f"{len(rows)} centres enregistrés dans {self.path}")
+
+    def previous_centres(self) -> dict:
+        """Les centres du dernier scan, indexés par URL, au format de `info_centres.json`."""
+        previous_centres = {}
+        for row in self.connection.execute(
+            "SELECT url, prochain_rdv, last_scan_with_availabilities, error_streak, centre FROM centres"
+        ):
+            centre = json.loads(row["centre"])
+            centre["prochain_rdv"] = row["prochain_rdv"]
+            centre["last_scan_with_availabilities"] = row["last_scan_with_availabilities"]
+            centre["error_streak"] = row["error_streak"]
+            previous_centres[row["url"]] = centre
+        return previous_centres
+
+    def centre(self, url: str) -> Optional[dict]:
+        row = self.connection.execute("SELECT * FROM centres WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def error_streak(self, url: str) -> int:
+        row = self.connection.execute("SELECT error_streak FROM centres WHERE url = ?", (url,)).fetchone()
+        return row["error_streak"] if row else 0
+
+    def get_validators(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        """ETag et Last-Modified du dernier téléchargement de `url`, pour une requête conditionnelle."""
+        row = self.connection.execute("SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)).fetchone()
+        return (row["etag"], row["last_modified"]) if row else (None, None)
+
+    def set_validators(self, url: str, etag: Optional[str], last_modified: Optional[str], content=None):
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT OR REPLACE INTO http_cache (url, etag, last_modified, content_hash, fetched_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    url,
+                    etag,
+                    last_modified,
+                    content_hash(content) if content is not None else None,
+                    self.now(tz=pytz.timezone("Europe/Paris")).isoformat(),
+                ),
+            )
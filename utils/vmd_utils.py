@@ -10,13 +10,13 @@ import pytz
 import requests
 import sys
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from unidecode import unidecode
 
 from utils.vmd_config import get_conf_inputs, get_config
 
-
 RESERVED_CENTERS = get_config().get("reserved_centers", [])
 
 PARIS_TZ = pytz.timezone("Europe/Paris")
@@ -234,34 +234,70 @@ def fix_scrap_urls(url):
     return url
 
 
-def get_last_scans(centres):
-    url = f'{get_config().get("base_urls").get("gitlab_public_path")}/{get_conf_inputs().get("from_gitlab_public").get("last_scans")}'
-    last_scans = {}
-    liste_centres = []
+def get_previous_centres(state=None) -> dict:
+    """
+    Les centres de l'exécution précédente, indexés par URL : depuis l'état local (`ScrapeState`)
+    s'il date de la dernière exécution, sinon depuis le `info_centres.json` publié.
+    """
+    if is_state_current(state):
+        return state.previous_centres()
+    return download_previous_centres()
 
-    for centre in centres:
-        liste_centres.append(centre)
 
+def is_state_current(state) -> bool:
+    if state is None or state.is_empty():
+        return False
+    if not state.is_current():
+        logger.info(f"État local {state.path} périmé : le fichier info_centres publié est utilisé")
+        return False
+    return True
+
+
+def download_previous_centres() -> dict:
+    url = f'{get_config().get("base_urls").get("gitlab_public_path")}/{get_conf_inputs().get("from_gitlab_public").get("last_scans")}'
+    previous_centres = {}
     try:
         response = requests.get(url)
         response.raise_for_status()
         info_centres = response.json()
 
         for centre in info_centres["centres_disponibles"] + info_centres["centres_indisponibles"]:
-            if "last_scan_with_availabilities" in centre:
-                last_scans[centre["url"]] = centre["last_scan_with_availabilities"]
+            previous_centres[centre["url"]] = centre
 
     except Exception as e:
         logger.warning(f"Impossible de récupérer le fichier info_centres: {e}")
-        info_centres = {}
+    return previous_centres
+
+
+def fetch_previous_centres(state=None) -> Future:
+    """
+    Comme `get_previous_centres`, mais sans bloquer : l'état local est lu tout de suite,
+    le `info_centres.json` publié n'est téléchargé, en tâche de fond, que s'il est vide ou périmé.
+    """
+    if is_state_current(state):
+        future = Future()
+        future.set_result(state.previous_centres())
+        return future
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="previous_centres")
+    future = executor.submit(download_previous_centres)
+    executor.shutdown(wait=False)
+    return future
+
+
+def annotate_last_scan(centre, previous_centres: dict):
+    if not centre.prochain_rdv:
+        if centre.url in previous_centres:
+            centre.last_scan_with_availabilities = previous_centres[centre.url].get("last_scan_with_availabilities")
+    else:
+        centre.last_scan_with_availabilities = dt.datetime.now(tz=pytz.timezone("Europe/Paris")).isoformat()
+    return centre
 
-    for centre in liste_centres:
-        if not centre.prochain_rdv:
-            if centre.url in last_scans:
-                centre.last_scan_with_availabilities = last_scans[centre.url]
-        else:
-            centre.last_scan_with_availabilities = dt.datetime.now(tz=pytz.timezone("Europe/Paris")).isoformat()
-    return liste_centres
+
+def get_last_scans(centres, previous_centres: Optional[dict] = None):
+    if previous_centres is None:
+        previous_centres = get_previous_centres()
+    # Annotés au fil de l'eau, à mesure que les centres sortent du pool
+    return [annotate_last_scan(centre, previous_centres) for centre in centres]
 
 
 def append_date_days(mydate: str, days: int, seconds=0):
@@ -296,6 +332,18 @@ def q_iter(q, EOQ=EOQ):
     return iter(q.get, EOQ)
 
 
+def iter_bulks(iterable, bulksize=300):
+    """Regroupe les éléments de `iterable` par paquets d'au plus `bulksize` éléments."""
+    bulk = []
+    for item in iterable:
+        bulk.append(item)
+        if len(bulk) >= bulksize:
+            yield bulk
+            bulk = []
+    if bulk:
+        yield bulk
+
+
 class BulkQueue:
     def __init__(self, q, bulksize=300, delay=5):
         self.q = q
@@ -328,6 +376,17 @@ class BulkQueue:
             self.current_read = None
             return self.get()
 
+    def bulks(self, EOQ=EOQ):
+        """Les paquets tels qu'ils ont été envoyés, jusqu'à `EOQ` exclu. Ne pas mélanger avec `get`."""
+        while True:
+            bulk = self.q.get()
+            if EOQ in bulk:
+                bulk = bulk[: bulk.index(EOQ)]
+                if bulk:
+                    yield bulk
+                return
+            yield bulk
+
     def delayed_flush(self):
         self._flush()
 